@@ -2,7 +2,8 @@
 from dash import dcc, html
 import dash_bootstrap_components as dbc
 import dash.dash_table
-from config import APP_TITLE, BENCHMARK_COLOR, PORTFOLIO_COLOR, SERVER_HOST, SERVER_PORT, DEV_FIVE_FACTORS_FILE_PATH, INDEX_LIST_FILE_PATH, ETF_BASE_PATH, COUNTER_FILE_PATH
+from config import APP_TITLE, BENCHMARK_COLOR, PORTFOLIO_COLOR, SERVER_HOST, SERVER_PORT, DEV_FIVE_FACTORS_FILE_PATH, INDEX_LIST_FILE_PATH, ETF_BASE_PATH, COUNTER_FILE_PATH, DEFAULT_FACTOR_MODEL
+from factor_models import factor_model_options
 from Frontend.login_popup import PopupManager
 from counter import PortfolioCounter
 from Frontend.header import Header
@@ -11,7 +12,7 @@ from Frontend.footer import Footer
 
 class LayoutManager:
     @staticmethod
-    def create_layout(asset_list, initial_table_data,app):
+    def create_layout(initial_table_data,app):
 
         modal = PopupManager(app)
         counter = PortfolioCounter(COUNTER_FILE_PATH)
@@ -35,7 +36,7 @@ class LayoutManager:
                         html.Div([
                             dcc.Dropdown(
                                 id='etf-dropdown',
-                                options=asset_list,
+                                options=[],  # Riempite dalla ricerca lato server
                                 placeholder="Seleziona un ETF",
                                 className='modern-dropdown',
                                 style={
@@ -212,14 +213,56 @@ class LayoutManager:
                                     html.Div([
                                         dcc.Dropdown(
                                             id='benchmark-dropdown',
-                                            options=asset_list,
+                                            options=[],  # Riempite dalla ricerca lato server
                                             placeholder="Seleziona un benchmark",
                                             clearable=True,
                                             className="modern-dropdown"
                                         ),
                                         html.I(className="fas fa-chart-line dropdown-icon")
                                     ], className="dropdown-container")
-                                ], width=12),
+                                ], md=8),
+                                dbc.Col([
+                                    html.Label(
+                                        "Ribilanciamento",
+                                        className="settings-label"
+                                    ),
+                                    html.Div([
+                                        dcc.Dropdown(
+                                            id='rebalancing-dropdown',
+                                            options=[
+                                                {'label': 'Mensile', 'value': 'monthly'},
+                                                {'label': 'Trimestrale', 'value': 'quarterly'},
+                                                {'label': 'Annuale', 'value': 'annual'},
+                                                {'label': 'Mai (buy & hold)', 'value': 'none'},
+                                                {'label': 'Bande ±5%', 'value': 'threshold'},
+                                            ],
+                                            value='monthly',
+                                            clearable=False,
+                                            className="modern-dropdown"
+                                        ),
+                                        html.I(className="fas fa-balance-scale dropdown-icon")
+                                    ], className="dropdown-container")
+                                ], md=4),
+                            ], className="mb-4"),
+
+                            # Modello a fattori dei grafici delle esposizioni
+                            dbc.Row([
+                                dbc.Col([
+                                    html.Label(
+                                        "Modello a fattori",
+                                        className="settings-label"
+                                    ),
+                                    html.Div([
+                                        dcc.Dropdown(
+                                            id='factor-model-dropdown',
+                                            options=factor_model_options(),  # Solo i modelli con i file presenti
+                                            value=DEFAULT_FACTOR_MODEL,
+                                            clearable=False,
+                                            className="modern-dropdown"
+                                        ),
+                                        html.I(className="fas fa-layer-group dropdown-icon")
+                                    ], className="dropdown-container")
+                                ], md=8),
                             ], className="mb-4"),
 
                         ], className="settings-container")
@@ -241,9 +284,7 @@ class LayoutManager:
                         width=12
                     )
                 ]),
-                dcc.Store(id='portfolio-data', storage_type='memory'),  # Aggiungi questo componente
-                dcc.Store(id='assets-data', storage_type='memory'),  # Aggiungi questo componente
-                dcc.Store(id='pesi-correnti', storage_type='memory'),
+                dcc.Store(id='portfolio-data', storage_type='memory'),  # Chiave del risultato nella cache del server
                 dbc.Toast(
                     id="allocation-error-toast",
                     header="Stai superando il 100% di allocazione del tuo portafoglio, rimuovi o modifica le percentuali.",
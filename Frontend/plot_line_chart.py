@@ -1,3 +1,4 @@
+import pandas as pd
 import plotly.graph_objects as go
 empedded_logo = [dict(
             source="assets/newlogo.png",  # Percorso relativo
@@ -172,3 +173,108 @@ def plot_drawdown(portfolio_df, portfolio_color,benchmark_color, column_except_d
     )
 
     return drawdown_fig
+
+
+def plot_rolling_statistics(statistiche):
+    """Tabella della distribuzione dei rendimenti rolling di ogni finestra (da rolling.rolling_statistics)."""
+    def percentuali(colonna):
+        return [f"{valore:.2%}" for valore in statistiche[colonna]]
+
+    table_fig = go.Figure(go.Table(
+        header=dict(
+            values=["Finestra", "Serie", "Minimo", "Mediana", "Massimo", "Mediana annua", "Finestre positive"],
+            fill_color='lightgrey',
+            align='center'
+        ),
+        cells=dict(
+            values=[
+                [f"{finestra} mesi" for finestra in statistiche["window"]],
+                statistiche["series"],
+                percentuali("min"),
+                percentuali("median"),
+                percentuali("max"),
+                percentuali("median_annualized"),
+                percentuali("positive"),
+            ],
+            align='center'
+        )
+    ))
+
+    table_fig.update_layout(
+        title={
+            'text': "Distribuzione dei Rendimenti Rolling",
+            'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'
+        },
+        template='plotly_white',
+        margin=dict(l=40, r=40, t=60, b=20)
+    )
+
+    return table_fig
+
+
+def plot_rolling_metric(column_except_date, metric_df, color_palette, title, yaxis_title, percent=True):
+    """Grafico di una statistica rolling, una linea per serie; con percent i valori sono frazioni da mostrare in %."""
+    metric_fig = go.Figure()
+    scala = 100 if percent else 1
+    unita = "%" if percent else ""
+
+    for i, column in enumerate(column_except_date):
+        metric_fig.add_trace(go.Scatter(
+            x=metric_df["Date"],
+            y=metric_df[column] * scala,
+            mode='lines',
+            name=column,
+            line=dict(color=color_palette[i % len(color_palette)], width=3),
+            hovertemplate=f"<b>%{{fullData.name}}</b><br>Date: %{{x|%Y-%m-%d}}<br>Value: %{{y:.2f}}{unita}<extra></extra>"
+        ))
+
+    metric_fig.update_layout(
+        title={
+            'text': title,
+            'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'
+        },
+        xaxis_title="Data",
+        yaxis_title=yaxis_title,
+        template='plotly_white',
+        legend=dict(title="Legenda", orientation="h", yanchor="bottom", y=-0.3, xanchor="center", x=0.5),
+        margin=dict(l=40, r=40, t=60, b=60),
+        hovermode='x unified'
+    )
+
+    return metric_fig
+
+
+def plot_drawdown_tables(indici, episodi):
+    """Tabelle degli indici di drawdown (frazioni) e degli episodi peggiori, con i mesi già formattati come testo."""
+    def percentuali(valori):
+        return [f"{valore:.2%}" for valore in valori]
+
+    def mesi(valori):
+        return ["-" if pd.isna(valore) else str(valore) for valore in valori]
+
+    indici_fig = go.Figure(go.Table(
+        header=dict(values=["Serie", "Massimo drawdown", "Ulcer index", "Pain index"], fill_color='lightgrey', align='center'),
+        cells=dict(values=[indici["Serie"], percentuali(indici["max_drawdown"]), percentuali(indici["ulcer_index"]),
+                           percentuali(indici["pain_index"])], align='center')
+    ))
+    indici_fig.update_layout(
+        title={'text': "Indici di Drawdown", 'y': 0.9, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'},
+        template='plotly_white',
+        height=250,
+        margin=dict(l=40, r=40, t=60, b=20)
+    )
+
+    episodi_fig = go.Figure(go.Table(
+        header=dict(values=["Serie", "#", "Picco", "Minimo", "Recupero", "Profondità", "Mesi di discesa",
+                            "Mesi di recupero", "Durata (mesi)"], fill_color='lightgrey', align='center'),
+        cells=dict(values=[episodi["series"], episodi["rank"], episodi["peak"], episodi["trough"],
+                           mesi(episodi["recovery"]), percentuali(episodi["depth"]), episodi["decline_months"],
+                           mesi(episodi["recovery_months"]), episodi["duration"]], align='center')
+    ))
+    episodi_fig.update_layout(
+        title={'text': "Peggiori Drawdown", 'y': 0.95, 'x': 0.5, 'xanchor': 'center', 'yanchor': 'top'},
+        template='plotly_white',
+        margin=dict(l=40, r=40, t=60, b=20)
+    )
+
+    return indici_fig, episodi_fig
@@ -0,0 +1,119 @@
+"""
+Ricerca lato server per i dropdown degli ETF.
+
+Invece di inviare al browser tutte le opzioni della lista, il layout parte con i dropdown vuoti
+e un callback restituisce solo i primi risultati per il testo digitato.
+"""
+import heapq
+import os
+from bisect import bisect_left
+
+import pandas as pd
+
+from config import INDEX_LIST_FILE_PATH, ASSET_SEARCH_LIMIT
+
+# Qualità della corrispondenza di un termine cercato con un token: più basso è meglio
+_EXACT, _PREFIX, _SUBSTRING = 0, 1, 2
+
+
+def _tokenize(text):
+    return text.lower().split()
+
+
+def _trigrams(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+class AssetSearchIndex:
+    """
+    Prefix / trigram index over Fund, ISIN and Tickers of the index list.
+
+    A query matches an asset when every whitespace-separated term is a substring of one of its tokens,
+    the same rule the Dash dropdown applies client side, so the options returned are never filtered out
+    again by the browser. Short terms (1-2 characters) are matched by prefix only.
+    """
+
+    def __init__(self, file_path):
+        data = pd.read_csv(file_path, dtype=str).dropna(subset=['Fund']).drop_duplicates(subset=['Fund'])
+        self.options = []
+        postings = {}  # token -> id degli asset che lo contengono
+        for fund, isin, tickers in zip(data['Fund'], data['ISIN'], data['Tickers']):
+            search = " ".join(v for v in (fund, isin, tickers) if isinstance(v, str))
+            asset_id = len(self.options)
+            self.options.append({"label": fund, "value": fund, "search": search})
+            for token in _tokenize(search):
+                postings.setdefault(token, set()).add(asset_id)
+
+        self._tokens = sorted(postings)  # Ordinati per la ricerca per prefisso
+        self._postings = [postings[token] for token in self._tokens]
+        self._by_value = {option["value"]: option for option in self.options}
+        self._trigram_index = {}  # trigramma -> id dei token che lo contengono
+        for token_id, token in enumerate(self._tokens):
+            for trigram in _trigrams(token):
+                self._trigram_index.setdefault(trigram, set()).add(token_id)
+
+    def _matching_tokens(self, term):
+        """Yield (token id, match quality) for every token matched by a single search term."""
+        if len(term) < 3:
+            i = bisect_left(self._tokens, term)
+            while i < len(self._tokens) and self._tokens[i].startswith(term):
+                yield i, _EXACT if self._tokens[i] == term else _PREFIX
+                i += 1
+            return
+
+        candidates = None
+        for trigram in _trigrams(term):
+            token_ids = self._trigram_index.get(trigram)
+            if not token_ids:
+                return
+            candidates = set(token_ids) if candidates is None else candidates & token_ids
+        for token_id in candidates:
+            token = self._tokens[token_id]
+            if token == term:
+                yield token_id, _EXACT
+            elif token.startswith(term):
+                yield token_id, _PREFIX
+            elif term in token:
+                yield token_id, _SUBSTRING
+
+    def search(self, query, limit=ASSET_SEARCH_LIMIT):
+        """
+        Return the options of the best `limit` assets matching `query`.
+
+        Assets are ranked by how well each term matches (exact token, prefix, substring) and then by
+        their position in the index list.
+        """
+        scores = None
+        for term in set(_tokenize(query)):
+            best = {}
+            for token_id, quality in self._matching_tokens(term):
+                for asset_id in self._postings[token_id]:
+                    if quality < best.get(asset_id, _SUBSTRING + 1):
+                        best[asset_id] = quality
+            if scores is None:
+                scores = best
+            else:
+                scores = {asset_id: scores[asset_id] + q for asset_id, q in best.items() if asset_id in scores}
+            if not scores:
+                return []
+        if scores is None:
+            return []
+        top = heapq.nsmallest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return [self.options[asset_id] for asset_id, _ in top]
+
+    def option(self, value):
+        """Opzione corrispondente a un valore già selezionato (None se sconosciuto)."""
+        return self._by_value.get(value)
+
+
+_indexes = {}
+
+
+def get_asset_search(file_path=INDEX_LIST_FILE_PATH):
+    """Restituisce l'indice di ricerca condiviso dal processo, ricostruendolo se il file è stato modificato."""
+    mtime = os.stat(file_path).st_mtime
+    cached = _indexes.get(file_path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, AssetSearchIndex(file_path))
+        _indexes[file_path] = cached
+    return cached[1]
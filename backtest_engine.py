@@ -0,0 +1,221 @@
+"""
+Motore di backtest vettoriale, indipendente da Dash.
+
+Riceve una matrice di rendimenti (mesi x asset) e una matrice di pesi (portafogli x asset) e
+calcola tutte le curve di valore con un solo prodotto matriciale seguito da un prodotto cumulato.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _weight_matrix(pesi, n_assets):
+    pesi = np.atleast_2d(np.asarray(pesi, dtype=np.float64))
+    if pesi.ndim != 2 or pesi.shape[1] != n_assets:
+        raise ValueError(f"Pesi di forma {pesi.shape}: attesi (portafogli x {n_assets} asset)")
+    return pesi
+
+
+# Ribilanciamenti di calendario: ogni quanti mesi i pesi tornano al target
+REBALANCING_PERIODS = {'monthly': 1, 'quarterly': 3, 'annual': 12}
+REBALANCING = ('monthly', 'quarterly', 'annual', 'none', 'threshold')
+REBALANCE_BAND = 0.05  # Scostamento massimo di un peso dal target prima di ribilanciare (modalità 'threshold')
+
+
+def portfolio_returns(rendimenti, pesi):
+    """Rendimenti mensili (T x P) di P portafogli ribilanciati ogni mese ai pesi (P x N, in frazioni)."""
+    rendimenti = np.asarray(rendimenti, dtype=np.float64)
+    return rendimenti @ _weight_matrix(pesi, rendimenti.shape[1]).T
+
+
+def _one_way_turnover(drifted, pesi):
+    """Quota del portafoglio scambiata per tornare ai pesi target: metà della somma degli scostamenti."""
+    return 0.5 * np.abs(drifted - pesi).sum(axis=-1)
+
+
+def monthly_turnover(rendimenti, returns, pesi):
+    """
+    Turnover (T x P) per riportare ogni mese P portafogli ai pesi target.
+
+    Dopo un mese il peso i vale w_i (1 + r_i) / (1 + r_p), quindi dista dal target w_i |r_i - r_p| / (1 + r_p).
+    Il totale di una finestra è la somma delle sue righe tranne l'ultima.
+    """
+    deviation = np.abs(rendimenti[:, None, :] - returns[:, :, None]) * pesi
+    return 0.5 * deviation.sum(axis=2) / (1 + returns)
+
+
+def _calendar(rendimenti, pesi, starts):
+    """
+    Buy and hold dentro ogni segmento, ritorno ai pesi target all'inizio del successivo.
+
+    Nel segmento ogni asset cresce del suo rendimento cumulato dall'inizio, quindi il percorso è un prodotto
+    matriciale per riga; i segmenti si concatenano con il prodotto delle loro crescite finali.
+    """
+    growth = np.cumprod(1 + rendimenti, axis=0)
+    segment = np.cumsum(starts) - 1
+    start_rows = np.flatnonzero(starts)
+    growth_before = np.vstack([np.ones(growth.shape[1]), growth])[start_rows]  # Crescita alla vigilia del segmento
+    asset_growth = growth / growth_before[segment]
+    portfolio_growth = asset_growth @ pesi.T
+
+    end_rows = np.append(start_rows[1:] - 1, len(rendimenti) - 1)
+    chained = np.vstack([np.ones(pesi.shape[0]), np.cumprod(portfolio_growth[end_rows[:-1]], axis=0)])
+    values = chained[segment] * portfolio_growth
+    returns = values / np.vstack([np.ones(pesi.shape[0]), values[:-1]]) - 1
+
+    # Pesi raggiunti alla fine di ogni segmento che precede un ribilanciamento
+    rebalance_rows = end_rows[:-1]
+    drifted = pesi * asset_growth[rebalance_rows][:, None, :] / portfolio_growth[rebalance_rows][:, :, None]
+    turnover = _one_way_turnover(drifted, pesi).sum(axis=0)
+    return returns, turnover
+
+
+def _threshold(rendimenti, pesi, band):
+    """Ribilancia un portafoglio solo quando un peso si scosta dal target di più di `band` (ciclo sui mesi, vettoriale sui portafogli)."""
+    holdings = pesi.copy()
+    value = np.ones(pesi.shape[0])
+    returns = np.empty((len(rendimenti), pesi.shape[0]))
+    turnover = np.zeros(pesi.shape[0])
+    for t, asset_returns in enumerate(rendimenti):
+        holdings *= 1 + asset_returns
+        new_value = holdings.sum(axis=1)
+        returns[t] = new_value / value - 1
+        value = new_value
+        drifted = holdings / value[:, None]
+        breach = (np.abs(drifted - pesi) > band).any(axis=1)
+        if t < len(rendimenti) - 1 and breach.any():
+            turnover[breach] += _one_way_turnover(drifted[breach], pesi[breach])
+            holdings[breach] = pesi[breach] * value[breach, None]
+    return returns, turnover
+
+
+def simulate(rendimenti, pesi, rebalancing='monthly', months=None, band=REBALANCE_BAND):
+    """
+    Rendimenti (T x P) e turnover annuo di P portafogli con una politica di ribilanciamento (vedi REBALANCING).
+
+    I pesi target si comprano all'inizio del primo mese. months (indici di mese di time_axis) colloca i
+    ribilanciamenti trimestrali e annuali sul calendario; con None i periodi si contano dalla prima riga.
+    """
+    rendimenti = np.asarray(rendimenti, dtype=np.float64)
+    pesi = _weight_matrix(pesi, rendimenti.shape[1])
+    if rebalancing not in REBALANCING:
+        raise ValueError(f"Ribilanciamento '{rebalancing}' non valido: scegli tra {', '.join(REBALANCING)}")
+    if len(rendimenti) == 0:
+        return np.empty((0, pesi.shape[0])), np.zeros(pesi.shape[0])
+    months = np.arange(len(rendimenti)) if months is None else np.asarray(months)
+    years = len(rendimenti) / 12
+
+    if rebalancing == 'threshold':
+        returns, turnover = _threshold(rendimenti, pesi, band)
+        return returns, turnover / years
+
+    if rebalancing == 'monthly':
+        returns = portfolio_returns(rendimenti, pesi)
+        # Nessun ribilanciamento dopo l'ultimo mese
+        return returns, monthly_turnover(rendimenti, returns, pesi)[:-1].sum(axis=0) / years
+
+    starts = np.zeros(len(rendimenti), dtype=bool)
+    starts[0] = True
+    if rebalancing != 'none':
+        starts |= months % REBALANCING_PERIODS[rebalancing] == 0
+    returns, turnover = _calendar(rendimenti, pesi, starts)
+    return returns, turnover / years
+
+
+def equity_curves(rendimenti, pesi, base=100.0, rebalancing='monthly', months=None, band=REBALANCE_BAND):
+    """Valore (T x P) dei portafogli dopo il rendimento di ogni mese, partendo da `base` (vedi simulate)."""
+    returns, _ = simulate(rendimenti, pesi, rebalancing, months, band)
+    return base * np.cumprod(1 + returns, axis=0)
+
+
+def run_backtest(rendimenti, pesi, nomi=None, base=100.0, rebalancing='monthly', band=REBALANCE_BAND,
+                 start_month=None):
+    """
+    Curve di valore (una colonna per portafoglio) e turnover annuo di più portafogli sugli stessi rendimenti.
+
+    I pesi seguono l'ordine delle colonne di `rendimenti`. Con start_month le curve partono da una riga che vale
+    `base` nel mese di acquisto.
+    """
+    returns, turnover = simulate(rendimenti.to_numpy(), pesi, rebalancing, rendimenti.index.to_numpy(), band)
+    curves = pd.DataFrame(base * np.cumprod(1 + returns, axis=0), index=rendimenti.index, columns=nomi)
+    if start_month is not None:
+        curves = pd.concat([pd.DataFrame(base, index=pd.Index([start_month], name=curves.index.name),
+                                         columns=curves.columns), curves])
+    return curves, pd.Series(turnover, index=curves.columns)
+
+
+class CumulativeGrowth:
+    """
+    Crescita logaritmica cumulata di una o più serie sull'asse dei mesi.
+
+    Il valore nel mese m riscalato a `base` nel mese b è base * exp(L[m] - L[b]): una nuova finestra costa due
+    ricerche e una sottrazione, qualunque sia la lunghezza della storia.
+    """
+
+    def __init__(self, months, log_growth, columns):
+        self.months = np.asarray(months)
+        self.log_growth = np.asarray(log_growth, dtype=np.float64).reshape(len(self.months), -1)
+        self.columns = list(columns)
+
+    @classmethod
+    def from_returns(cls, rendimenti, base_month):
+        """Da rendimenti mensili indicizzati per mese; `base_month` è il mese prima del primo rendimento."""
+        log_growth = np.vstack([np.zeros(rendimenti.shape[1]), np.cumsum(np.log1p(rendimenti.to_numpy()), axis=0)])
+        return cls(np.append(base_month, rendimenti.index.to_numpy()), log_growth, rendimenti.columns)
+
+    @classmethod
+    def from_prices(cls, prezzi):
+        """Da prezzi (o valori normalizzati) indicizzati per mese."""
+        return cls(prezzi.index.to_numpy(), np.log(prezzi.to_numpy()), prezzi.columns)
+
+    def window(self, start=None, end=None, base_month=None, base=100.0):
+        """Valori nei mesi [start, end] (None: tutta la storia), pari a `base` in base_month (default il primo)."""
+        i = 0 if start is None else int(np.searchsorted(self.months, start))
+        j = len(self.months) if end is None else int(np.searchsorted(self.months, end, side='right'))
+        k = i if base_month is None else int(np.searchsorted(self.months, base_month))
+        return pd.DataFrame(base * np.exp(self.log_growth[i:j] - self.log_growth[k]),
+                            index=pd.Index(self.months[i:j], name='Month'), columns=self.columns)
+
+
+def rebase(frame, base=100.0):
+    """Riscala ogni colonna in modo che la prima riga valga `base`."""
+    return frame / frame.iloc[0] * base
+
+
+def join_benchmark(curves, benchmark, nome='Benchmark'):
+    """Affianca alle curve il benchmark sui mesi comuni, riscalando tutto a 100 nel primo."""
+    joined = curves.join(benchmark.rename(nome), how='inner')
+    return rebase(joined)
+
+
+def value_metrics(valori, periodi_anno=12):
+    """
+    Metriche di K serie di valori (T x K) in un solo passaggio vettoriale.
+
+    CAGR, volatilità annua, Sharpe (CAGR su volatilità, 0 se questa è nulla) e massimo drawdown sono frazioni;
+    time_under_water è il tratto più lungo, in periodi, passato sotto un massimo precedente.
+    """
+    valori = np.asarray(valori, dtype=np.float64)
+    if valori.ndim == 1:
+        valori = valori[:, None]
+    ritorni = valori[1:] / valori[:-1] - 1
+    cagr = (valori[-1] / valori[0]) ** (periodi_anno / len(ritorni)) - 1
+    volatility = ritorni.std(axis=0, ddof=1) * np.sqrt(periodi_anno)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility != 0, cagr / volatility, 0.0)
+
+    peaks = np.maximum.accumulate(valori, axis=0)
+    max_drawdown = (valori / peaks - 1).min(axis=0)
+    # Durata di ogni tratto sott'acqua: distanza dall'ultimo periodo in cui la serie era sul massimo
+    tempo = np.arange(len(valori))[:, None]
+    ultimo_massimo = np.maximum.accumulate(np.where(valori >= peaks, tempo, 0), axis=0)
+    time_under_water = (tempo - ultimo_massimo).max(axis=0)
+    return {"cagr": cagr, "volatility": volatility, "sharpe": sharpe, "max_drawdown": max_drawdown,
+            "time_under_water": time_under_water}
+
+
+def performance_metrics(rendimenti):
+    """Metriche di value_metrics per P portafogli dai loro rendimenti mensili (T x P)."""
+    rendimenti = np.asarray(rendimenti, dtype=np.float64)
+    # Il valore iniziale 1 fa contare anche una perdita nel primo mese
+    growth = np.cumprod(np.vstack([np.zeros(rendimenti.shape[1]), rendimenti]) + 1, axis=0)
+    return value_metrics(growth)
@@ -0,0 +1,365 @@
+"""
+Micro-benchmark per le parti più calde del backtester.
+
+Uso:
+    python benchmark.py allineamento
+    python benchmark.py ricerca
+    python benchmark.py backtest
+    python benchmark.py payload
+    python benchmark.py coalescenza
+    python benchmark.py drawdown
+    python benchmark.py regressione
+    python benchmark.py fattori
+    python benchmark.py frontiera
+    python benchmark.py campionamento
+"""
+import argparse
+import json
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import backtest_engine
+import critical_line
+import drawdown
+import frontier_sampling
+import factor_models
+import factor_regression
+import store_codec
+from asset_search import AssetSearchIndex
+from config import ETF_BASE_PATH, INDEX_LIST_FILE_PATH
+from imports_handler import importa_rendimenti
+from price_store import read_series, align_series, get_price_store
+from time_axis import parse_months
+
+
+def _cronometra(func, ripetizioni):
+    """Restituisce il tempo medio in millisecondi di `ripetizioni` chiamate a func."""
+    start = time.perf_counter()
+    for _ in range(ripetizioni):
+        func()
+    return (time.perf_counter() - start) / ripetizioni * 1000
+
+
+def _store():
+    """Store dei prezzi: i benchmark sui dati reali lo richiedono già costruito."""
+    store = get_price_store()
+    if store is None:
+        raise SystemExit("Store dei prezzi assente: esegui prima `python build_data.py`")
+    return store
+
+
+def _indici_aggiornati(numero=None):
+    """I primi `numero` indici aggiornati negli ultimi due anni, dalla storia più lunga."""
+    store = _store()
+    ultimo = store.last_row.max()
+    nomi = sorted((nome for nome, j in store.columns.items() if store.last_row[j] >= ultimo - 24),
+                  key=lambda nome: store.first_row[store.columns[nome]])
+    return nomi[:numero]
+
+
+def _rendimento_e_covarianza(rendimenti):
+    """CAGR e covarianza annualizzati degli indici, come in calcola_frontiera_efficente."""
+    mu = ((1 + rendimenti).prod() ** (12 / len(rendimenti)) - 1).to_numpy()
+    return mu, rendimenti.cov().to_numpy() * 12
+
+
+def _allinea_concat(frames):
+    """Vecchio allineamento di importa_dati: un pd.concat per ogni asset."""
+    dati = None
+    for frame in frames:
+        dati = frame if dati is None else pd.concat([dati, frame], axis=1)
+    return dati.dropna()
+
+
+def bench_allineamento(numero_asset=(1, 5, 10, 20, 30, 50, 100), ripetizioni=20):
+    """Confronta il pd.concat ripetuto con l'allineamento in un solo passaggio al crescere degli asset."""
+    paths = sorted(p for p in Path(ETF_BASE_PATH).glob("*.csv") if p.stat().st_size > 0)
+    serie = [read_series(p) for p in paths[:max(numero_asset)]]
+    frames = [
+        pd.DataFrame({p.stem: values}, index=pd.DatetimeIndex(months.astype('datetime64[ns]'), name='Date'))
+        for p, (months, values) in zip(paths, serie)
+    ]
+
+    print(f"{'asset':>6} {'concat (ms)':>12} {'single-pass (ms)':>17} {'speedup':>8}")
+    for k in numero_asset:
+        t_concat = _cronometra(lambda: _allinea_concat(frames[:k]), ripetizioni)
+        t_align = _cronometra(lambda: align_series(serie[:k]), ripetizioni)
+        print(f"{k:>6} {t_concat:>12.2f} {t_align:>17.2f} {t_concat / t_align:>7.1f}x")
+
+
+def bench_ricerca(query=('s', 'ie', 'spy', 'msci world', 'IE00B4L5', 'vanguard ftse all', 'xyz'), ripetizioni=200):
+    """Peso delle opzioni inviate al browser e latenza della ricerca indicizzata rispetto a una scansione lineare."""
+    index = AssetSearchIndex(INDEX_LIST_FILE_PATH)
+    peso_tutte = len(json.dumps(index.options))
+    print(f"Opzioni nel layout iniziale: {len(index.options)} ({peso_tutte / 1024:.0f} KB per dropdown) -> 0")
+
+    def scansione(q):
+        termini = q.lower().split()
+        return [o for o in index.options if all(t in o["search"].lower() for t in termini)]
+
+    print(f"{'query':>18} {'risultati':>9} {'KB':>6} {'scansione (ms)':>15} {'indice (ms)':>12}")
+    for q in query:
+        risultati = index.search(q)
+        t_scan = _cronometra(lambda: scansione(q), ripetizioni)
+        t_index = _cronometra(lambda: index.search(q), ripetizioni)
+        print(f"{q!r:>18} {len(risultati):>9} {len(json.dumps(risultati)) / 1024:>6.1f} {t_scan:>15.3f} {t_index:>12.3f}")
+
+
+def _backtest_pandas(rendimenti, pesi):
+    """Vecchio calcolo del callback, ripetuto per ogni portafoglio."""
+    curve = []
+    for w in pesi:
+        scalati = rendimenti * w
+        curve.append(100 * (1 + scalati.sum(axis=1)).cumprod())
+    return curve
+
+
+def bench_backtest(indici=('MSCI World', 'MSCI Emerging Markets', 'Gold spot price', 'S&P 500'),
+                   numero_portafogli=(1, 10, 100, 1000), ripetizioni=5):
+    """Curve di P portafogli: un ciclo pandas per portafoglio contro un solo prodotto matriciale."""
+    rendimenti = importa_rendimenti(list(indici))
+    rng = np.random.default_rng(0)
+    print(f"{len(rendimenti)} mesi, {len(indici)} asset")
+    print(f"{'portafogli':>10} {'pandas (ms)':>12} {'engine (ms)':>12} {'speedup':>8}")
+    for p in numero_portafogli:
+        pesi = rng.dirichlet(np.ones(len(indici)), size=p)
+        t_pandas = _cronometra(lambda: _backtest_pandas(rendimenti, pesi), ripetizioni)
+        t_engine = _cronometra(lambda: backtest_engine.run_backtest(rendimenti, pesi), ripetizioni)
+        print(f"{p:>10} {t_pandas:>12.2f} {t_engine:>12.2f} {t_pandas / t_engine:>7.1f}x")
+
+
+def bench_payload(numero_asset=20, anni=25, ripetizioni=50):
+    """Dimensione e tempo di (de)serializzazione degli Store: lista di record contro codifica colonnare."""
+    rng = np.random.default_rng(0)
+    mesi = pd.Index(np.arange(anni * 12, dtype=np.int32) + 1200, name='Month')
+    dati = pd.DataFrame(100 * np.cumprod(1 + rng.normal(0.006, 0.04, (len(mesi), numero_asset)), axis=0),
+                        index=mesi, columns=[f"Indice {i}" for i in range(numero_asset)])
+
+    formati = {
+        'records': (lambda: json.dumps(dati.reset_index().to_dict('records')),
+                    lambda testo: pd.DataFrame(json.loads(testo))),
+        'colonnare float64': (lambda: json.dumps(store_codec.encode_frame(dati)),
+                              lambda testo: store_codec.decode_frame(json.loads(testo))),
+        'colonnare float32': (lambda: json.dumps(store_codec.encode_frame(dati, np.float32)),
+                              lambda testo: store_codec.decode_frame(json.loads(testo))),
+    }
+    print(f"{anni} anni x {numero_asset} asset")
+    print(f"{'formato':>18} {'KB':>8} {'codifica (ms)':>14} {'decodifica (ms)':>16}")
+    for nome, (codifica, decodifica) in formati.items():
+        testo = codifica()
+        t_codifica = _cronometra(codifica, ripetizioni)
+        t_decodifica = _cronometra(lambda: decodifica(testo), ripetizioni)
+        print(f"{nome:>18} {len(testo) / 1024:>8.1f} {t_codifica:>14.2f} {t_decodifica:>16.2f}")
+
+
+def bench_coalescenza(utenti=(1, 10, 50), ripetizioni=3):
+    """Stesso portafoglio inviato insieme da più utenti a cache vuota: calcoli eseguiti e richieste accodate."""
+    import portfolio_pilot
+    from cache import SingleFlight
+    from result_cache import ResultCache
+
+    richiesta = {'etf': ['iShares Core MSCI World UCITS ETF', 'iShares MSCI Emerging Markets UCITS ETF'],
+                 'percentuali': [70.0, 30.0], 'benchmark': None, 'anni': [1970, 2024], 'rebalancing': 'monthly'}
+    calcola = portfolio_pilot._calcola_portafoglio
+    calcoli = []
+
+    def conta(r):
+        calcoli.append(1)
+        return calcola(r)
+
+    portfolio_pilot._calcola_portafoglio = conta
+    print(f"{'utenti':>6} {'calcoli':>8} {'accodate':>9} {'tempo (ms)':>11}")
+    try:
+        for n in utenti:
+            tempi = []
+            for _ in range(ripetizioni):
+                portfolio_pilot._risultati = ResultCache(path=None)
+                portfolio_pilot._in_corso = SingleFlight()
+                portfolio_pilot._cache_backtest.clear()
+                calcoli.clear()
+                threads = [threading.Thread(target=portfolio_pilot._risultato_portafoglio, args=(richiesta,))
+                           for _ in range(n)]
+                start = time.perf_counter()
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                tempi.append((time.perf_counter() - start) * 1000)
+            stats = portfolio_pilot._in_corso.stats()
+            print(f"{n:>6} {len(calcoli):>8} {stats['coalesced']:>9} {np.mean(tempi):>11.2f}")
+    finally:
+        portfolio_pilot._calcola_portafoglio = calcola
+
+
+def _episodi_ciclo(valori):
+    """Estrazione degli episodi con un ciclo Python sui mesi, una serie alla volta."""
+    episodi = []
+    for serie in valori.T:
+        massimo, inizio, minimo = np.nan, None, None
+        for i, valore in enumerate(serie):
+            if np.isnan(valore):
+                continue
+            if not valore < massimo:
+                if inizio is not None:
+                    episodi.append((inizio, minimo, i))
+                massimo, inizio = valore, None
+            elif inizio is None or valore < serie[minimo]:
+                inizio, minimo = (i if inizio is None else inizio), i
+        if inizio is not None:
+            episodi.append((inizio, minimo, None))
+    return episodi
+
+
+def bench_drawdown(ripetizioni=5):
+    """Episodi di drawdown e indici di dolore di tutto l'universo dello store: ciclo sui mesi contro estrazione vettoriale."""
+    store = _store()
+    valori = np.asarray(store.prices, dtype=np.float64)
+    nomi = sorted(store.columns, key=store.columns.get)
+    print(f"{valori.shape[1]} indici, {valori.shape[0]} mesi")
+    t_ciclo = _cronometra(lambda: _episodi_ciclo(valori), 1)
+    t_vettoriale = _cronometra(lambda: drawdown.drawdown_episodes(valori, store.months, nomi), ripetizioni)
+    t_indici = _cronometra(lambda: drawdown.pain_indices(valori), ripetizioni)
+    episodi = drawdown.drawdown_episodes(valori, store.months, nomi)
+    print(f"{len(episodi)} episodi: ciclo {t_ciclo:.1f} ms, vettoriale {t_vettoriale:.1f} ms "
+          f"({t_ciclo / t_vettoriale:.0f}x); Ulcer e pain index {t_indici:.1f} ms")
+
+
+def _regressione_summary(serie, model):
+    """Vecchia calculate_factor_exposure: OLS di statsmodels e coefficienti riletti dalla tabella del summary."""
+    import statsmodels.api as sm
+
+    excess, X, _ = factor_regression._common_sample(serie.to_frame(), model)
+    risultati = sm.OLS(excess[:, 0], sm.add_constant(X)).fit()
+    tabella = risultati.summary().tables[1]
+    return [float(riga[1].data.strip()) for riga in tabella[1:]]
+
+
+def bench_regressione(indici=('MSCI World', 'S&P 500', 'MSCI Emerging Markets', 'Gold spot price'),
+                      numero_serie=(2, 10, 100), ripetizioni=5):
+    """Regressione sui fattori: un OLS di statsmodels per serie contro una sola risoluzione QR per tutte."""
+    model = factor_models.get_factor_model()
+    base = importa_rendimenti(list(indici))
+    rng = np.random.default_rng(0)
+    print(f"{len(base)} mesi; scarto massimo da statsmodels: {factor_regression.verify_with_statsmodels(base, model):.1e}")
+    print(f"{'serie':>6} {'statsmodels (ms)':>17} {'numpy (ms)':>11} {'speedup':>8}")
+    for k in numero_serie:
+        pesi = rng.dirichlet(np.ones(len(indici)), size=k)
+        rendimenti = pd.DataFrame(base.to_numpy() @ pesi.T, index=base.index)
+        t_summary = _cronometra(lambda: [_regressione_summary(rendimenti[c], model) for c in rendimenti], ripetizioni)
+        t_numpy = _cronometra(lambda: factor_regression.factor_regression(rendimenti, model), ripetizioni)
+        print(f"{k:>6} {t_summary:>17.2f} {t_numpy:>11.2f} {t_summary / t_numpy:>7.0f}x")
+
+
+def _fattori_da_csv():
+    """Vecchia import_fama_french: il CSV dei fattori riletto e convertito a ogni regressione."""
+    fattori = pd.read_csv(factor_models.model_files(factor_models.available_models()[0])[0], dtype={'Date': str})
+    fattori.index = pd.Index(parse_months(fattori.pop('Date').to_numpy()), name='Month')
+    return fattori / 100
+
+
+def bench_fattori(indici=('MSCI World', 'S&P 500'), ripetizioni=20):
+    """Fattori riletti dal CSV a ogni richiesta contro il modello caricato una volta, e regressione su tutti i modelli."""
+    base = importa_rendimenti(list(indici))
+    t_csv = _cronometra(_fattori_da_csv, ripetizioni)
+    t_cache = _cronometra(factor_models.get_factor_model, ripetizioni)
+    print(f"Caricamento dei fattori: CSV {t_csv:.2f} ms, modello in cache {t_cache:.3f} ms ({t_csv / t_cache:.0f}x)")
+    modelli = factor_models.available_models()
+    t_tutti = _cronometra(lambda: factor_regression.factor_regressions(base, modelli), ripetizioni)
+    print(f"{len(base)} mesi, {len(indici)} serie, {len(modelli)} modelli ({', '.join(modelli)}): {t_tutti:.2f} ms")
+
+
+def _frontiera_monte_carlo(mu, cov, simboli, numero_portafogli=5000):
+    """Vecchia calcola_frontiera_efficente: pesi casuali uniformi e portafogli migliori tra quelli estratti."""
+    weights = np.random.random((numero_portafogli, len(mu)))
+    weights /= weights.sum(axis=1, keepdims=True)
+    returns = weights @ mu
+    std_devs = np.sqrt(np.einsum('ij,ji->i', weights @ cov, weights.T))
+    risultati = pd.DataFrame({'Annual Return': returns, 'Annual Volatility': std_devs, 'Sharpe Ratio': returns / std_devs})
+    for i, simbolo in enumerate(simboli):
+        risultati[f'{simbolo} Weight'] = weights[:, i]
+    return risultati.iloc[[np.argmax(returns / std_devs), np.argmin(std_devs), np.argmax(returns)]]
+
+
+def bench_frontiera(numero_asset=(3, 10, 25, 50), ripetizioni=5):
+    """Frontiera efficiente: 5000 portafogli casuali contro i portafogli d'angolo esatti del Critical Line Algorithm."""
+    store = _store()
+    nomi = _indici_aggiornati(max(numero_asset))
+    np.random.seed(0)
+    print(f"{'asset':>6} {'mesi':>5} {'Monte Carlo (ms)':>17} {'CLA (ms)':>9} {'angoli':>7} "
+          f"{'Sharpe MC':>10} {'Sharpe esatto':>14} {'vol. min MC':>12} {'vol. min esatta':>16}")
+    for n in numero_asset:
+        rendimenti = store.returns(nomi[:n])
+        mu, cov = _rendimento_e_covarianza(rendimenti)
+        t_mc = _cronometra(lambda: _frontiera_monte_carlo(mu, cov, rendimenti.columns), ripetizioni)
+        t_cla = _cronometra(lambda: (lambda c: (critical_line.max_sharpe(c, mu, cov),
+                                                critical_line.frontier_points(c, mu, cov)))(critical_line.critical_line(mu, cov)),
+                            ripetizioni)
+        mc = _frontiera_monte_carlo(mu, cov, rendimenti.columns)
+        angoli = critical_line.critical_line(mu, cov)
+        tangente = critical_line.max_sharpe(angoli, mu, cov)
+        print(f"{n:>6} {len(rendimenti):>5} {t_mc:>17.2f} {t_cla:>9.2f} {len(angoli['weights']):>7} "
+              f"{mc['Sharpe Ratio'].iloc[0]:>10.3f} {tangente @ mu / np.sqrt(tangente @ cov @ tangente):>14.3f} "
+              f"{mc['Annual Volatility'].iloc[1]:>12.2%} {angoli['volatility'][-1]:>16.2%}")
+
+
+def _picco_memoria(func):
+    """Tempo in millisecondi e picco di memoria in MB allocata da NumPy durante una chiamata a func."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    durata = (time.perf_counter() - start) * 1000
+    picco = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return durata, picco
+
+
+def bench_campionamento(numero_asset=50, campioni=(5000, 100_000, 1_000_000), limite_matrice=100_000):
+    """Nuvola di portafogli casuali: matrice completa dei pesi contro estrazione a blocchi di frontier_sampling."""
+    rendimenti = _store().returns(_indici_aggiornati(numero_asset))
+    mu, cov = _rendimento_e_covarianza(rendimenti)
+    angoli = critical_line.critical_line(mu, cov)
+    tangente = critical_line.max_sharpe(angoli, mu, cov)
+    print(f"{numero_asset} asset, Sharpe esatto {tangente @ mu / np.sqrt(tangente @ cov @ tangente):.3f}")
+    print(f"{'portafogli':>11} {'matrice (ms)':>13} {'matrice (MB)':>13} {'blocchi (ms)':>13} {'blocchi (MB)':>13} "
+          f"{'Sobol (ms)':>11} {'Sharpe blocchi':>15} {'Sharpe Sobol':>13}")
+    frontier_sampling.sample_frontier(mu, cov, 1, metodo="sobol")  # Import di scipy fuori dalle misure
+    np.random.seed(0)
+    for numero in campioni:
+        # La matrice completa oltre il limite occupa gigabyte: viene saltata
+        matrice = _picco_memoria(lambda: _frontiera_monte_carlo(mu, cov, rendimenti.columns, numero)) \
+            if numero <= limite_matrice else (np.nan, np.nan)
+        risultati = {}
+        tempi = {}
+        for metodo in frontier_sampling.METHODS:
+            tempi[metodo] = _picco_memoria(lambda: risultati.__setitem__(
+                metodo, frontier_sampling.sample_frontier(mu, cov, numero, metodo=metodo, seed=0)))
+        sharpe = {metodo: (lambda w: w @ mu / np.sqrt(w @ cov @ w))(r["weights"][0]) for metodo, r in risultati.items()}
+        print(f"{numero:>11,} {matrice[0]:>13.0f} {matrice[1]:>13.1f} {tempi['dirichlet'][0]:>13.0f} "
+              f"{tempi['dirichlet'][1]:>13.1f} {tempi['sobol'][0]:>11.0f} {sharpe['dirichlet']:>15.3f} "
+              f"{sharpe['sobol']:>13.3f}")
+
+
+BENCHMARKS = {
+    'allineamento': bench_allineamento,
+    'ricerca': bench_ricerca,
+    'backtest': bench_backtest,
+    'payload': bench_payload,
+    'coalescenza': bench_coalescenza,
+    'drawdown': bench_drawdown,
+    'regressione': bench_regressione,
+    'fattori': bench_fattori,
+    'frontiera': bench_frontiera,
+    'campionamento': bench_campionamento,
+}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('nome', choices=sorted(BENCHMARKS), help="Benchmark da eseguire")
+    args = parser.parse_args()
+    BENCHMARKS[args.nome]()
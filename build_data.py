@@ -0,0 +1,228 @@
+"""
+Build offline dello store dei prezzi a partire da data/ETFs.
+
+Valida ogni serie, rimuove i duplicati, riempie i buchi e scrive lo store memory-mapped
+insieme a un manifest (primo/ultimo mese, numero di righe e SHA-256 di ogni file) e alle somme
+delle regressioni di ogni indice sui modelli a fattori disponibili (vedi factor_models).
+Il nuovo store diventa attivo con un solo swap atomico: il codice che serve le richieste
+non deve più validare nulla.
+
+Uso:
+    python build_data.py [--strict] [--etf-dir DIR] [--store-dir DIR] [--index-list FILE]
+"""
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import ETF_BASE_PATH, INDEX_LIST_FILE_PATH, PRICE_STORE_PATH
+from factor_models import available_models, get_factor_model, model_files
+from factor_regression import normal_equation_sums
+from price_store import (STORE_VERSION, MANIFEST_FILE, FACTOR_DESIGN_FILE, FACTOR_CROSS_FILE, FACTOR_SCALE_FILE,
+                         current_store_dir, read_manifest, store_version, write_store)
+from time_axis import format_month, parse_months
+
+
+class SeriesError(Exception):
+    """Serie non utilizzabile: viene esclusa dallo store."""
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def validate_series(path):
+    """
+    Read and clean one CSV of data/ETFs.
+
+    Returns:
+        tuple: (months, values, info) with gap-free, strictly increasing months; `info` is the manifest entry
+        of the series, including the list of warnings raised while cleaning it.
+
+    Raises:
+        SeriesError: if the file cannot be turned into a usable series.
+    """
+    name = path.stem
+    warnings = []
+    if path.stat().st_size == 0:
+        raise SeriesError("file vuoto")
+
+    df = pd.read_csv(path, dtype={'Date': str})
+    if list(df.columns[:1]) != ['Date'] or len(df.columns) != 2:
+        raise SeriesError(f"colonne inattese {list(df.columns)}, attese ['Date', '{name}']")
+    header = df.columns[1]
+    if header != name:
+        warnings.append(f"intestazione '{header}' diversa dal nome dell'indice, rinominata")
+
+    try:
+        months = parse_months(df['Date'].to_numpy())
+    except ValueError as e:
+        raise SeriesError(str(e))
+    values = pd.to_numeric(df[header], errors='coerce').to_numpy(dtype=np.float64)
+
+    invalid = ~np.isfinite(values) | (values <= 0)
+    if invalid.any():
+        warnings.append(f"{int(invalid.sum())} valori mancanti o non positivi rimossi")
+        months, values = months[~invalid], values[~invalid]
+    if len(months) == 0:
+        raise SeriesError("nessun valore valido")
+
+    # Ordina per mese e tiene l'ultima riga per ogni mese duplicato
+    order = np.argsort(months, kind='stable')
+    months, values = months[order], values[order]
+    last_of_month = np.append(months[1:] != months[:-1], True)
+    duplicates = int((~last_of_month).sum())
+    if duplicates:
+        warnings.append(f"{duplicates} mesi duplicati rimossi")
+        months, values = months[last_of_month], values[last_of_month]
+
+    # Riempie i buchi con l'ultimo valore disponibile (rendimento nullo nei mesi mancanti)
+    calendar = np.arange(months[0], months[-1] + 1, dtype=months.dtype)
+    filled = len(calendar) - len(months)
+    if filled:
+        warnings.append(f"{filled} mesi mancanti riempiti con il valore precedente")
+        values = values[np.searchsorted(months, calendar, side='right') - 1]
+        months = calendar
+
+    info = {
+        "file": path.name,
+        "sha256": _sha256(path),
+        "first_month": format_month(months[0]),
+        "last_month": format_month(months[-1]),
+        "rows": int(len(months)),
+        "duplicates_removed": duplicates,
+        "months_filled": filled,
+        "warnings": warnings,
+    }
+    return months, values, info
+
+
+def build(etf_dir=ETF_BASE_PATH, store_dir=PRICE_STORE_PATH, index_list=INDEX_LIST_FILE_PATH, strict=False):
+    """
+    Validate every series and swap in a new store.
+
+    Returns:
+        dict: the manifest; its "version_dir" is None, with the reason in "aborted", when no series is valid or
+        when `strict` is set and some series had errors, in which case nothing is written.
+    """
+    started = time.perf_counter()
+    etf_dir = Path(etf_dir)
+    names, series, assets, errors = [], [], {}, {}
+    for path in sorted(etf_dir.glob("*.csv")):
+        try:
+            months, values, info = validate_series(path)
+        except SeriesError as e:
+            errors[path.name] = str(e)
+            continue
+        except Exception as e:  # File illeggibile o malformato: si esclude solo lui, la build continua
+            errors[path.name] = f"{type(e).__name__}: {e}"
+            continue
+        names.append(path.stem)
+        series.append((months, values))
+        assets[path.stem] = info
+
+    indici_lista = set(pd.read_csv(index_list, usecols=['Index'])['Index'])
+    manifest = {
+        "version": STORE_VERSION,
+        "built_at": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "source": str(etf_dir),
+        "assets": assets,
+        "errors": errors,
+        "missing_files": sorted(indici_lista - set(names)),
+        "unlisted_files": sorted(set(names) - indici_lista),
+    }
+    if strict and errors:
+        manifest["version_dir"] = None
+        manifest["aborted"] = "ci sono serie con errori (--strict)"
+        return manifest
+    if not series:
+        manifest["version_dir"] = None
+        manifest["aborted"] = "nessuna serie valida"
+        return manifest
+
+    start = min(months[0] for months, _ in series)
+    end = max(months[-1] for months, _ in series)
+    calendar = np.arange(start, end + 1, dtype=series[0][0].dtype)
+    prices = np.full((len(calendar), len(series)), np.nan, order='F')
+    for j, (months, values) in enumerate(series):
+        prices[months - start, j] = values
+
+    # Regressioni di ogni indice su ogni modello a fattori, per qualsiasi finestra di mesi: il dashboard fa solo
+    # un prodotto scalare
+    arrays = {}
+    manifest["factors"] = {}
+    returns = np.full_like(prices, np.nan)
+    returns[1:] = prices[1:] / prices[:-1] - 1
+    for name in available_models():
+        model = get_factor_model(name)
+        sums = normal_equation_sums(returns, calendar, model)
+        arrays.update({FACTOR_DESIGN_FILE.format(model=name): sums["design"],
+                       FACTOR_CROSS_FILE.format(model=name): sums["cross"],
+                       FACTOR_SCALE_FILE.format(model=name): sums["scale"]})
+        manifest["factors"][name] = {"factors": model.factors, "files": model.files}
+
+    manifest["version_dir"] = write_store(names, calendar, prices, manifest, store_dir, arrays=arrays).name
+    manifest["seconds"] = round(time.perf_counter() - started, 2)
+    return manifest
+
+
+def is_store_stale(etf_dir=ETF_BASE_PATH, store_dir=PRICE_STORE_PATH):
+    """
+    True se lo store manca, è in un formato vecchio, se un CSV o i fattori sono stati modificati dopo l'ultima
+    build o se i modelli a fattori disponibili sono cambiati.
+    """
+    if store_version(store_dir) != STORE_VERSION:
+        return True
+    if set(read_manifest(store_dir).get("factors", {})) != set(available_models()):
+        return True
+    built_at = (current_store_dir(store_dir) / MANIFEST_FILE).stat().st_mtime
+    sorgenti = [*Path(etf_dir).glob("*.csv"), *{path for name in available_models() for path in model_files(name)}]
+    return any(path.exists() and path.stat().st_mtime > built_at for path in sorgenti)
+
+
+def ensure_price_store(etf_dir=ETF_BASE_PATH, store_dir=PRICE_STORE_PATH):
+    """Ricostruisce lo store solo se mancante o non aggiornato."""
+    if is_store_stale(etf_dir, store_dir):
+        build(etf_dir, store_dir)
+
+
+def _report(manifest):
+    for name, info in manifest["assets"].items():
+        for warning in info["warnings"]:
+            print(f"AVVISO  {name}: {warning}")
+    for file_name, error in manifest["errors"].items():
+        print(f"ERRORE  {file_name}: {error}")
+    for name in manifest["missing_files"]:
+        print(f"AVVISO  {name}: indice nella lista ma senza file")
+    for name in manifest["unlisted_files"]:
+        print(f"AVVISO  {name}: file non presente nella lista degli indici")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--etf-dir', default=ETF_BASE_PATH, help="Cartella dei CSV degli indici")
+    parser.add_argument('--store-dir', default=PRICE_STORE_PATH, help="Cartella dello store")
+    parser.add_argument('--index-list', default=INDEX_LIST_FILE_PATH, help="Lista Fund/ISIN/Ticker/Index")
+    parser.add_argument('--strict', action='store_true', help="Non scrive lo store se una serie ha errori")
+    args = parser.parse_args(argv)
+
+    manifest = build(args.etf_dir, args.store_dir, args.index_list, args.strict)
+    _report(manifest)
+    if manifest["version_dir"] is None:
+        print(f"Build interrotta: {manifest['aborted']}.")
+        return 1
+    print(f"Store {manifest['version_dir']} creato in {manifest['seconds']}s: "
+          f"{len(manifest['assets'])} serie, {len(manifest['errors'])} errori.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Backtest in blocco di molti portafogli da riga di comando, senza passare dalla dashboard.
+
+I portafogli vengono letti da un CSV (colonne portfolio, etf, weight) o da un JSON
+({"nome": {"ETF": peso, ...}}), con i pesi in percentuale come nella tabella della dashboard.
+Il lavoro è diviso tra un pool di processi che condividono lo store memory-mapped dei prezzi;
+i portafogli con gli stessi asset vengono calcolati insieme con un solo prodotto matriciale.
+
+Uso:
+    python bulk_backtest.py portafogli.csv risultati.csv [--workers N] [--start ANNO] [--end ANNO]
+                            [--rebalancing monthly|quarterly|annual|none|threshold] [--factor-model NOME]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import REBALANCING, simulate, performance_metrics
+from build_data import ensure_price_store
+from config import DEFAULT_FACTOR_MODEL
+from factor_models import available_models, get_factor_model
+from factor_regression import factor_betas, linear_factor_betas
+from imports_handler import get_asset_lookup, importa_rendimenti
+from price_store import get_price_store
+from time_axis import format_month, month_index
+
+CHUNK_SIZE = 64  # Portafogli per task inviato ai worker
+
+
+def read_portfolios(path):
+    """
+    Read portfolio definitions.
+
+    Returns:
+        list: (name, ETF names, weights in percent) tuples, in file order.
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.json':
+        with open(path, encoding='utf-8') as f:
+            definizioni = json.load(f)
+        return [(str(nome), list(pesi), [float(w) for w in pesi.values()]) for nome, pesi in definizioni.items()]
+
+    data = pd.read_csv(path, dtype={'portfolio': str, 'etf': str})
+    mancanti = {'portfolio', 'etf', 'weight'} - set(data.columns)
+    if mancanti:
+        raise ValueError(f"Colonne mancanti in {path.name}: {sorted(mancanti)}")
+    return [
+        (nome, righe['etf'].tolist(), righe['weight'].astype(float).tolist())
+        for nome, righe in data.groupby('portfolio', sort=False)
+    ]
+
+
+def _init_worker(factor_model=None):
+    """Apre store, lookup e fattori una volta per processo: le pagine dello store sono condivise dal sistema."""
+    get_price_store()
+    get_asset_lookup()
+    get_factor_model(factor_model)
+
+
+def _errore(nome, messaggio):
+    return {"portfolio": nome, "error": messaggio}
+
+
+def run_chunk(portafogli, start=None, end=None, rebalancing='monthly', factor_model=None):
+    """
+    Backtest a chunk of portfolios.
+
+    Portfolios over the same set of indexes share one returns matrix and are evaluated together.
+
+    Returns:
+        list: one result row (dict) per portfolio, with an 'error' entry for the ones that cannot be run.
+    """
+    model = get_factor_model(factor_model)
+    lookup = get_asset_lookup()
+    righe = {}
+    gruppi = {}  # indici ordinati -> [(nome, pesi nello stesso ordine)]
+    for nome, etfs, pesi in portafogli:
+        indici, sconosciuti = lookup.resolve_many(etfs)
+        if sconosciuti:
+            righe[nome] = _errore(nome, f"ETF non trovati nella lista degli indici: {', '.join(sconosciuti)}")
+            continue
+        if not np.isclose(sum(pesi), 100):
+            righe[nome] = _errore(nome, f"L'allocazione totale deve essere del 100% (attuale {sum(pesi):.2f}%)")
+            continue
+        # ETF diversi possono replicare lo stesso indice: i pesi si sommano
+        per_indice = {}
+        for indice, peso in zip(indici, pesi):
+            per_indice[indice] = per_indice.get(indice, 0.0) + peso / 100
+        chiave = tuple(sorted(per_indice))
+        gruppi.setdefault(chiave, []).append((nome, [per_indice[i] for i in chiave]))
+
+    for indici, membri in gruppi.items():
+        nomi = [nome for nome, _ in membri]
+        try:
+            rendimenti = importa_rendimenti(indici, start, end)
+        except (OSError, KeyError, ValueError) as errore:
+            # Un indice senza dati esclude solo i portafogli che lo contengono, non tutto il blocco
+            for nome in nomi:
+                righe[nome] = _errore(nome, f"Dati non disponibili per {', '.join(indici)}: {errore}")
+            continue
+        if len(rendimenti) < 2:
+            for nome in nomi:
+                righe[nome] = _errore(nome, "Meno di due mesi di dati comuni nella finestra richiesta")
+            continue
+
+        ritorni, turnover = simulate(rendimenti.to_numpy(), [pesi for _, pesi in membri], rebalancing,
+                                     rendimenti.index.to_numpy())
+        metriche = performance_metrics(ritorni)
+        betas = None
+        if rebalancing == 'monthly':
+            # Esposizioni come media pesata di quelle degli indici, dalle somme precalcolate nello store
+            mesi = np.intersect1d(rendimenti.index.to_numpy(), model.months, assume_unique=True)
+            betas = linear_factor_betas(indici, [pesi for _, pesi in membri], mesi, model)
+        if betas is None:
+            betas = factor_betas(pd.DataFrame(ritorni, index=rendimenti.index, columns=nomi), model).to_numpy()
+        for j, nome in enumerate(nomi):
+            riga = {
+                "portfolio": nome,
+                "first_month": format_month(rendimenti.index[0]),
+                "last_month": format_month(rendimenti.index[-1]),
+                "months": len(rendimenti),
+            }
+            riga.update({metrica: valori[j] for metrica, valori in metriche.items()})
+            riga["turnover"] = turnover[j]
+            riga.update({f"beta_{factor}": beta for factor, beta in zip(model.factors, betas[j])})
+            righe[nome] = riga
+
+    return [righe[nome] for nome, _, _ in portafogli]
+
+
+def run_bulk(portafogli, workers=None, start=None, end=None, chunk_size=CHUNK_SIZE, rebalancing='monthly',
+             factor_model=DEFAULT_FACTOR_MODEL):
+    """
+    Backtest every portfolio, spreading chunks over a process pool (`workers=1` runs in this process).
+
+    Factor exposures use `factor_model` (see factor_models), one beta_<factor> column per factor of the model.
+
+    Returns:
+        pd.DataFrame: one row per portfolio, in input order.
+    """
+    workers = workers or os.cpu_count()
+    chunks = [portafogli[i:i + chunk_size] for i in range(0, len(portafogli), chunk_size)]
+    if workers == 1:
+        _init_worker(factor_model)
+        risultati = [run_chunk(chunk, start, end, rebalancing, factor_model) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(factor_model,)) as pool:
+            n = len(chunks)
+            risultati = list(pool.map(run_chunk, chunks, [start] * n, [end] * n, [rebalancing] * n,
+                                      [factor_model] * n))
+    colonne = ["portfolio", "first_month", "last_month", "months", "cagr", "volatility", "sharpe", "max_drawdown",
+               "time_under_water", "turnover", *[f"beta_{factor}" for factor in get_factor_model(factor_model).factors], "error"]
+    risultati = pd.DataFrame([riga for chunk in risultati for riga in chunk]).reindex(columns=colonne)
+    return risultati.astype({"months": "Int64", "time_under_water": "Int64"})
+
+
+def write_results(risultati, path):
+    """Scrive i risultati in CSV, o in Parquet se il file ha estensione .parquet (richiede pyarrow)."""
+    if Path(path).suffix.lower() == '.parquet':
+        risultati.to_parquet(path, index=False)
+    else:
+        risultati.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help="CSV (portfolio, etf, weight) o JSON con i portafogli")
+    parser.add_argument('output', help="File dei risultati (.csv o .parquet)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Processi da usare (default: tutti i core)")
+    parser.add_argument('--start', type=int, help="Primo anno della finestra di analisi")
+    parser.add_argument('--end', type=int, help="Ultimo anno della finestra di analisi")
+    parser.add_argument('--rebalancing', choices=REBALANCING, default='monthly', help="Politica di ribilanciamento")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Portafogli per task")
+    parser.add_argument('--factor-model', choices=available_models(), default=DEFAULT_FACTOR_MODEL,
+                        help="Modello a fattori delle esposizioni (vedi FACTOR_MODELS in config.py)")
+    args = parser.parse_args(argv)
+
+    ensure_price_store()
+    portafogli = read_portfolios(args.input)
+    start = month_index(args.start, 1) if args.start else None
+    end = month_index(args.end, 12) if args.end else None
+
+    started = time.perf_counter()
+    risultati = run_bulk(portafogli, args.workers, start, end, args.chunk_size, args.rebalancing,
+                         args.factor_model)
+    elapsed = time.perf_counter() - started
+    write_results(risultati, args.output)
+
+    errori = int(risultati['error'].notna().sum())
+    throughput = len(portafogli) / elapsed
+    print(f"{len(portafogli)} portafogli ({errori} con errori) in {elapsed:.2f}s con {args.workers} processi: "
+          f"{throughput:.0f} portafogli/s, {throughput / args.workers:.0f} portafogli/s per core.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
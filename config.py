@@ -0,0 +1,54 @@
+#Esempio, aggiusta secondo il tuo path e i tuoi dati
+from pathlib import Path
+
+APP_TITLE = "PortfolioPilot"
+
+# Define colors for benchmark and portfolio
+BENCHMARK_COLOR = 'rgba(250, 128, 114, 0.7)'
+PORTFOLIO_COLOR = 'rgba(135, 206, 250, 0.7)'
+
+SERVER_HOST = '0.0.0.0'
+SERVER_PORT = 80
+
+
+DATA_PATH = Path("data")
+INDEX_LIST_FILE_PATH = DATA_PATH / "Index_list_cleaned.csv"
+ETF_BASE_PATH = DATA_PATH / "ETFs"
+DEV_FIVE_FACTORS_FILE_PATH = DATA_PATH / "Developed_5_Factors.csv"
+PRICE_STORE_PATH = DATA_PATH / "store"  # Generato con `python build_data.py`
+DATA_CACHE_SIZE = 64  # Numero di insiemi di indici allineati tenuti in memoria
+ASSET_SEARCH_LIMIT = 50  # Risultati massimi restituiti dalla ricerca degli ETF
+RESULT_CACHE_SIZE = 128  # Risultati di portafogli tenuti in memoria da ogni processo
+RESULT_CACHE_PATH = None  # Cartella condivisa tra i worker per la cache dei risultati (None = solo memoria)
+COUNTRY_ALLOCATION_FILE_PATH = DATA_PATH / "Allocation" / "country_allocations_total.csv"
+SECTOR_ALLOCATION_FILE_PATH = DATA_PATH / "Allocation" / "sector_allocations_total.csv"
+COUNTER_FILE_PATH = DATA_PATH / "counter.csv"
+KEY_PATH = "key.json"
+ROLLING_WINDOWS = [36, 60, 120]  # Finestre in mesi dei grafici dei rendimenti rolling (es. aggiungi 12, 180, 240)
+ROLLING_RISK_WINDOW = 36  # Finestra in mesi di volatilità, Sharpe, beta, tracking error e correlazioni rolling
+DRAWDOWN_EPISODES = 5  # Peggiori episodi di drawdown elencati per portafoglio e benchmark
+ROLLING_FACTOR_WINDOWS = [36, 60]  # Finestre in mesi delle esposizioni rolling ai fattori
+# Modelli a fattori: CSV mensili come Developed_5_Factors.csv (Date AAAA-MM, fattori in percentuale, RF).
+# I modelli con file mancanti non vengono proposti; per aggiungerne uno basta copiare il CSV in data/
+FACTOR_MODELS = {
+    "ff5_developed": {"label": "Fama-French 5 fattori (Sviluppati)", "files": [DEV_FIVE_FACTORS_FILE_PATH],
+                      "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"]},
+    "ff3_developed": {"label": "Fama-French 3 fattori (Sviluppati)", "files": [DEV_FIVE_FACTORS_FILE_PATH],
+                      "factors": ["Mkt-RF", "SMB", "HML"]},  # Oppure DATA_PATH / "Developed_3_Factors.csv"
+    "ff5_mom_developed": {"label": "Fama-French 5 fattori + Momentum (Sviluppati)",
+                          "files": [DEV_FIVE_FACTORS_FILE_PATH, DATA_PATH / "Developed_Mom_Factor.csv"],
+                          "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA", "WML"]},
+    "ff5_north_america": {"label": "Fama-French 5 fattori (Nord America)", "files": [DATA_PATH / "North_America_5_Factors.csv"],
+                          "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"]},
+    "ff5_europe": {"label": "Fama-French 5 fattori (Europa)", "files": [DATA_PATH / "Europe_5_Factors.csv"],
+                   "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"]},
+    "ff5_japan": {"label": "Fama-French 5 fattori (Giappone)", "files": [DATA_PATH / "Japan_5_Factors.csv"],
+                  "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"]},
+    "ff5_emerging": {"label": "Fama-French 5 fattori (Emergenti)", "files": [DATA_PATH / "Emerging_5_Factors.csv"],
+                     "factors": ["Mkt-RF", "SMB", "HML", "RMW", "CMA"]},
+}
+DEFAULT_FACTOR_MODEL = "ff5_developed"
+# Nuvola di portafogli casuali sotto la frontiera esatta (0 = nessuna nuvola): estratti a blocchi, memoria costante
+FRONTIER_CLOUD_SAMPLES = 0  # Es. 100_000 o 1_000_000
+FRONTIER_CLOUD_METHOD = "dirichlet"  # "dirichlet" (pesi casuali uniformi) o "sobol" (bassa discrepanza, richiede scipy)
+FRONTIER_CLOUD_POINTS = 2000  # Punti della nuvola disegnati nel grafico
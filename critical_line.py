@@ -0,0 +1,181 @@
+"""
+Frontiera efficiente esatta long-only con il Critical Line Algorithm di Markowitz.
+
+Con pesi tra 0 e 1 che sommano a 1, la frontiera è una spezzata di portafogli d'angolo: tra due angoli
+consecutivi l'insieme degli asset liberi non cambia e i pesi variano linearmente. L'algoritmo parte dal
+portafoglio di massimo rendimento e, a ogni passo, libera o blocca un solo asset fino al portafoglio di
+minima varianza, quindi bastano al più qualche decina di piccoli sistemi lineari anche con molti asset.
+Il portafoglio tangente (massimo Sharpe) si trova in forma chiusa su ogni segmento tra due angoli.
+"""
+import numpy as np
+
+_RIDGE = 1e-10  # Regolarizzazione relativa della covarianza: asset collineari non rendono singolari i sistemi
+_TOLERANCE = 1e-6  # Scarto ammesso sui vincoli prima di rinormalizzare i pesi degli angoli
+
+
+def _eventi(cov, mu, w, f, b, A):
+    """
+    Prossimi eventi lungo la critical line dall'insieme corrente di asset liberi (f) e bloccati (b).
+
+    A è l'inversa della covarianza dei liberi. Restituisce il lambda a cui ogni libero raggiunge un limite, quel
+    limite e il lambda a cui ogni bloccato si libererebbe; -inf dove l'evento non avviene.
+    """
+    S_fb = cov[f[:, None], b]
+    mu_f, mu_b, w_b, s_bb = mu[f], mu[b], w[b], cov[b, b]
+    p, q = A.sum(axis=0), A @ mu_f  # A 1 (A è simmetrica) e A mu
+    c1, c3 = p.sum(), p @ mu_f
+    Z = cov[:, b] @ w_b  # Contributo dei pesi bloccati
+    Z_f, Z_b = Z[f], Z[b]
+    l3 = A @ Z_f
+
+    # a) Un asset libero raggiunge un limite: verso 1 se il peso cresce al diminuire di lambda, altrimenti verso 0
+    c = -c1 * q + c3 * p
+    bound = np.where(c > 0, 1.0, 0.0)
+    l_in = ((1 - w_b.sum() + l3.sum()) * p - c1 * (bound + l3)) / c
+
+    # b) Un asset bloccato diventa libero: l'inversa della covarianza allargata si ottiene da A con il complemento
+    # di Schur, per tutti i candidati insieme
+    U = A @ S_fb
+    k = s_bb - (S_fb * U).sum(axis=0)
+    u1, u_mu = U.sum(axis=0), mu_f @ U
+    uZ = Z_f @ U - w_b * (s_bb - k)
+    pZ = p @ Z_f - w_b * u1
+    z_i = Z_b - s_bb * w_b
+    c1_b = c1 + (u1 - 1) ** 2 / k
+    c2_b = (mu_b - u_mu) / k
+    c3_b = c3 + (u1 - 1) * (u_mu - mu_b) / k
+    c4_b = (1 - u1) / k
+    c_b = -c1_b * c2_b + c3_b * c4_b
+    l3_b = (z_i - uZ) / k
+    somma_l3_b = pZ + (u1 - 1) * (uZ - z_i) / k
+    l_out = ((1 - (w_b.sum() - w_b) + somma_l3_b) * c4_b - c1_b * (w_b + l3_b)) / c_b
+    return np.where((c != 0) & np.isfinite(l_in), l_in, -np.inf), bound, np.where((c_b != 0) & np.isfinite(l_out), l_out, -np.inf)
+
+
+def _pesi_liberi(cov, mu, w, f, b, A, lam):
+    """Pesi degli asset liberi sulla frontiera per un dato lambda, con i bloccati fermi ai loro limiti."""
+    p, q = A.sum(axis=0), A @ mu[f]
+    w_b = w[b]
+    w1 = A @ (cov[f[:, None], b] @ w_b)
+    gamma = (-lam * (p @ mu[f]) + 1 - w_b.sum() + w1.sum()) / p.sum()
+    return -w1 + gamma * p + lam * q
+
+
+def _inversa(cov, liberi):
+    """Posizioni degli asset liberi e bloccati e inversa della covarianza dei liberi."""
+    f, b = np.flatnonzero(liberi), np.flatnonzero(~liberi)
+    return f, b, np.linalg.inv(cov[f[:, None], f])
+
+
+def critical_line(mu, cov):
+    """
+    Portafogli d'angolo della frontiera media-varianza long-only (0 <= w <= 1, somma 1).
+
+    Restituisce pesi (C x N) dal massimo rendimento alla minima varianza, i lambda di avversione al rischio a
+    cui compaiono (inf il primo, 0 l'ultimo), rendimenti e volatilità.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    n = len(mu)
+    cov = cov + np.eye(n) * _RIDGE * max(np.trace(cov) / n, np.finfo(float).tiny)
+
+    # Partenza: tutto sull'asset di rendimento massimo, l'unico libero
+    w = np.zeros(n)
+    liberi = np.zeros(n, dtype=bool)
+    liberi[np.argmax(mu)] = True
+    w[liberi] = 1.0
+    pesi, lambdas = [w.copy()], [np.inf]
+    appena_bloccato = None
+    f, b, A = _inversa(cov, liberi)
+
+    for _ in range(4 * n + 4):  # Ogni asset entra ed esce poche volte: il limite evita cicli per errori numerici
+        with np.errstate(divide='ignore', invalid='ignore'):
+            l_in, bound, l_out = _eventi(cov, mu, w, f, b, A)
+        if len(f) < 2:
+            l_in[:] = -np.inf  # Con un solo asset libero il vincolo di somma lo tiene fermo
+        l_out[l_out >= lambdas[-1]] = -np.inf
+        if appena_bloccato is not None:
+            # L'asset appena arrivato a un limite si libererebbe allo stesso lambda per errori di arrotondamento
+            l_out[b == appena_bloccato] = -np.inf
+        i_in = np.argmax(l_in)
+        i_out = np.argmax(l_out) if len(b) else None
+        massimo_in = l_in[i_in]
+        massimo_out = l_out[i_out] if len(b) else -np.inf
+
+        if massimo_in < 0 and massimo_out < 0:
+            # Nessun altro evento prima di lambda = 0: l'ultimo angolo è il portafoglio di minima varianza
+            lam = 0.0
+        elif massimo_in > massimo_out:
+            lam = massimo_in
+            appena_bloccato = f[i_in]
+            liberi[appena_bloccato] = False
+            w[appena_bloccato] = bound[i_in]
+        else:
+            lam = massimo_out
+            appena_bloccato = None
+            liberi[b[i_out]] = True
+        f, b, A = _inversa(cov, liberi)
+        w[f] = _pesi_liberi(cov, mu, w, f, b, A, lam)
+        pesi.append(w.copy())
+        lambdas.append(lam)
+        if lam == 0:
+            break
+
+    pesi, lambdas = np.array(pesi), np.array(lambdas)
+    # Scarta gli angoli fuori dai vincoli per errori numerici e quelli dominati da un angolo successivo
+    validi = (np.abs(pesi.sum(axis=1) - 1) < _TOLERANCE) & (pesi > -_TOLERANCE).all(axis=1) & (pesi < 1 + _TOLERANCE).all(axis=1)
+    pesi, lambdas = pesi[validi], lambdas[validi]
+    rendimenti = pesi @ mu
+    validi = rendimenti >= np.maximum.accumulate(rendimenti[::-1])[::-1] - _TOLERANCE
+    pesi, lambdas = np.clip(pesi[validi], 0, 1), lambdas[validi]
+    pesi /= pesi.sum(axis=1, keepdims=True)
+    # Eventi allo stesso lambda (es. asset quasi identici) producono angoli ripetuti
+    distinti = np.r_[True, np.abs(np.diff(pesi, axis=0)).max(axis=1) > _TOLERANCE]
+    pesi, lambdas = pesi[distinti], lambdas[distinti]
+    return {
+        "weights": pesi,
+        "lambdas": lambdas,
+        "returns": pesi @ mu,
+        "volatility": np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', pesi, cov, pesi), 0)),
+    }
+
+
+def max_sharpe(corners, mu, cov, risk_free=0.0):
+    """
+    Pesi esatti del portafoglio tangente (massimo Sharpe) sulla frontiera di critical_line.
+
+    Tra due angoli i pesi sono w(t) = w_b + t (w_a - w_b): il rendimento è lineare in t e la varianza quadratica,
+    quindi lo Sharpe di ogni segmento ha un solo punto stazionario in forma chiusa.
+    """
+    pesi = np.asarray(corners["weights"])
+    mu = np.asarray(mu, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    if len(pesi) == 1:
+        return pesi[0].copy()
+    inizio, delta = pesi[1:], pesi[:-1] - pesi[1:]
+    m0, m1 = inizio @ mu - risk_free, delta @ mu
+    a = np.einsum('ij,jk,ik->i', inizio, cov, inizio)
+    b = np.einsum('ij,jk,ik->i', inizio, cov, delta)
+    c = np.einsum('ij,jk,ik->i', delta, cov, delta)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stazionario = (m0 * b - m1 * a) / (m1 * b - m0 * c)
+    stazionario = np.where(np.isfinite(stazionario), np.clip(stazionario, 0, 1), 0)
+    t = np.column_stack([np.zeros(len(m0)), np.ones(len(m0)), stazionario])  # Estremi e punto stazionario
+    varianza = np.maximum(a[:, None] + 2 * b[:, None] * t + c[:, None] * t ** 2, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(varianza > 0, (m0[:, None] + m1[:, None] * t) / np.sqrt(varianza), -np.inf)
+    segmento, punto = np.unravel_index(np.argmax(sharpe), sharpe.shape)
+    return inizio[segmento] + t[segmento, punto] * delta[segmento]
+
+
+def frontier_points(corners, mu, cov, per_segmento=20):
+    """Punti della frontiera da disegnare, `per_segmento` tra due angoli consecutivi, con pesi, rendimenti e volatilità."""
+    pesi = np.asarray(corners["weights"])
+    t = np.linspace(0, 1, per_segmento, endpoint=False)
+    punti = (pesi[:-1, None, :] + t[None, :, None] * (pesi[1:] - pesi[:-1])[:, None, :]).reshape(-1, pesi.shape[1])
+    punti = np.vstack([punti, pesi[-1:]])
+    return {
+        "weights": punti,
+        "returns": punti @ np.asarray(mu, dtype=np.float64),
+        "volatility": np.sqrt(np.maximum(np.einsum('ij,jk,ik->i', punti, np.asarray(cov, dtype=np.float64), punti), 0)),
+    }
@@ -0,0 +1,99 @@
+"""
+Episodi di drawdown e indici di dolore, calcolati su molte serie insieme.
+
+Tutto parte dal massimo corrente di ogni serie: un episodio inizia quando il valore scende sotto il
+massimo e finisce quando lo recupera. Le serie vengono appiattite in un solo vettore, separate da un
+periodo fittizio sul massimo, così inizi, minimi e recuperi di tutti gli episodi si trovano con
+operazioni vettoriali senza cicli sui mesi.
+"""
+import numpy as np
+import pandas as pd
+
+EPISODE_COLUMNS = ["series", "rank", "peak", "trough", "recovery", "depth", "decline_months", "recovery_months",
+                   "duration", "recovered"]
+
+
+def drawdown_curve(valori):
+    """Drawdown di ogni colonna dal suo massimo corrente, in frazioni: 0 su un nuovo massimo, NaN dove manca il valore."""
+    valori = np.asarray(valori, dtype=np.float64)
+    if valori.ndim == 1:
+        valori = valori[:, None]
+    # fmax ignora i NaN: gli indici con storia più corta restano NaN prima del primo valore
+    massimi = np.fmax.accumulate(valori, axis=0)
+    return valori / massimi - 1
+
+
+def pain_indices(valori):
+    """
+    Indici di drawdown di ogni colonna, in frazioni sui mesi con dati.
+
+    Un array per indice: 'max_drawdown' (il drawdown più profondo), 'ulcer_index' (radice della media dei quadrati
+    dei drawdown) e 'pain_index' (media dei drawdown in valore assoluto).
+    """
+    curva = drawdown_curve(valori)
+    with np.errstate(invalid='ignore'):
+        return {
+            "max_drawdown": np.nanmin(curva, axis=0),
+            "ulcer_index": np.sqrt(np.nanmean(curva ** 2, axis=0)),
+            "pain_index": np.nanmean(-curva, axis=0),
+        }
+
+
+def drawdown_episodes(valori, mesi, nomi):
+    """
+    Tutti gli episodi di drawdown delle colonne di valori (prezzi o curve, NaN nei mesi mancanti), ordinati per
+    profondità dentro ogni serie.
+
+    Una riga per episodio con EPISODE_COLUMNS. Picco, minimo e recupero sono indici di mese (il recupero manca se la
+    serie è ancora sott'acqua), la profondità è il drawdown al minimo; le durate in mesi vanno dal picco al minimo,
+    dal minimo al recupero e dal picco al recupero, o all'ultimo mese se la serie non ha recuperato.
+    """
+    curva = drawdown_curve(valori)
+    mesi = np.asarray(mesi)
+    periodi, colonne = curva.shape
+
+    # Una riga per serie, con un periodo finale fittizio sul massimo: ogni episodio si chiude nella sua serie.
+    # Un mese mancante conta come "sul massimo" ma non come recupero: un indice che smette di essere
+    # pubblicato sott'acqua resta con l'episodio aperto
+    righe = np.zeros((colonne, periodi + 1))
+    righe[:, :periodi] = np.nan_to_num(curva.T, nan=0.0)
+    valide = np.zeros((colonne, periodi + 1), dtype=bool)
+    valide[:, :periodi] = ~np.isnan(curva.T)
+    piatto = righe.ravel()
+    sotto = piatto < 0
+    precedente = np.concatenate([[False], sotto[:-1]])
+    inizi = np.flatnonzero(sotto & ~precedente)
+    fini = np.flatnonzero(~sotto & precedente)
+    if not len(inizi):
+        return pd.DataFrame(columns=EPISODE_COLUMNS)
+
+    # Profondità e posizione del minimo di ogni episodio: il primo periodo che tocca il minimo dell'episodio
+    episodio = np.cumsum(sotto & ~precedente) - 1
+    profondita = np.minimum.reduceat(piatto, inizi)
+    al_minimo = sotto & (piatto == profondita[np.maximum(episodio, 0)])
+    _, primo = np.unique(episodio[al_minimo], return_index=True)
+    minimi = np.flatnonzero(al_minimo)[primo]
+
+    serie = inizi // (periodi + 1)
+    picco = mesi[inizi % (periodi + 1) - 1]
+    minimo = mesi[minimi % (periodi + 1)]
+    recuperato = valide.ravel()[fini]
+    # Recupero: il primo mese di nuovo sul massimo; senza recupero si misura fino all'ultimo mese disponibile
+    ultimo = mesi[np.where(recuperato, fini, fini - 1) % (periodi + 1)]
+
+    episodi = pd.DataFrame({
+        "series": np.asarray(nomi, dtype=object)[serie],
+        "peak": picco,
+        "trough": minimo,
+        "recovery": pd.array(np.where(recuperato, ultimo, 0), dtype="Int64"),
+        "depth": profondita,
+        "decline_months": minimo - picco,
+        "recovery_months": pd.array(ultimo - minimo, dtype="Int64"),
+        "duration": ultimo - picco,
+        "recovered": recuperato,
+        "_serie": serie,
+    })
+    episodi.loc[~recuperato, ["recovery", "recovery_months"]] = pd.NA
+    episodi = episodi.sort_values(["_serie", "depth"], kind="stable")
+    episodi["rank"] = episodi.groupby("_serie", sort=False).cumcount() + 1
+    return episodi.reset_index(drop=True)[EPISODE_COLUMNS]
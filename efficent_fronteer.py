@@ -2,6 +2,10 @@ import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
+from config import FRONTIER_CLOUD_SAMPLES, FRONTIER_CLOUD_METHOD, FRONTIER_CLOUD_POINTS
+from critical_line import critical_line, frontier_points, max_sharpe
+from frontier_sampling import sample_frontier
+
 # Define colors for benchmark and portfolio
 benchmark_color = 'rgba(250, 128, 114, 0.7)'
 portfolio_color = 'rgba(135, 206, 250, 0.7)'
@@ -11,80 +15,101 @@ custom_colorscale = [
     [1, portfolio_color]     # End of the scale
 ]
 
-def calcola_frontiera_efficente(dati, pesi_correnti):
-    if dati is None or dati.empty:
-        raise ValueError("Input data is missing or empty.")
+def calcola_frontiera_efficente(rendimenti, pesi_correnti, numero_portafogli=FRONTIER_CLOUD_SAMPLES):
+    """
+    Frontiera efficiente esatta long-only degli indici selezionati (vedi critical_line).
 
-    # Copy data
-    all_normalized_assets_ef = dati.copy()
+    Le colonne di rendimenti seguono i pesi del portafoglio corrente; un indice ripetuto conta una volta con la
+    somma dei pesi. numero_portafogli è la nuvola casuale sotto la frontiera (0 = nessuna). Restituisce il grafico
+    della frontiera, la torta dei portafogli chiave e il rendimento annuo del portafoglio corrente.
+    """
+    if rendimenti is None or rendimenti.empty:
+        raise ValueError("Input data is missing or empty.")
 
-    # Extract monthly returns for all columns
-    monthly_returns = all_normalized_assets_ef.pct_change().dropna()
+    # Monthly returns for all columns, already computed by the data layer
+    monthly_returns = rendimenti.dropna()
+    current_weights = pd.Series(np.asarray(pesi_correnti['weights'], dtype=np.float64), index=monthly_returns.columns)
+    current_weights = current_weights.groupby(level=0, sort=False).sum()
+    monthly_returns = monthly_returns.loc[:, ~monthly_returns.columns.duplicated()]
     symbols = monthly_returns.columns
 
     # Annualize returns
-    annual_returns = (1 + monthly_returns).prod() ** (12 / len(monthly_returns)) - 1
+    annual_returns = ((1 + monthly_returns).prod() ** (12 / len(monthly_returns)) - 1).to_numpy()
 
     # Annualized covariance matrix
-    cov_matrix = monthly_returns.cov() * 12
+    cov_matrix = monthly_returns.cov().to_numpy() * 12
 
-    # Monte Carlo simulation
-    num_portfolios = 5000
-    weights = np.random.random((num_portfolios, len(symbols)))
-    weights /= weights.sum(axis=1, keepdims=True)
-
-    # Portfolio metrics
-    portfolio_returns = np.dot(weights, annual_returns)
-    portfolio_std_devs = np.sqrt(np.einsum('ij,ji->i', weights.dot(cov_matrix), weights.T))
+    # Portafogli d'angolo della frontiera esatta, dal massimo rendimento alla minima varianza
+    corners = critical_line(annual_returns, cov_matrix)
+    frontier = frontier_points(corners, annual_returns, cov_matrix)
     risk_free_rate = 0.00
-    sharpe_ratios = (portfolio_returns - risk_free_rate) / portfolio_std_devs
-
-    # Key portfolios
-    max_sharpe_idx = np.argmax(sharpe_ratios)
-    min_std_dev_idx = np.argmin(portfolio_std_devs)
-    max_return_idx = np.argmax(portfolio_returns)
-
-    results_df = pd.DataFrame({
-        'Annual Return': portfolio_returns,
-        'Annual Volatility': portfolio_std_devs,
-        'Sharpe Ratio': sharpe_ratios
-    })
-
-    for i, symbol in enumerate(symbols):
-        results_df[f'{symbol} Weight'] = weights[:, i]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frontier_sharpe = (frontier['returns'] - risk_free_rate) / frontier['volatility']
 
     # Key portfolios only
-    key_portfolios = [
-        results_df.iloc[max_sharpe_idx],
-        results_df.iloc[min_std_dev_idx],
-        results_df.iloc[max_return_idx]
-    ]
-
-    all_model_portfolios = pd.DataFrame(key_portfolios).reset_index(drop=True)
-    all_model_portfolios['Portfolio'] = ['Max Sharpe', 'Min Volatility', 'Max Return']
-
-    # Extract current weights from the dictionary
-    current_weights_array = np.array(pesi_correnti['weights'])
+    key_weights = np.vstack([
+        max_sharpe(corners, annual_returns, cov_matrix, risk_free_rate),
+        corners['weights'][-1],  # Minima varianza
+        corners['weights'][0],  # Massimo rendimento
+    ])
+    key_returns = key_weights @ annual_returns
+    key_volatility = np.sqrt(np.einsum('ij,jk,ik->i', key_weights, cov_matrix, key_weights))
+    all_model_portfolios = pd.DataFrame({
+        'Annual Return': key_returns,
+        'Annual Volatility': key_volatility,
+        'Sharpe Ratio': (key_returns - risk_free_rate) / key_volatility,
+        **{f'{symbol} Weight': key_weights[:, i] for i, symbol in enumerate(symbols)},
+        'Portfolio': ['Max Sharpe', 'Min Volatility', 'Max Return'],
+    })
 
     # Calculate current portfolio metrics
+    current_weights_array = current_weights.reindex(symbols).to_numpy()
     current_return = np.dot(current_weights_array, annual_returns)
     current_volatility = np.sqrt(np.dot(current_weights_array.T, np.dot(cov_matrix, current_weights_array)))
 
     # Scatter Plot using Plotly
     scatter_fig = go.Figure()
 
+    if numero_portafogli:
+        cloud = sample_frontier(annual_returns, cov_matrix, numero_portafogli, metodo=FRONTIER_CLOUD_METHOD,
+                                punti=FRONTIER_CLOUD_POINTS, risk_free=risk_free_rate, seed=0)
+        scatter_fig.add_trace(go.Scatter(
+            x=cloud['volatility'],
+            y=cloud['returns'],
+            mode='markers',
+            marker=dict(color='lightgray', size=4, opacity=0.5),
+            hoverinfo='skip',
+            name=f"Portafogli casuali ({cloud['count']:,})"
+        ))
+
     scatter_fig.add_trace(go.Scatter(
-        x=results_df['Annual Volatility'],
-        y=results_df['Annual Return'],
-        mode='markers',
+        x=frontier['volatility'],
+        y=frontier['returns'],
+        mode='lines+markers',
+        line=dict(color='lightgray', width=2),
         marker=dict(
-            color=results_df['Sharpe Ratio'],
+            color=frontier_sharpe,
             colorscale=custom_colorscale,
             showscale=True,
             size=5,
-            opacity=0.5
+            colorbar=dict(title='Sharpe Ratio')
         ),
-        name='Portfolios'
+        name='Frontiera efficiente'
+    ))
+
+    # Composizione di ogni portafoglio d'angolo nel tooltip
+    corner_text = [
+        '<br>'.join(f'{symbol}: {peso:.1%}' for symbol, peso in zip(symbols, pesi) if peso >= 0.0005)
+        for pesi in corners['weights']
+    ]
+    scatter_fig.add_trace(go.Scatter(
+        x=corners['volatility'],
+        y=corners['returns'],
+        mode='markers',
+        marker=dict(size=8, color='black', symbol='circle-open'),
+        hovertext=corner_text,
+        hoverinfo='text',
+        name="Portafogli d'angolo"
     ))
 
     # Add key portfolios to the scatter plot
@@ -163,6 +188,9 @@ def calcola_frontiera_efficente(dati, pesi_correnti):
             weights = portfolio[weight_columns]
             # Filter out positions smaller than 5%
             significant_weights = weights[weights >= 0.05]
+            if significant_weights.empty:
+                # Con molti asset tutti sotto il 5% la torta li mostra tutti
+                significant_weights = weights
 
             # Redistribute the weight of small positions
             if len(significant_weights) < len(weights):
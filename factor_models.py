@@ -0,0 +1,144 @@
+"""
+Registro dei modelli a fattori (Fama-French a 3 o 5 fattori, con momentum, varianti regionali).
+
+Ogni modello di config.FACTOR_MODELS indica i CSV mensili da cui leggere i fattori, nel formato della
+libreria di Kenneth French (colonna Date, fattori in percentuale, RF). I file vengono letti una volta per
+processo e tenuti come array NumPy allineati sull'indice intero dei mesi (vedi time_axis); vengono riletti
+solo se modificati. Un modello con qualche file mancante non viene proposto.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import FACTOR_MODELS, DEFAULT_FACTOR_MODEL
+from time_axis import parse_months
+
+RISK_FREE = "RF"
+
+
+class FactorModel:
+    """
+    Monthly factor returns of one model, as fractions, over the months covered by all of its files.
+
+    Attributes:
+        name: key of the model in config.FACTOR_MODELS.
+        label: display name.
+        factors: regressor names, in the column order of `values`.
+        months: (T) sorted month indices.
+        values: (T x k) factor returns.
+        rf: (T) risk-free rate, subtracted from the returns before the regression.
+        files: {file name: SHA-256} of the files the model was read from (None for a model built in memory).
+    """
+
+    def __init__(self, name, label, factors, months, values, rf, files=None):
+        self.name = name
+        self.label = label
+        self.factors = list(factors)
+        self.months = months
+        self.values = values
+        self.rf = rf
+        self.files = files
+
+    def __repr__(self):
+        return f"FactorModel({self.name!r}, factors={self.factors}, months={len(self.months)})"
+
+    def reindex(self, mesi):
+        """
+        Factors and risk-free rate on the given months.
+
+        Returns:
+            tuple: ((len(mesi) x k) factors, (len(mesi)) risk-free rate), NaN on the months the model does not cover.
+        """
+        mesi = np.asarray(mesi)
+        righe = np.clip(np.searchsorted(self.months, mesi), 0, max(len(self.months) - 1, 0))
+        coperti = np.zeros(len(mesi), dtype=bool)
+        if len(self.months):
+            coperti = self.months[righe] == mesi
+        values = np.full((len(mesi), len(self.factors)), np.nan)
+        rf = np.full(len(mesi), np.nan)
+        values[coperti] = self.values[righe[coperti]]
+        rf[coperti] = self.rf[righe[coperti]]
+        return values, rf
+
+    def frame(self):
+        """Factors and risk-free rate as a DataFrame indexed by 'Month'."""
+        frame = pd.DataFrame(self.values, index=pd.Index(self.months, name='Month'), columns=self.factors)
+        frame[RISK_FREE] = self.rf
+        return frame
+
+
+def model_files(name):
+    """File dei fattori del modello, nell'ordine della configurazione."""
+    return [Path(path) for path in FACTOR_MODELS[name]["files"]]
+
+
+def available_models():
+    """Nomi dei modelli configurati i cui file esistono, nell'ordine della configurazione."""
+    return [name for name in FACTOR_MODELS if all(path.exists() for path in model_files(name))]
+
+
+def factor_model_options():
+    """Opzioni del dropdown dei modelli a fattori."""
+    return [{'label': FACTOR_MODELS[name]["label"], 'value': name} for name in available_models()]
+
+
+def _read_factor_file(path):
+    fattori = pd.read_csv(path, dtype={'Date': str})
+    fattori.columns = fattori.columns.str.strip()
+    fattori.index = pd.Index(parse_months(fattori.pop('Date').str.strip().to_numpy()), name='Month')
+    # I file riportano rendimenti in percentuale: la conversione in frazioni avviene solo qui
+    return fattori.astype(np.float64) / 100
+
+
+def load_factor_model(name):
+    """
+    Read the files of a configured model and align them on their common months.
+
+    Raises:
+        KeyError: if the model is not configured.
+        ValueError: if a factor or the risk-free rate is in none of the model's files.
+    """
+    spec = FACTOR_MODELS[name]
+    tabelle = [_read_factor_file(path) for path in model_files(name)]
+    mesi = tabelle[0].index.to_numpy()
+    for tabella in tabelle[1:]:
+        mesi = np.intersect1d(mesi, tabella.index.to_numpy(), assume_unique=True)
+
+    colonne = {}
+    for tabella in tabelle:
+        tabella = tabella.loc[mesi]
+        # Fattori ripetuti in più file (es. RF) vengono presi dal primo file che li contiene
+        colonne.update({nome: tabella[nome].to_numpy() for nome in tabella.columns if nome not in colonne})
+    mancanti = [nome for nome in [*spec["factors"], RISK_FREE] if nome not in colonne]
+    if mancanti:
+        raise ValueError(f"Modello {name}: colonne {mancanti} assenti in {[p.name for p in model_files(name)]}")
+
+    values = np.column_stack([colonne[nome] for nome in spec["factors"]])
+    # Mesi con qualche fattore mancante non entrano nelle regressioni
+    completi = np.isfinite(values).all(axis=1) & np.isfinite(colonne[RISK_FREE])
+    files = {path.name: hashlib.sha256(path.read_bytes()).hexdigest() for path in model_files(name)}
+    return FactorModel(name, spec["label"], spec["factors"], mesi[completi].astype(mesi.dtype), values[completi],
+                       colonne[RISK_FREE][completi], files)
+
+
+_models = {}
+
+
+def get_factor_model(model=None):
+    """
+    Modello condiviso dal processo, riletto se uno dei suoi file è stato modificato.
+
+    model è il nome del modello (None per config.DEFAULT_FACTOR_MODEL) oppure un FactorModel, restituito com'è.
+    """
+    if isinstance(model, FactorModel):
+        return model
+    name = model or DEFAULT_FACTOR_MODEL
+    mtimes = tuple(os.stat(path).st_mtime for path in model_files(name))
+    cached = _models.get(name)
+    if cached is None or cached[0] != mtimes:
+        cached = (mtimes, load_factor_model(name))
+        _models[name] = cached
+    return cached[1]
@@ -1,64 +1,232 @@
+import numpy as np
 import pandas as pd
-import statsmodels.api as sm
-from config import DEV_FIVE_FACTORS_FILE_PATH
-
-
-def import_fama_french():
-    fama_french = pd.read_csv(f"{DEV_FIVE_FACTORS_FILE_PATH}", parse_dates=['Date'])
-    fama_french = fama_french.set_index('Date')
-    fama_french = fama_french / 100
-    return fama_french
-def calculate_factor_exposure(portfolio_df):
-    # Calculate the percentage change (returns) and drop missing values
-    portfolio_df['Date'] = pd.to_datetime(portfolio_df['Date'])
-    portfolio_df.set_index('Date', inplace=True)
-
-    # Calculate returns for the portfolio and rename the column to 'Adj Close'
-    data = portfolio_df.pct_change().dropna()
-    data["Adj Close"] = data  # Rename the column to 'Adj Close'
-
-    fundsret = data["Adj Close"]
-
-    # Import the Fama-French factors
-    factors = import_fama_french()
-
-    # Merge portfolio returns and factors using an inner join on the index (Date)
-    merge = pd.merge(fundsret, factors, left_index=True, right_index=True, how='inner')
-
-    # Adjust the portfolio returns by subtracting the risk-free rate (RF)
-    merge["Adj Close"] = merge["Adj Close"] - merge["RF"]
-
-    # Normalize the factors by dividing by 100
-    merge[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "RF"]] = merge[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "RF"]] / 100
-
-    # Set the dependent variable (y) as the portfolio excess returns
-    y = merge["Adj Close"]
-
-    # Set the independent variables (X) as the factors (Mkt-RF, SMB, HML, RMW, CMA)
-    X = merge[["Mkt-RF", "SMB", "HML", "RMW", "CMA", "RF"]]
-    X_sm = sm.add_constant(X)  # Add a constant to the model for the intercept
-
-    # Fit the OLS regression model
-    model = sm.OLS(y, X_sm)
-    results = model.fit()
-
-    # Extract the results summary
-    results_summary = results.summary()
-    tables = results_summary.tables
-
-    # Extract coefficients and variable names from the regression results
-    dataframes = []
-    for i, table in enumerate(tables):
-        df = pd.DataFrame(table[1:], columns=table[0])
-        dataframes.append(df)
-
-    coef_data = dataframes[1].iloc[:, 1]
-    coef_data = coef_data.apply(lambda x: float(x.data.strip()))
-    variable_names = dataframes[1].iloc[:, 0]
-
-    # Exclude first and last values for better visualization
-    coef_data_to_plot = coef_data[1:-1]
-    variable_names_to_plot = variable_names[1:-1]
-
-    # Return the coefficients (exposures) and the factor names
-    return coef_data_to_plot, variable_names_to_plot
\ No newline at end of file
+from factor_models import available_models, get_factor_model
+from price_store import get_price_store
+from rolling import window_sums
+
+
+def _common_sample(rendimenti, model=None):
+    """
+    Rendimenti mensili senza NaN e fattori del modello (nome o FactorModel, None per quello di default) sui mesi in
+    comune: restituisce rendimenti in eccesso sul tasso risk-free, fattori e mesi.
+    """
+    model = get_factor_model(model)
+    mesi, rows, factor_rows = np.intersect1d(rendimenti.index.to_numpy(), model.months,
+                                             assume_unique=True, return_indices=True)
+    excess = rendimenti.to_numpy(dtype=np.float64)[rows] - model.rf[factor_rows, None]
+    return excess, model.values[factor_rows], mesi
+
+
+def ols(y, X):
+    """
+    Minimi quadrati di più serie y (T x K) sugli stessi regressori X (T x p, intercetta inclusa) con una sola
+    decomposizione QR.
+
+    Restituisce 'coef', 'stderr' e 'tstat' (p x K), 'r2' e 'nobs'; gli errori standard usano la varianza dei
+    residui su T - rank(X) gradi di libertà, come l'OLS di statsmodels.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    if y.ndim == 1:
+        y = y[:, None]
+    X = np.asarray(X, dtype=np.float64)
+    Q, R = np.linalg.qr(X)
+    # La pseudo-inversa di R tiene il risultato definito anche con regressori collineari
+    R_inv = np.linalg.pinv(R)
+    coef = R_inv @ (Q.T @ y)
+    residui = y - X @ coef
+    ssr = (residui ** 2).sum(axis=0)
+    sst = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    sigma2 = ssr / (len(X) - np.linalg.matrix_rank(R))
+    # diag((X'X)^-1) = diag(R^-1 R^-T): somma dei quadrati delle righe di R^-1
+    stderr = np.sqrt(np.outer((R_inv ** 2).sum(axis=1), sigma2))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return {"coef": coef, "stderr": stderr, "tstat": coef / stderr, "r2": 1 - ssr / sst, "nobs": len(X)}
+
+
+def factor_regression(rendimenti, model=None):
+    """
+    Regressione dei rendimenti mensili in eccesso di più serie sui fattori del modello, in una sola risoluzione.
+
+    I mesi con un valore mancante in una serie vengono scartati, così tutte le serie usano lo stesso campione.
+    Restituisce 'coef' e 'tstat' (una riga per serie, colonne 'const' e i fattori), 'r2' e 'nobs'; NaN se i mesi
+    in comune sono troppo pochi.
+    """
+    model = get_factor_model(model)
+    rendimenti = rendimenti.dropna()
+    excess, X, _ = _common_sample(rendimenti, model)
+    colonne = ["const", *model.factors]
+    if len(X) <= len(colonne):
+        vuoto = pd.DataFrame(np.nan, index=rendimenti.columns, columns=colonne)  # Troppi pochi mesi in comune
+        return {"coef": vuoto, "tstat": vuoto.copy(), "r2": pd.Series(np.nan, index=rendimenti.columns), "nobs": len(X)}
+
+    stima = ols(excess, np.column_stack([np.ones(len(X)), X]))
+    return {
+        "coef": pd.DataFrame(stima["coef"].T, index=rendimenti.columns, columns=colonne),
+        "tstat": pd.DataFrame(stima["tstat"].T, index=rendimenti.columns, columns=colonne),
+        "r2": pd.Series(stima["r2"], index=rendimenti.columns),
+        "nobs": stima["nobs"],
+    }
+
+
+def factor_regressions(rendimenti, models=None):
+    """
+    Regressione delle stesse serie su più modelli a fattori (tutti quelli disponibili se models è None).
+
+    Restituisce nome del modello -> risultato di factor_regression; ogni modello usa i mesi che copre.
+    """
+    rendimenti = rendimenti.dropna()
+    modelli = [get_factor_model(model) for model in (models if models is not None else available_models())]
+    return {model.name: factor_regression(rendimenti, model) for model in modelli}
+
+
+def factor_betas(rendimenti, model=None):
+    """Esposizioni ai fattori di molte serie insieme: una riga per serie, una colonna per fattore, senza intercetta."""
+    model = get_factor_model(model)
+    return factor_regression(rendimenti, model)["coef"][model.factors]
+
+
+def rolling_factor_betas(rendimenti, finestra, model=None):
+    """
+    Esposizioni ai fattori di più serie su ogni finestra di `finestra` mesi, con lo stesso modello di
+    factor_regression.
+
+    Le equazioni normali di ogni finestra vengono da somme mobili di X'X e X'y: O(T·k²) per costruirle e un piccolo
+    sistema k x k per finestra, invece di rifare la regressione. Restituisce serie -> DataFrame dei beta (senza
+    intercetta) indicizzato per l'ultimo mese di ogni finestra, vuoto se la storia in comune è più corta.
+    """
+    model = get_factor_model(model)
+    rendimenti = rendimenti.dropna()
+    excess, X, mesi = _common_sample(rendimenti, model)
+    if len(X) < finestra or finestra <= len(model.factors) + 1:
+        return {serie: pd.DataFrame(columns=model.factors, index=pd.Index(mesi[:0], name='Month'), dtype=np.float64)
+                for serie in rendimenti.columns}
+
+    # Centrare sulla media del campione non cambia le pendenze (c'è l'intercetta) e tiene piccole le somme
+    design = np.column_stack([np.ones(len(X)), X - X.mean(axis=0)])
+    excess = excess - excess.mean(axis=0)
+    XtX = window_sums(design[:, :, None] * design[:, None, :], finestra)
+    Xty = window_sums(design[:, :, None] * excess[:, None, :], finestra)
+    coef = np.linalg.pinv(XtX) @ Xty  # (finestre x fattori+1 x serie)
+
+    index = pd.Index(mesi[finestra - 1:], name='Month')
+    return {serie: pd.DataFrame(coef[:, 1:, j], index=index, columns=model.factors)
+            for j, serie in enumerate(rendimenti.columns)}
+
+
+def normal_equation_sums(returns, months, model=None):
+    """
+    Somme cumulate delle equazioni normali del modello per ogni colonna della matrice dei rendimenti dello store
+    (NaN fuori da ogni serie), sui mesi del suo calendario.
+
+    Calcolate una volta per modello da build_data.py: per ogni finestra di righe [a, b] in cui un indice ha dati,
+    `somme[b + 1] - somme[a]` dà X'X e X'y della sua regressione sugli stessi mesi della dashboard, quindi i beta
+    dell'indice (e, con ribilanciamento mensile, di un suo portafoglio) non richiedono i rendimenti. Restituisce
+    'design' (T+1 x p x p) e 'cross' (T+1 x p x N), con l'intercetta per prima, e 'scale': i regressori vengono
+    standardizzati con questi valori prima di sommarli, quindi le pendenze vanno divise per essi.
+    """
+    model = get_factor_model(model)
+    returns = np.asarray(returns, dtype=np.float64)
+    X, rf = model.reindex(months)
+    excess = returns - rf[:, None]
+    coperti = np.isfinite(X).all(axis=1)  # Mesi con i fattori disponibili
+
+    # Centrare e scalare i regressori non cambia le pendenze (c'è l'intercetta) ma rende X'X ben condizionata
+    centro = X[coperti].mean(axis=0)
+    scala = X[coperti].std(axis=0)
+    scala[scala == 0] = 1
+    design = np.zeros((len(X), len(model.factors) + 1))
+    design[coperti, 0] = 1
+    design[coperti, 1:] = (X[coperti] - centro) / scala
+    y = np.where(np.isfinite(excess) & coperti[:, None], excess, 0.0)
+
+    design_sums = np.zeros((len(X) + 1,) + (design.shape[1],) * 2)
+    np.cumsum(design[:, :, None] * design[:, None, :], axis=0, out=design_sums[1:])
+    cross_sums = np.zeros((len(X) + 1, design.shape[1], y.shape[1]))
+    np.cumsum(design[:, :, None] * y[:, None, :], axis=0, out=cross_sums[1:])
+    return {"design": design_sums, "cross": cross_sums, "scale": scala}
+
+
+def linear_factor_betas(indici, pesi, mesi, model=None, store=None):
+    """
+    Beta dei portafogli di indici dello store dalle somme precalcolate delle equazioni normali.
+
+    Con ribilanciamento mensile il rendimento in eccesso del portafoglio è la somma pesata di quelli degli indici,
+    quindi sullo stesso campione lo sono anche i suoi beta: un piccolo sistema per gli indici e un prodotto per
+    portafoglio. pesi (P x N, o un vettore) segue l'ordine di indici, mesi è il campione della regressione.
+    Restituisce i beta (P x k), o None se lo store non ha le somme del modello, se le ha calcolate da file dei
+    fattori diversi da quelli del modello (aggiornati dopo la build) o se il campione non è una finestra coperta da
+    tutti gli indici: in quel caso la regressione va stimata direttamente.
+    """
+    model = get_factor_model(model)
+    store = store if store is not None else get_price_store()
+    sums = store.factor_sums(model.name) if store is not None else None
+    if (sums is None or sums["files"] != model.files or len(sums["scale"]) != len(model.factors) or not len(mesi)
+            or any(i not in store for i in indici)):
+        return None
+    design, cross = sums["design"], sums["cross"]
+    a, b = np.searchsorted(store.months, [mesi[0], mesi[-1]])
+    cols = [store.columns[i] for i in indici]
+    # Ogni indice deve avere un rendimento in tutti i mesi del campione, e i fattori devono coprirli tutti
+    if (b >= len(store.months) or store.months[a] != mesi[0] or store.months[b] != mesi[-1]
+            or (store.first_row[cols] + 1 > a).any() or (store.last_row[cols] < b).any()
+            or design[b + 1, 0, 0] - design[a, 0, 0] != len(mesi)
+            or len(mesi) <= len(model.factors) + 1):
+        return None
+
+    XtX = design[b + 1] - design[a]
+    Xty = cross[b + 1][:, cols] - cross[a][:, cols]
+    betas = np.linalg.lstsq(XtX, Xty, rcond=None)[0][1:] / sums["scale"][:, None]  # (fattori x N)
+    return np.atleast_2d(np.asarray(pesi, dtype=np.float64)) @ betas.T
+
+
+def verify_with_statsmodels(rendimenti, model=None, rtol=1e-8):
+    """
+    Confronta factor_regression con l'OLS di statsmodels, stimato serie per serie sullo stesso campione.
+
+    statsmodels serve solo qui, come riferimento opzionale. Restituisce lo scarto massimo tra coefficienti,
+    t-statistiche e R²; solleva AssertionError se i due calcoli differiscono oltre rtol.
+    """
+    import statsmodels.api as sm
+
+    rendimenti = rendimenti.dropna()
+    stima = factor_regression(rendimenti, model)
+    excess, X, _ = _common_sample(rendimenti, model)
+    X_sm = sm.add_constant(X, has_constant='add')
+    scarto = 0.0
+    for j, serie in enumerate(rendimenti.columns):
+        risultati = sm.OLS(excess[:, j], X_sm).fit()
+        for nostro, loro in ((stima["coef"].loc[serie].to_numpy(), risultati.params),
+                             (stima["tstat"].loc[serie].to_numpy(), risultati.tvalues),
+                             (np.array([stima["r2"][serie]]), np.array([risultati.rsquared]))):
+            if not np.allclose(nostro, loro, rtol=rtol, atol=0):
+                raise AssertionError(f"{serie}: numpy {nostro} contro statsmodels {loro}")
+            scarto = max(scarto, float(np.max(np.abs(nostro - loro))))
+    return scarto
+
+
+def calculate_factor_exposure(rendimenti, composizioni=None, model=None):
+    """
+    Esposizioni ai fattori del modello di una o più serie di rendimenti mensili.
+
+    composizioni indica, per le serie che sono portafogli di indici dello store ribilanciati ogni mese, {serie:
+    (indici, pesi)}: i loro beta vengono aggregati da quelli precalcolati degli indici quando il campione lo
+    permette (vedi linear_factor_betas), le altre serie vengono stimate direttamente. Restituisce le esposizioni,
+    una riga per serie, e i nomi dei fattori mostrati nel grafico.
+    """
+    model = get_factor_model(model)
+    if isinstance(rendimenti, pd.Series):
+        rendimenti = rendimenti.to_frame()
+    rendimenti = rendimenti.dropna()
+    coef = pd.DataFrame(np.nan, index=rendimenti.columns, columns=model.factors)
+
+    composizioni = composizioni or {}
+    if composizioni:
+        mesi = np.intersect1d(rendimenti.index.to_numpy(), model.months, assume_unique=True)
+        for serie, (indici, pesi) in composizioni.items():
+            betas = linear_factor_betas(indici, pesi, mesi, model)
+            if betas is not None:
+                coef.loc[serie] = betas[0]
+    da_stimare = [serie for serie in rendimenti.columns if coef.loc[serie].isna().all()]
+    if da_stimare:
+        coef.loc[da_stimare] = factor_betas(rendimenti[da_stimare], model).to_numpy()
+    return coef, model.factors
@@ -0,0 +1,96 @@
+"""
+Nuvola di portafogli casuali per la frontiera efficiente, estratta a blocchi.
+
+I pesi vengono generati un blocco di `chunk` portafogli alla volta, uniformi sul simplesso (pesi
+Dirichlet(1, ..., 1) oppure punti di Sobol a bassa discrepanza portati sul simplesso). Di ogni blocco
+restano solo i migliori portafogli visti finora (massimo Sharpe, minima volatilità, massimo rendimento)
+e un campione uniforme di punti rischio/rendimento da disegnare, tenuto con chiavi casuali come in un
+reservoir sampling. La memoria è O(chunk × N) qualunque sia il numero di portafogli estratti.
+"""
+import warnings
+
+import numpy as np
+
+METHODS = ("dirichlet", "sobol")
+
+
+def _uniformi(metodo, n, seed):
+    """Generatore di blocchi di uniformi in (0, 1) con N colonne."""
+    if metodo == "dirichlet":
+        rng = np.random.default_rng(seed)
+        return lambda righe: rng.random((righe, n))
+    if metodo == "sobol":
+        # scipy serve solo per i punti di Sobol
+        from scipy.stats import qmc
+
+        sobol = qmc.Sobol(d=n, scramble=True, seed=seed)
+
+        def blocco(righe):
+            with warnings.catch_warnings():
+                # I blocchi successivi continuano la stessa sequenza: la bassa discrepanza vale sul totale
+                warnings.simplefilter("ignore", UserWarning)
+                return sobol.random(righe)
+        return blocco
+    raise ValueError(f"Metodo di campionamento {metodo!r}: usa uno tra {METHODS}")
+
+
+def _simplesso(uniformi):
+    """Pesi uniformi sul simplesso da uniformi in (0, 1): esponenziali normalizzate, cioè Dirichlet(1, ..., 1)."""
+    pesi = -np.log(np.clip(uniformi, np.finfo(float).tiny, 1.0))
+    pesi /= pesi.sum(axis=1, keepdims=True)
+    return pesi
+
+
+def sample_frontier(mu, cov, numero_portafogli=5000, chunk=4096, metodo="dirichlet", punti=2000,
+                    risk_free=0.0, seed=None):
+    """
+    Portafogli long-only casuali estratti a blocchi di `chunk` (metodo 'dirichlet' o 'sobol', che richiede scipy).
+
+    Restituisce i pesi (3 x N) dei migliori portafogli estratti nell'ordine di 'portfolios' (massimo Sharpe,
+    minima volatilità, massimo rendimento), rendimenti, volatilità e Sharpe di un campione uniforme di `punti`
+    portafogli da disegnare e il numero di portafogli estratti.
+    """
+    mu = np.asarray(mu, dtype=np.float64)
+    cov = np.asarray(cov, dtype=np.float64)
+    n = len(mu)
+    if chunk < 1:
+        raise ValueError(f"Blocchi di {chunk} portafogli: devono essere almeno 1")
+    genera = _uniformi(metodo, n, seed)
+    chiavi_rng = np.random.default_rng(None if seed is None else seed + 1)
+
+    # Migliori portafogli visti finora: valore del criterio (da massimizzare) e pesi
+    migliori = np.full(3, -np.inf)
+    pesi_migliori = np.full((3, n), np.nan)
+    # Campione da disegnare: i `punti` portafogli con le chiavi casuali più alte
+    campione = np.empty((0, 4))  # chiave, rendimento, volatilità, Sharpe
+
+    estratti = 0
+    while estratti < numero_portafogli:
+        righe = min(chunk, numero_portafogli - estratti)
+        pesi = _simplesso(genera(righe))
+        rendimenti = pesi @ mu
+        volatilita = np.sqrt(np.maximum(np.einsum('ij,ij->i', pesi @ cov, pesi), 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sharpe = np.where(volatilita > 0, (rendimenti - risk_free) / volatilita, -np.inf)
+
+        for k, criterio in enumerate((sharpe, -volatilita, rendimenti)):
+            i = np.argmax(criterio)
+            if criterio[i] > migliori[k]:
+                migliori[k] = criterio[i]
+                pesi_migliori[k] = pesi[i]
+
+        blocco = np.column_stack([chiavi_rng.random(righe), rendimenti, volatilita, sharpe])
+        campione = np.vstack([campione, blocco])
+        eccesso = len(campione) - punti
+        if eccesso > 0:
+            campione = campione[np.argpartition(campione[:, 0], eccesso - 1)[eccesso:]]
+        estratti += righe
+
+    return {
+        "portfolios": ["Max Sharpe", "Min Volatility", "Max Return"],
+        "weights": pesi_migliori,
+        "returns": campione[:, 1],
+        "volatility": campione[:, 2],
+        "sharpe": campione[:, 3],
+        "count": estratti,
+    }
@@ -1,65 +1,158 @@
+import os
+from types import MappingProxyType
+
+import numpy as np
 import pandas as pd
-from config import INDEX_LIST_FILE_PATH, ETF_BASE_PATH
+from cache import LRUCache
+from config import INDEX_LIST_FILE_PATH, ETF_BASE_PATH, DATA_CACHE_SIZE
+from price_store import get_price_store, read_series, align_series
+from time_axis import format_month
+
+
+class AssetLookup:
+    """Mappa immutabile Fund / ISIN / Ticker -> Index, costruita una sola volta per processo."""
+
+    def __init__(self, file_path):
+        data = pd.read_csv(file_path, dtype=str)
+        mapping = {}
+        # A parità di chiave vince la prima riga del file; i nomi dei fondi hanno la precedenza su ISIN e ticker
+        for column in ('Tickers', 'ISIN', 'Fund'):
+            rows = data.dropna(subset=[column])
+            if column == 'Tickers':
+                # Una cella può elencare più ticker dello stesso fondo, uno per riga
+                rows = rows.assign(Tickers=rows[column].str.split()).explode(column)
+            rows = rows.drop_duplicates(subset=[column], keep='first')
+            mapping.update(zip(rows[column], rows['Index']))
+        self._mapping = MappingProxyType(mapping)
+
+    def __contains__(self, name):
+        return name in self._mapping
+
+    def resolve(self, name):
+        """Restituisce l'indice associato a un fondo, ISIN o ticker (None se sconosciuto)."""
+        return self._mapping.get(name)
+
+    def resolve_many(self, names):
+        """
+        Risolve una lista di nomi in blocco.
+
+        Returns:
+            tuple: (indici trovati nell'ordine di `names`, nomi non trovati).
+        """
+        indici = []
+        sconosciuti = []
+        for name in names:
+            indice = self._mapping.get(name)
+            if indice is None:
+                sconosciuti.append(name)
+            else:
+                indici.append(indice)
+        return indici, sconosciuti
+
+
+_lookups = {}
+
+
+def get_asset_lookup(file_path=INDEX_LIST_FILE_PATH):
+    """Restituisce il lookup condiviso dal processo, ricaricandolo se il file è stato modificato."""
+    mtime = os.stat(file_path).st_mtime
+    cached = _lookups.get(file_path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, AssetLookup(file_path))
+        _lookups[file_path] = cached
+    return cached[1]
+
 
 def match_asset_name(nomi_assets):
-    mapping = pd.read_csv(INDEX_LIST_FILE_PATH)
-    nomi_indici = [mapping[mapping['Fund'] == asset]['Index'].values[0] for asset in nomi_assets if
-                   asset in mapping['Fund'].values]
-    return nomi_indici
+    indici, _ = get_asset_lookup().resolve_many(nomi_assets)
+    return indici
+
+
+def resolve_assets(nomi_assets):
+    """Come match_asset_name, ma restituisce anche i nomi che non è stato possibile risolvere."""
+    return get_asset_lookup().resolve_many(nomi_assets)
+
+_cache_dati = LRUCache(maxsize=DATA_CACHE_SIZE)
+
+
+def _chiave_dati(nomi_indici, store):
+    """Chiave di cache: insieme ordinato degli indici più gli mtime dei file da cui dipendono i dati."""
+    nomi = tuple(sorted(set(nomi_indici)))
+    mtimes = tuple(os.stat(f"{ETF_BASE_PATH}/{i}.csv").st_mtime_ns for i in nomi)
+    return nomi, mtimes, store.built_at if store is not None else None
+
+
+def _carica_dati(nomi_indici, store):
+    """Allinea e normalizza le serie richieste. Restituisce (dati, {indice: primo mese disponibile})."""
+    if store is not None:
+        dati, first_months = store.frame(nomi_indici)
+    else:
+        # Legge tutte le serie richieste e costruisce il calendario comune una sola volta
+        serie = [read_series(f"{ETF_BASE_PATH}/{i}.csv") for i in nomi_indici]
+        months, matrix, first_rows = align_series(serie)
+
+        valid = ~np.isnan(matrix).any(axis=1)  # Drop rows with missing values
+        dati = pd.DataFrame(
+            matrix[valid],
+            index=pd.Index(months[valid], name='Month'),
+            columns=list(nomi_indici),
+        )
+        first_months = months[first_rows]
 
-def importa_dati(nomi_indici):
-    dati = None  # Initialize an empty dataframe for merging
-    latest_start_date = None  # Track the latest start date
-    latest_start_etf = None  # Track the ETF name with the latest start date
-
-    for i in nomi_indici:
-        # Read the data and set Date as the index
-        temp_data = pd.read_csv(
-            f"{ETF_BASE_PATH}/{i}.csv",  # Use the base path
-            parse_dates=['Date'],
-        ).set_index('Date')
-
-        # Get the first date available for the current ETF
-        first_date = temp_data.index.min()
-
-        # Check if this ETF has a later start date than the current latest
-        if latest_start_date is None or first_date > latest_start_date:
-            latest_start_date = first_date
-            latest_start_etf = i
-
-        # Print the first date available for the current ETF
-        first_date = temp_data.index.min()
-        if dati is None:
-            dati = temp_data  # For the first dataframe, initialize `dati`
-        else:
-            dati = pd.concat([dati, temp_data], axis=1)  # Concatenate on index (Date)
-
-    dati.dropna(inplace=True)  # Drop rows with missing values
     # Normalize all the columns making them start from 100
     dati = dati / dati.iloc[0] * 100
+    return dati, dict(zip(nomi_indici, first_months))
+
+
+def _store_per(nomi_indici):
+    """Store dei prezzi se contiene tutti gli indici richiesti, altrimenti None (si leggono i CSV)."""
+    store = get_price_store()
+    if store is not None and not all(i in store for i in nomi_indici):
+        return None
+    return store
+
+
+def versione_dati(nomi_indici):
+    """Identifica i dati da cui dipendono gli indici: cambia quando lo store o uno dei CSV viene aggiornato."""
+    return _chiave_dati(nomi_indici, _store_per(nomi_indici))
+
+
+def importa_dati(nomi_indici):
+    nomi_indici = list(nomi_indici)
+    store = _store_per(nomi_indici)
+
+    # Lo stesso insieme di indici viene servito dalla cache qualunque sia l'ordine o i pesi richiesti
+    chiave = _chiave_dati(nomi_indici, store)
+    cached = _cache_dati.get(chiave)
+    if cached is None:
+        cached = _carica_dati(list(chiave[0]), store)
+        _cache_dati.put(chiave, cached)
+    dati, primi_mesi = cached
+
+    # Prepare the warning message: the ETF with the latest start date limits the analysis
+    inizio = [primi_mesi[i] for i in nomi_indici]
+    latest = int(np.argmax(inizio))
+    warning = [format_month(inizio[latest]), nomi_indici[latest]]
+
+    return dati[nomi_indici], warning
+
+
+def importa_rendimenti(nomi_indici, start=None, end=None, kind='simple'):
+    """
+    Rendimenti mensili degli indici nella finestra [start, end] (indici di mese, estremi inclusi).
+
+    I rendimenti sono precalcolati nello store; senza store vengono ricavati dai prezzi allineati.
+    """
+    nomi_indici = list(nomi_indici)
+    store = _store_per(nomi_indici)
+    if store is not None:
+        return store.returns(nomi_indici, start, end, kind)
+
+    dati, _ = importa_dati(nomi_indici)
+    rendimenti = (dati.pct_change() if kind == 'simple' else np.log(dati).diff()).iloc[1:]
+    return rendimenti.loc[start:end]
+
 
-    # Prepare the warning message
-    first_date_str = latest_start_date.strftime('%Y-%m')
-    warning = [first_date_str, latest_start_etf]
-
-    return dati, warning
-
-def load_asset_list(file_path):
-    """Carica e processa la lista degli asset da un file CSV."""
-    try:
-        data = pd.read_csv(file_path)
-        asset_list = [
-            {
-                "label": row["Fund"],
-                "value": row["Fund"],
-                "search": f"{row['Fund']} {row['ISIN']} {row['Tickers']}",
-            }
-            for _, row in data.iterrows()
-        ]
-        return asset_list
-    except FileNotFoundError:
-        print(f"Errore: Il file {file_path} non è stato trovato.")
-        return []
-    except Exception as e:
-        print(f"Si è verificato un errore durante il caricamento della lista degli asset: {e}")
-        return []
\ No newline at end of file
+def cache_stats():
+    """Contatori hit / miss / eviction della cache dei dati allineati."""
+    return _cache_dati.stats()
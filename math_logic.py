@@ -9,71 +9,109 @@ import plotly.colors as pc
 from plotly.subplots import make_subplots
 from plotly import graph_objs as go
 from Frontend import plot_line_chart as plc
+import drawdown
+import rolling
+from backtest_engine import value_metrics
+from factor_regression import rolling_factor_betas
+from time_axis import to_timestamps, format_month
 
 from config import APP_TITLE, BENCHMARK_COLOR, PORTFOLIO_COLOR, SERVER_HOST, SERVER_PORT, INDEX_LIST_FILE_PATH
 class MathLogic:
-    def add_rolling_traces(portfolio_df, period,column_except_date):
-        if(len(portfolio_df) < period):
+    def add_rolling_traces(rolling_returns, period, column_except_date):
+        if rolling_returns.empty:
             rolling = go.Figure()
             return rolling.add_trace(go.Scatter(x=[0], y=[0], mode='text', text=f'Non ci sono abbastanza dati per calcolare i rendimenti rolling per {period} mesi'))
         else:
-            rolling_returns = MathLogic.calculate_rolling_returns(portfolio_df, period)
-            return plc.plot_line_chart_rolling(column_except_date, rolling_returns, PORTFOLIO_COLOR, BENCHMARK_COLOR,period)
-
-
-    def calculate_rolling_returns(portfolio_df, period):
-        rolling_returns = portfolio_df.copy()
-        rolling_returns = rolling_returns.set_index('Date')
-        rolling_returns = rolling_returns.pct_change().rolling(window=period).sum()
-        rolling_returns = rolling_returns.dropna()
-        rolling_returns = rolling_returns.reset_index()
-        return rolling_returns
-
-    def calculate_performance_metrics(portfolio_df, portfolio_returns, column_except_date):
-        # Calculate CAGR and Volatility for each column except 'Date'
-        cagr = {}
-        volatility = {}
-        sharpe_ratio = {}
-
-        for column in column_except_date:
-            start_value = portfolio_df[column].iloc[0]
-            end_value = portfolio_df[column].iloc[-1]
-            num_years = (portfolio_df['Date'].iloc[-1] - portfolio_df['Date'].iloc[0]).days / 365.25
-            cagr[column] = ((end_value / start_value) ** (1 / num_years) - 1) * 100  # CAGR as percentage
-            volatility[column] = portfolio_df[column].pct_change().std() * (12 ** 0.5) * 100
-            sharpe_ratio[column] = cagr[column] / volatility[column] if volatility[column] != 0 else 0
-
-        # Round the values
-        #ig cagr is longer than 2 columns, it means that the benchmark is present, so we need to adjust the values
-        #BAD BAD BAD CODE
-        if len(cagr) >= 2:
-            diff = cagr['Portfolio'] - portfolio_returns* 100
-            cagr['Portfolio'] = portfolio_returns * 100
-            cagr["Benchmark"] = cagr['Benchmark'] - diff
-        else:
-            cagr['Portfolio'] = portfolio_returns * 100
+            rolling_df = rolling_returns.reset_index(drop=True)
+            rolling_df.insert(0, 'Date', to_timestamps(rolling_returns.index))
+            return plc.plot_line_chart_rolling(column_except_date, rolling_df, PORTFOLIO_COLOR, BENCHMARK_COLOR,period)
+
+
+    def dati_insufficienti(period, cosa):
+        figura = go.Figure()
+        return figura.add_trace(go.Scatter(x=[0], y=[0], mode='text', text=f'Non ci sono abbastanza dati per calcolare {cosa} per {period} mesi'))
+
+
+    def rolling_metric_figure(metric, period, titolo, asse_y, colori, percent=True):
+        if metric.empty:
+            return MathLogic.dati_insufficienti(period, titolo.lower())
+        metric_df = metric.reset_index(drop=True)
+        metric_df.insert(0, 'Date', to_timestamps(metric.index))
+        return plc.plot_rolling_metric(list(metric.columns), metric_df, colori, f"{titolo} su {period} mesi", asse_y, percent)
+
+
+    def calculate_rolling_returns(rendimenti, rolling_periods):
+        # Rendimenti composti di ogni finestra, tutti dallo stesso log-rendimento cumulato
+        return rolling.rolling_returns(rendimenti, rolling_periods)
+
+    def calculate_performance_metrics(portfolio_df, column_except_date):
+        """Tabelle di CAGR, volatilità (in percentuale) e Sharpe di ogni serie, calcolati insieme da value_metrics."""
+        metriche = value_metrics(portfolio_df[column_except_date].to_numpy())
+        # Portafoglio e benchmark sono misurati allo stesso modo sulla stessa finestra: nessun aggiustamento
+        valori = {
+            "CAGR": metriche["cagr"] * 100,
+            "Volatility": metriche["volatility"] * 100,
+            "Sharpe Ratio": metriche["sharpe"],
+        }
+        return tuple(
+            pd.DataFrame({"Metric": metrica, "Portfolio": list(column_except_date), "Value": np.round(valore, 2)})
+            for metrica, valore in valori.items()
+        )
+
+
+    def calculate_rolling_figures(rendimenti, rolling_periods, column_except_date):
+        """Un grafico per ogni finestra rolling, nell'ordine di rolling_periods, e la tabella delle distribuzioni."""
+        rolling_returns = MathLogic.calculate_rolling_returns(rendimenti[column_except_date], rolling_periods)
+        figures = [MathLogic.add_rolling_traces(rolling_returns[period], period, column_except_date)
+                   for period in rolling_periods]
+        return figures, plc.plot_rolling_statistics(rolling.rolling_statistics(rolling_returns))
+
+
+    def calculate_rolling_risk_figures(rendimenti, period, column_except_date):
+        """
+        Volatilità e Sharpe rolling di ogni serie e, se c'è il benchmark, beta, tracking error e information ratio
+        del portafoglio rispetto a esso (lista vuota senza benchmark).
+        """
+        benchmark = 'Benchmark' if 'Benchmark' in column_except_date else None
+        rischio = rolling.rolling_risk(rendimenti[column_except_date], period, benchmark)
+        colori = [PORTFOLIO_COLOR, BENCHMARK_COLOR]
+        assolute = [
+            MathLogic.rolling_metric_figure(rischio['volatility'], period, "Volatilità Rolling", "Volatilità annua (%)", colori),
+            MathLogic.rolling_metric_figure(rischio['sharpe'], period, "Sharpe Ratio Rolling", "Sharpe Ratio", colori, percent=False),
+        ]
+        relative = []
+        if benchmark is not None:
+            relative = [
+                MathLogic.rolling_metric_figure(rischio['beta'], period, "Beta Rolling verso il Benchmark", "Beta", colori, percent=False),
+                MathLogic.rolling_metric_figure(rischio['tracking_error'], period, "Tracking Error Rolling", "Tracking error annuo (%)", colori),
+                MathLogic.rolling_metric_figure(rischio['information_ratio'], period, "Information Ratio Rolling", "Information Ratio", colori, percent=False),
+            ]
+        return assolute, relative
 
-        cagr = {k: round(v, 2) for k, v in cagr.items()}
-        volatility = {k: round(v, 2) for k, v in volatility.items()}
-        sharpe_ratio = {k: round(v, 2) for k, v in sharpe_ratio.items()}
 
-        # Create a DataFrame for the metrics
-        metrics_df = pd.DataFrame([cagr, volatility,sharpe_ratio], index=['CAGR', 'Volatility','Sharpe Ratio']).reset_index()
-        metrics_df = metrics_df.rename(columns={'index': 'Metric'})
+    def calculate_rolling_correlation_figure(rendimenti, period):
+        correlazioni = rolling.rolling_correlation(rendimenti, period)
+        return MathLogic.rolling_metric_figure(correlazioni, period, "Correlazione Rolling tra gli Asset", "Correlazione", pc.qualitative.Pastel, percent=False)
 
-        # Melt the DataFrame for plotting
-        metrics_melted = pd.melt(metrics_df, id_vars='Metric', var_name='Portfolio', value_name='Value')
 
-        # Split the metrics into separate DataFrames for each metric
-        cagr_data = metrics_melted[metrics_melted["Metric"] == "CAGR"]
-        volatility_data = metrics_melted[metrics_melted["Metric"] == "Volatility"]
-        sharpe_data = metrics_melted[metrics_melted["Metric"] == "Sharpe Ratio"]
-        return cagr_data, volatility_data, sharpe_data
+    def calculate_drawdown_tables(portfolio_df, mesi, column_except_date, episodi_per_serie):
+        """Tabelle degli indici di drawdown e dei `episodi_per_serie` episodi più profondi di ogni serie."""
+        valori = portfolio_df[column_except_date].to_numpy()
+        indici = pd.DataFrame(drawdown.pain_indices(valori))
+        indici.insert(0, "Serie", list(column_except_date))
 
+        episodi = drawdown.drawdown_episodes(valori, mesi, column_except_date)
+        episodi = episodi[episodi["rank"] <= episodi_per_serie].copy()
+        for colonna in ("peak", "trough", "recovery"):
+            episodi[colonna] = [None if pd.isna(mese) else format_month(mese) for mese in episodi[colonna]]
+        return plc.plot_drawdown_tables(indici, episodi)
 
-    def calculate_3_rolling_returns(portfolio_df, rolling_periods,column_except_date):
-        rolling1 = MathLogic.add_rolling_traces(portfolio_df, rolling_periods[0],column_except_date)
-        rolling2 = MathLogic.add_rolling_traces(portfolio_df, rolling_periods[1],column_except_date)
-        rolling3 = MathLogic.add_rolling_traces(portfolio_df, rolling_periods[2],column_except_date)
-        return rolling1, rolling2, rolling3
 
+    def calculate_rolling_factor_figures(rendimenti, rolling_periods, factor_names, traduzioni, model=None):
+        """Esposizioni rolling ai fattori di una sola serie di rendimenti, un grafico per finestra."""
+        figures = []
+        for period in rolling_periods:
+            betas = rolling_factor_betas(rendimenti.to_frame(), period, model)[rendimenti.name][factor_names]
+            betas = betas.rename(columns=traduzioni)
+            figures.append(MathLogic.rolling_metric_figure(betas, period, f"Esposizione Rolling ai Fattori - {rendimenti.name}", "Esposizione", pc.qualitative.Pastel, percent=False))
+        return figures
@@ -1,20 +1,29 @@
 import dash
 from dash import dcc, html, Input, Output, State
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 import dash.dash_table
 import plotly.graph_objects as go
 from Frontend import plot_line_chart as plc
 import efficent_fronteer as ef
+import backtest_engine
 import logging
 import warnings
 from Frontend.layout import LayoutManager
+from factor_models import get_factor_model
 from factor_regression import calculate_factor_exposure
-from imports_handler import match_asset_name, importa_dati,load_asset_list
+from imports_handler import match_asset_name, resolve_assets, importa_dati, importa_rendimenti, get_asset_lookup, versione_dati
+from cache import LRUCache, SingleFlight
+from result_cache import ResultCache, content_hash
+from asset_search import get_asset_search
 from portfolio_allocation import PortfolioAllocation
 from math_logic import MathLogic
+from build_data import ensure_price_store
+from time_axis import month_index, year_of, to_timestamps
 
-from config import APP_TITLE, BENCHMARK_COLOR, PORTFOLIO_COLOR, SERVER_HOST, SERVER_PORT, INDEX_LIST_FILE_PATH
+from config import APP_TITLE, BENCHMARK_COLOR, PORTFOLIO_COLOR, SERVER_HOST, SERVER_PORT, DATA_CACHE_SIZE, ROLLING_WINDOWS, ROLLING_RISK_WINDOW, DRAWDOWN_EPISODES, ROLLING_FACTOR_WINDOWS
 
 warnings.filterwarnings("ignore", category=UserWarning)
 log = logging.getLogger('werkzeug')
@@ -39,6 +48,159 @@ LOGIN_INDICATOR_STYLE = {
 }
 
 
+_cache_backtest = LRUCache(maxsize=DATA_CACHE_SIZE)
+
+
+def _stato_backtest(indici, pesi, indice_benchmark=None):
+    """
+    Backtest sull'intera storia comune del portafoglio, in cache per portafoglio e versione dei dati.
+
+    Tiene il log-rendimento cumulato degli asset, del portafoglio ribilanciato ogni mese e del benchmark: ogni
+    periodo di analisi viene servito ritagliandoli (vedi backtest_engine.CumulativeGrowth).
+    """
+    nomi = list(indici) + ([indice_benchmark] if indice_benchmark else [])
+    chiave = (tuple(indici), tuple(pesi), indice_benchmark, versione_dati(nomi))
+    stato = _cache_backtest.get(chiave)
+    if stato is not None:
+        return stato
+
+    dati, warnings_data = importa_dati(indici)
+    # Ritorni di ogni asset, precalcolati nello store (il primo mese non ha ritorno)
+    rendimenti = importa_rendimenti(indici, start=dati.index[0] + 1)
+    ritorni = backtest_engine.portfolio_returns(rendimenti, pesi)
+    turnover = backtest_engine.monthly_turnover(rendimenti.to_numpy(), ritorni, np.atleast_2d(pesi))[:, 0]
+    stato = {
+        'dati': backtest_engine.CumulativeGrowth.from_prices(dati),
+        'rendimenti': rendimenti,
+        'portfolio': backtest_engine.CumulativeGrowth.from_returns(
+            pd.DataFrame(ritorni, index=rendimenti.index, columns=['Portfolio']), dati.index[0]),
+        'turnover_cumulato': np.append(0, np.cumsum(turnover)),
+        'benchmark': None,
+        'mesi': rendimenti.index.to_numpy(),  # Mesi dell'analisi: quelli con un rendimento, in comune con il benchmark
+        'warnings': warnings_data,
+    }
+    if indice_benchmark:
+        dati_benchmark, warnings_data_benchmark = importa_dati([indice_benchmark])
+        stato['benchmark'] = backtest_engine.CumulativeGrowth.from_prices(
+            dati_benchmark[[indice_benchmark]].rename(columns={indice_benchmark: 'Benchmark'}))
+        stato['mesi'] = np.intersect1d(stato['mesi'], dati_benchmark.index.to_numpy())
+        if warnings_data[0] < warnings_data_benchmark[0]:
+            stato['warnings'] = warnings_data_benchmark
+
+    _cache_backtest.put(chiave, stato)
+    return stato
+
+
+def _finestra_portafoglio(stato, pesi, primo_mese, ultimo_mese, rebalancing):
+    """
+    Curva del portafoglio tra primo_mese e ultimo_mese e turnover medio annuo.
+
+    Il portafoglio viene comprato in primo_mese e vale 100 in quel mese, come il benchmark. Solo senza benchmark, se
+    il periodo parte dall'inizio della storia, viene comprato nel mese del primo prezzo e il primo mese mostrato
+    include già il suo rendimento. Con il ribilanciamento mensile la curva non dipende dal mese di acquisto e viene
+    ritagliata dallo stato; le altre politiche dipendono dal percorso e vengono simulate sui ritorni in memoria.
+    """
+    rendimenti = stato['rendimenti']
+    if stato['benchmark'] is not None or primo_mese > rendimenti.index[0]:
+        base = primo_mese
+    else:
+        base = stato['portfolio'].months[0]
+    if rebalancing == 'monthly':
+        i, j = np.searchsorted(rendimenti.index.to_numpy(), [base + 1, ultimo_mese])
+        turnover_cumulato = stato['turnover_cumulato']
+        turnover = (turnover_cumulato[j] - turnover_cumulato[i]) / ((j - i + 1) / 12)
+        return stato['portfolio'].window(primo_mese, ultimo_mese, base), turnover
+
+    curva, turnover = backtest_engine.run_backtest(rendimenti.loc[base + 1:ultimo_mese], pesi, ['Portfolio'],
+                                                   rebalancing=rebalancing, start_month=base)
+    return curva.loc[primo_mese:], turnover['Portfolio']
+
+
+def _calcola_portafoglio(richiesta):
+    """
+    Portafoglio descritto da una richiesta di create_portfolio: messaggio per l'utente, curve del portafoglio e degli
+    asset indicizzate per mese, pesi usati dai grafici e primo anno con dati.
+    """
+    start_month = month_index(richiesta['anni'][0], 1)
+    end_month = month_index(richiesta['anni'][1], 12)
+    rebalancing = richiesta['rebalancing']
+    indici = match_asset_name(richiesta['etf'])
+    pesi_correnti = np.asarray(richiesta['percentuali']) / 100
+    indice_benchmark = match_asset_name([richiesta['benchmark']]) if richiesta['benchmark'] else [None]
+
+    # Stato calcolato una volta per portafoglio: un cambio di periodo viene servito ritagliandolo
+    stato = _stato_backtest(indici, pesi_correnti, indice_benchmark[0])
+    warnings_data = stato['warnings']
+    warnings_data_string = f"La data più lontana disponibile per l'analisi è {warnings_data[0]} poiché l'ETF {warnings_data[1]} ha dati disponibili solo a partire da quel momento."
+
+    # Get the first and last months of the portfolio (integer month indices, see time_axis)
+    mesi = stato['mesi']
+    first_portfolio_month = mesi[0]
+    last_portfolio_month = mesi[-1]
+
+    if (first_portfolio_month > end_month):
+        end_month = last_portfolio_month
+        start_month = first_portfolio_month
+
+    # Apply slicing and normalization based on conditions
+    inizio = start_month if start_month > first_portfolio_month else None
+    fine = end_month if end_month < last_portfolio_month else None
+    mesi = mesi[(mesi >= (inizio or mesi[0])) & (mesi <= (fine or mesi[-1]))]
+    dati = stato['dati'].window(inizio, fine)
+
+    portfolio_con_benchmark, turnover = _finestra_portafoglio(stato, pesi_correnti, mesi[0], mesi[-1], rebalancing)
+    if stato['benchmark'] is not None:
+        # Portafoglio e benchmark partono entrambi da 100 sul primo mese in comune
+        portfolio_con_benchmark = backtest_engine.join_benchmark(
+            portfolio_con_benchmark, stato['benchmark'].window(mesi[0], mesi[-1])['Benchmark'])
+    warnings_data_string += f" Turnover medio annuo del portafoglio: {turnover * 100:.1f}%."
+
+    pesi_correnti_dict = {'weights': pesi_correnti.tolist(), 'indici': indici, 'benchmark': indice_benchmark[0],
+                          'mesi_assets': [int(dati.index[0]), int(dati.index[-1])], 'rebalancing': rebalancing}
+    return {
+        'feedback': warnings_data_string,
+        'portfolio': portfolio_con_benchmark,
+        'dati': dati,
+        'pesi': pesi_correnti_dict,
+        'primo_anno': int(year_of(first_portfolio_month)),
+    }
+
+
+_risultati = ResultCache()
+_in_corso = SingleFlight()  # Richieste identiche contemporanee (es. un portafoglio condiviso) fanno un solo calcolo
+
+
+def _risultato_portafoglio(richiesta, chiave=None):
+    """
+    Chiave e risultato di una richiesta, dalla cache del server quando possibile.
+
+    La chiave è un hash della richiesta e della versione dei dati da cui dipende: una richiesta identica non costa
+    nulla e uno store ricostruito la invalida. Si cerca prima la chiave ricevuta dal browser; se è stata scartata il
+    risultato viene ricalcolato dalla richiesta. Richieste contemporanee sulla stessa chiave condividono un solo
+    calcolo (vedi _in_corso.stats()).
+    """
+    if chiave is not None:
+        risultato = _risultati.get(chiave)
+        if risultato is not None:
+            return chiave, risultato
+
+    nomi = richiesta['etf'] + ([richiesta['benchmark']] if richiesta['benchmark'] else [])
+    chiave = content_hash(richiesta, versione_dati(match_asset_name(nomi)))
+    risultato = _risultati.get(chiave)
+    if risultato is None:
+        risultato = _in_corso.do(('portafoglio', chiave), lambda: _calcola_e_salva(chiave, richiesta))
+    return chiave, risultato
+
+
+def _calcola_e_salva(chiave, richiesta):
+    # Un calcolo identico può essersi concluso tra la lettura della cache e l'ingresso qui
+    risultato = _risultati.get(chiave)
+    if risultato is None:
+        risultato = _calcola_portafoglio(richiesta)
+        _risultati.put(chiave, risultato)
+    return risultato
+
+
 def register_callbacks(app):
     """Registra tutti i callback per l'app Dash."""
 
@@ -195,6 +357,25 @@ def register_callbacks(app):
         Input('save-pdf-button', 'n_clicks')  # Triggered by button clicks
     )
 
+    # Ricerca lato server: i dropdown partono vuoti e ricevono solo i primi risultati per il testo digitato
+    for dropdown_id in ('etf-dropdown', 'benchmark-dropdown'):
+        @app.callback(
+            Output(dropdown_id, 'options'),
+            Input(dropdown_id, 'search_value'),
+            State(dropdown_id, 'value')
+        )
+        def search_assets(search_value, selected):
+            if not search_value:
+                raise PreventUpdate  # Mantiene le opzioni correnti, compresa quella selezionata
+
+            search = get_asset_search()
+            options = search.search(search_value)
+            # L'opzione selezionata deve restare tra quelle disponibili, altrimenti il dropdown ne perde l'etichetta
+            selected_option = search.option(selected)
+            if selected_option is not None and selected_option not in options:
+                options.append(selected_option)
+            return options
+
     # Callback per aggiungere un ETF alla tabella con la percentuale selezionata
     @app.callback(
         [Output('portfolio-table', 'data'),
@@ -281,120 +462,63 @@ def register_callbacks(app):
     # Callback per gestire la creazione del portafoglio
     @app.callback(
         [Output('portfolio-feedback', 'children'),
-         Output('portfolio-data', 'data'),
-         Output('assets-data', 'data'),
+         Output('portfolio-data', 'data'),  # Solo la chiave del risultato, i dati restano sul server
          Output('start-year-dropdown', 'options'),  # Dynamically update start year options
-         Output('end-year-dropdown', 'options'),  # Dynamically update end year options
-         Output('pesi-correnti', 'data')],  # New output for pesi_correnti
+         Output('end-year-dropdown', 'options')],  # Dynamically update end year options
         [Input('create-portfolio-button', 'n_clicks')],
         [State('portfolio-table', 'data'),
          State('benchmark-dropdown', 'value'),
          State('start-year-dropdown', 'value'),
-         State('end-year-dropdown', 'value')]
+         State('end-year-dropdown', 'value'),
+         State('rebalancing-dropdown', 'value')]
     )
-    def create_portfolio(n_clicks, table_data, benchmark, start_year, end_year):
+    def create_portfolio(n_clicks, table_data, benchmark, start_year, end_year, rebalancing):
         # Set default years if not provided
-        warnings_data_benchmark = []
+        rebalancing = rebalancing or 'monthly'
         start_year = start_year or 1970
         end_year = end_year or 2024
-        start_date = pd.Timestamp(f'{start_year}-01-01')
-        end_date = pd.Timestamp(f'{end_year}-12-31')
+        start_month = month_index(start_year, 1)
+        end_month = month_index(end_year, 12)
 
         # Validate the date range
-        if start_date > end_date:
-            return "L'anno di inizio deve essere precedente all'anno di fine.", dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
-
-        # Convert input dates to datetime objects if they exist
-        start_dt = pd.to_datetime(start_date) if start_date else None
-        end_dt = pd.to_datetime(end_date) if end_date else None
+        if start_month > end_month:
+            return "L'anno di inizio deve essere precedente all'anno di fine.", dash.no_update, dash.no_update, dash.no_update
 
         if n_clicks is None:
-            return "", dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+            return "", dash.no_update, dash.no_update, dash.no_update
 
         if n_clicks > 0:
             if not table_data:
-                return "Nessun ETF nel portafoglio da creare.", dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+                return "Nessun ETF nel portafoglio da creare.", dash.no_update, dash.no_update, dash.no_update
             # Calcola l'allocazione totale
             try:
                 total_percentage = sum(float(row.get('Percentuale', 0)) for row in table_data)
             except (ValueError, TypeError):
-                return "Valore percentuale non valido rilevato.", dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+                return "Valore percentuale non valido rilevato.", dash.no_update, dash.no_update, dash.no_update
 
             if total_percentage != 100:
-                return f"L'allocazione totale deve essere esattamente del 100%. Totale attuale: {total_percentage:.2f}%.", dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+                return f"L'allocazione totale deve essere esattamente del 100%. Totale attuale: {total_percentage:.2f}%.", dash.no_update, dash.no_update, dash.no_update
 
             # Converti i dati della tabella in DataFrame
             df = pd.DataFrame(table_data)
             nomi_etf = df['ETF']
-            indici = match_asset_name(nomi_etf)
-
-            dati, warnings_data = importa_dati(indici)
-
-            #Calcola i ritorni per ogni asset
-            pct_change = dati.pct_change()
-            pct_change = pct_change.dropna()
-            # Scala i ritorni per il peso e poi fanne la media
-            dati_scalati = pct_change * df['Percentuale'].values / 100 #Moltiplica i ritorni di ogni per il loro peso nel portafoglio in modo da trovare il ritorno del portafoglio
-
-            pesi_correnti = df['Percentuale'].values / 100
-
-            dati_scalati['Portfolio_return'] = dati_scalati.sum(axis=1)
-            dati_scalati['Portfolio'] = 100 * (1 + dati_scalati['Portfolio_return']).cumprod()
-
-            dati_scalati = dati_scalati.drop(columns=['Portfolio_return'])
-
-            dati_scalati = dati_scalati.drop(dati.columns, axis=1)
-            portfolio_con_benchmark = dati_scalati.copy()
-
-            if benchmark:
-                indice_benchmark = match_asset_name([benchmark])
-                dati_benckmark, warnings_data_benchmark = importa_dati(indice_benchmark)
-                dati_benckmark = dati_benckmark.loc[:, ~dati_benckmark.columns.duplicated()]
-                portfolio_con_benchmark = dati_scalati.join(dati_benckmark[indice_benchmark[0]], how='inner',
-                                                            rsuffix='_benchmark')
-                portfolio_con_benchmark['Benchmark'] = portfolio_con_benchmark[indice_benchmark[0]] / \
-                                                       portfolio_con_benchmark[indice_benchmark[0]].iloc[0] * 100
-                portfolio_con_benchmark = portfolio_con_benchmark.drop(columns=[indice_benchmark[0]])
-                portfolio_con_benchmark['Portfolio'] = portfolio_con_benchmark['Portfolio'] / \
-                                                       portfolio_con_benchmark['Portfolio'].iloc[0] * 100
-                if warnings_data[0] < warnings_data_benchmark[0]:
-                    warnings_data = warnings_data_benchmark
-
-            warnings_data_string = f"La data più lontana disponibile per l'analisi è {warnings_data[0]} poiché l'ETF {warnings_data[1]} ha dati disponibili solo a partire da quel momento."
-
-            # Get the first and last dates of the portfolio
-            first_portfolio_date = pd.to_datetime(portfolio_con_benchmark.index[0])
-            last_portfolio_date = pd.to_datetime(portfolio_con_benchmark.index[-1])
-
-            if (first_portfolio_date > end_dt):
-                end_dt = last_portfolio_date
-                start_dt = first_portfolio_date
-
-            # Apply slicing and normalization based on conditions
-            if (start_dt and start_dt > first_portfolio_date):
-                dati = dati.loc[start_dt:]
-                dati = (dati / dati.iloc[0]) * 100
-                portfolio_con_benchmark = portfolio_con_benchmark.loc[start_dt:]
-                portfolio_con_benchmark = (portfolio_con_benchmark / portfolio_con_benchmark.iloc[0]) * 100
-
-            if (end_dt and end_dt < last_portfolio_date):
-                portfolio_con_benchmark = portfolio_con_benchmark.loc[:end_dt]
-                dati = dati.loc[:end_dt]
-
-            first_year = first_portfolio_date.year
-            dynamic_years_start = [{'label': str(year), 'value': year} for year in range(first_year, 2025)] #Fist year is the fist year of the portfolio
-            dynamic_years_end = [{'label': str(year), 'value': year} for year in range(first_year, 2025)] #Start year è il primo anno dopo l'anno minimo settato dall'utente
+            indici, sconosciuti = resolve_assets(nomi_etf)
+            if sconosciuti:
+                return f"ETF non trovati nella lista degli indici: {', '.join(sconosciuti)}.", dash.no_update, dash.no_update, dash.no_update
 
-            # Fornisci feedback all'utente e salva i dati nel Store
-            portfolio_con_benchmark.reset_index(inplace=True)
+            # La richiesta identifica il risultato: al browser arriva solo la sua chiave
+            richiesta = {'etf': list(nomi_etf), 'percentuali': [float(p) for p in df['Percentuale']],
+                         'benchmark': benchmark or None, 'anni': [start_year, end_year], 'rebalancing': rebalancing}
+            chiave, risultato = _risultato_portafoglio(richiesta)
 
-            # Convert pesi_correnti to a format suitable for dcc.Store
-            pesi_correnti_dict = {'weights': pesi_correnti.tolist()}
+            first_year = risultato['primo_anno']
+            dynamic_years_start = [{'label': str(year), 'value': year} for year in range(first_year, 2025)] #Fist year is the fist year of the portfolio
+            dynamic_years_end = [{'label': str(year), 'value': year} for year in range(first_year, 2025)] #Start year è il primo anno dopo l'anno minimo settato dall'utente
 
-            return warnings_data_string, portfolio_con_benchmark.to_dict('records'), dati.to_dict(
-                'records'), dynamic_years_start, dynamic_years_end, pesi_correnti_dict
+            # Fornisci feedback all'utente e salva la chiave del risultato nello Store
+            return risultato['feedback'], {'key': chiave, 'richiesta': richiesta}, dynamic_years_start, dynamic_years_end
 
-        return "", "", "", dash.no_update, dash.no_update, dash.no_update
+        return "", None, dash.no_update, dash.no_update
 
 
 
@@ -418,36 +542,70 @@ def register_callbacks(app):
     @app.callback(
         Output('additional-feedback', 'children'),  # Output to display the charts
         [Input('portfolio-data', 'data'),
-         Input('assets-data', 'data'),
-         Input('pesi-correnti', 'data')]
+         Input('factor-model-dropdown', 'value')]
     )
-    def plot_data(portfolio_data, dati, pesi_correnti):  # ----------- KING
-
-        portfolio_df = pd.DataFrame(portfolio_data)
-        dati_df = pd.DataFrame(dati) #Sto ricevendo un DICT e non un DataFrame, quindi le colonne duplicate erano state rimosse
+    def plot_data(portfolio_data, factor_model):  # ----------- KING
+        if not portfolio_data:
+            raise PreventUpdate  # Nessun portafoglio ancora creato
+
+        # Frontiera e regressioni sono la parte più lenta: grafici identici richiesti insieme vengono calcolati una volta
+        return _in_corso.do(('grafici', portfolio_data['key'], factor_model),
+                            lambda: _grafici(portfolio_data, factor_model))
+
+    def _grafici(portfolio_data, factor_model=None):
+        # Il risultato viene letto dalla cache del server; se è stato rimosso lo si ricalcola dalla richiesta
+        _, risultato = _risultato_portafoglio(portfolio_data['richiesta'], portfolio_data['key'])
+        pesi_correnti = risultato['pesi']
+        portfolio_df = risultato['portfolio'].reset_index()
+        dati_df = risultato['dati'].loc[:, ~risultato['dati'].columns.duplicated()] #Le colonne duplicate vengono rimosse
         # Questo vuol dire che se metto due ETF uguali nella lista, uno dei due verrà rimosso
 
         indici_usati = dati_df.columns
         country_allocation = PortfolioAllocation().calculate_country_allocation(indici_usati, pesi_correnti)
         sector_allocation = PortfolioAllocation().calculate_sector_allocation(indici_usati, pesi_correnti)
 
-        # Ensure 'Date' column is datetime for calculations
-        portfolio_df['Date'] = pd.to_datetime(portfolio_df['Date'])
-        rolling_periods = [36, 60, 120]
+        # I calcoli usano l'indice intero dei mesi, le date servono solo per i grafici
+        mesi = portfolio_df.pop('Month').to_numpy()
+        portfolio_df.insert(0, 'Date', to_timestamps(mesi))
+        rolling_periods = ROLLING_WINDOWS
         column_except_date = [col for col in portfolio_df.columns if col != 'Date']
 
-        rolling1, rolling2, rolling3 = MathLogic.calculate_3_rolling_returns(portfolio_df, rolling_periods,column_except_date)
+        # Ritorni mensili della finestra mostrata: quelli del portafoglio dipendono dalla politica di ribilanciamento,
+        # quindi si ricavano dalla sua curva; quelli del benchmark sono letti dallo store
+        valori = portfolio_df['Portfolio'].to_numpy()
+        rendimenti = pd.DataFrame({'Portfolio': valori[1:] / valori[:-1] - 1}, index=pd.Index(mesi[1:], name='Month'))
+        if 'Benchmark' in portfolio_df.columns:
+            benchmark = pesi_correnti['benchmark']
+            rendimenti['Benchmark'] = importa_rendimenti([benchmark], start=mesi[0] + 1, end=mesi[-1])[benchmark]
+
+        rolling_figs, rolling_statistics_fig = MathLogic.calculate_rolling_figures(rendimenti, rolling_periods, column_except_date)
+        rischio_figs, rischio_relativo_figs = MathLogic.calculate_rolling_risk_figures(rendimenti, ROLLING_RISK_WINDOW, column_except_date)
 
         drawdown = plc.plot_drawdown(portfolio_df, PORTFOLIO_COLOR,BENCHMARK_COLOR,column_except_date)
+        drawdown_indici_fig, drawdown_episodi_fig = MathLogic.calculate_drawdown_tables(portfolio_df, mesi, column_except_date, DRAWDOWN_EPISODES)
 
         # Calculate factor exposure for the portfolio
-        factor_exposure_portfolio, factor_names = calculate_factor_exposure(portfolio_df[["Portfolio","Date"]])
+        # Con ribilanciamento mensile le esposizioni sono la media pesata di quelle precalcolate degli indici;
+        # altrimenti portafoglio e benchmark sono regrediti insieme con una sola risoluzione
+        composizioni = {}
+        if pesi_correnti['rebalancing'] == 'monthly':
+            composizioni['Portfolio'] = (pesi_correnti['indici'], pesi_correnti['weights'])
+        if 'Benchmark' in portfolio_df.columns:
+            composizioni['Benchmark'] = ([pesi_correnti['benchmark']], [1.0])
+        modello_fattori = get_factor_model(factor_model)
+        factor_exposure, factor_names = calculate_factor_exposure(rendimenti[column_except_date], composizioni, modello_fattori)
+        factor_exposure_portfolio = factor_exposure.loc["Portfolio"]
         if 'Benchmark' in portfolio_df.columns:    #If the benchmark column exists calculate the factor exposure for the benchmark
-            factor_exposure_benchmark, factor_names = calculate_factor_exposure(portfolio_df[["Benchmark","Date"]])
+            factor_exposure_benchmark = factor_exposure.loc["Benchmark"]
 
-        scatter_fig,pie_fig,portfolio_returns = ef.calcola_frontiera_efficente(dati_df,pesi_correnti)
+        # La frontiera usa l'intera finestra degli asset: con il benchmark quella del portafoglio può essere più corta
+        primo_mese_assets, ultimo_mese_assets = pesi_correnti['mesi_assets']
+        rendimenti_frontiera = importa_rendimenti(pesi_correnti['indici'], start=primo_mese_assets + 1, end=ultimo_mese_assets)
+        scatter_fig,pie_fig,_ = ef.calcola_frontiera_efficente(rendimenti_frontiera,pesi_correnti)
+        rendimenti_assets = rendimenti_frontiera.loc[:, ~rendimenti_frontiera.columns.duplicated()]
+        correlazione_rolling_fig = MathLogic.calculate_rolling_correlation_figure(rendimenti_assets, ROLLING_RISK_WINDOW)
 
-        cagr_data, volatility_data, sharpe_data = MathLogic.calculate_performance_metrics(portfolio_df, portfolio_returns,column_except_date)
+        cagr_data, volatility_data, sharpe_data = MathLogic.calculate_performance_metrics(portfolio_df, column_except_date)
 
         correlation_matrix = dati_df.corr()
 
@@ -456,9 +614,6 @@ def register_callbacks(app):
             [1, PORTFOLIO_COLOR]  # End of the scale
         ]
 
-        # Assuming 'factor_names' is a list of factor names (probably from the regression results)
-        factor_names = [cell.data for cell in factor_names]
-
         # Map the factor names to Italian using the dictionary
         factor_name_translation = {
             "Mkt-RF": "Mercato-RF",
@@ -466,7 +621,8 @@ def register_callbacks(app):
             "HML": "Value",
             "RMW": "Profitabilità",
             "CMA": "Investimenti conservativi",
-            "RF": "Tasso privo di rischio",
+            "WML": "Momentum",
+            "Mom": "Momentum",
         }
 
         # Apply the translation to the factor names
@@ -489,8 +645,10 @@ def register_callbacks(app):
                 marker=dict(color=BENCHMARK_COLOR)
             ))
 
+        rolling_factor_figs = MathLogic.calculate_rolling_factor_figures(rendimenti["Portfolio"], ROLLING_FACTOR_WINDOWS, factor_names, factor_name_translation, modello_fattori)
+
         factor_exposure_fig.update_layout(
-            title="Esposizione ai Fattori globali di Fama-French",
+            title=f"Esposizione ai Fattori - {modello_fattori.label}",
             xaxis_title="Fattori",
             yaxis_title="Esposizione",
             template='plotly_white',
@@ -539,7 +697,7 @@ def register_callbacks(app):
 
         ))
         cagr_fig.update_layout(
-            title="Ritorno Aritmetico Dei Portafogli",
+            title="Ritorno Composto Annuo Dei Portafogli",
             xaxis_title="Portafogli",
             yaxis_title="Ritorno (%)",
             template='plotly_white',
@@ -629,6 +787,7 @@ def register_callbacks(app):
         portfolio_fig = plc.plot_line_chart(column_except_date, portfolio_df, PORTFOLIO_COLOR, BENCHMARK_COLOR)
         multiple_assets_plot = html.Div([
             html.Div(dcc.Graph(figure=correlation_fig), style={'width': '100%'}),  # Correlation between assets
+            html.Div(dcc.Graph(figure=correlazione_rolling_fig), style={'width': '100%'}),  # Rolling correlation between assets
             html.Div(dcc.Graph(figure=scatter_fig), style={'width': '100%'}),  # Efficient frontier
             html.Div(dcc.Graph(figure=pie_fig), style={'width': '100%'}),  # Efficient frontier
         ])
@@ -638,16 +797,20 @@ def register_callbacks(app):
             html.Div(dcc.Graph(figure=cagr_fig), style={'width': '33%', 'display': 'inline-block'}),
             html.Div(dcc.Graph(figure=volatility_fig), style={'width': '33%', 'display': 'inline-block'}),
             html.Div(dcc.Graph(figure=sharpe_fig), style={'width': '33%', 'display': 'inline-block'}),
-            html.Div(dcc.Graph(figure=rolling1), style={'width': '100%'}),  # Rolling 3y
-            html.Div(dcc.Graph(figure=rolling2), style={'width': '100%'}),  # Rolling 5y
-            html.Div(dcc.Graph(figure=rolling3), style={'width': '100%'}),  # Rolling 10y
+            *[html.Div(dcc.Graph(figure=rolling_fig), style={'width': '100%'}) for rolling_fig in rolling_figs],  # Una per finestra di ROLLING_WINDOWS
+            html.Div(dcc.Graph(figure=rolling_statistics_fig), style={'width': '100%'}),  # Min/mediana/max per finestra
+            *[html.Div(dcc.Graph(figure=fig), style={'width': '50%', 'display': 'inline-block'}) for fig in rischio_figs],  # Volatilità e Sharpe rolling
+            *[html.Div(dcc.Graph(figure=fig), style={'width': '33%', 'display': 'inline-block'}) for fig in rischio_relativo_figs],  # Beta, tracking error, information ratio
             html.Div(dcc.Graph(figure=drawdown), style={'width': '100%'}),  # Drawdown
+            html.Div(dcc.Graph(figure=drawdown_indici_fig), style={'width': '100%'}),  # Ulcer e pain index
+            html.Div(dcc.Graph(figure=drawdown_episodi_fig), style={'width': '100%'}),  # Episodi di drawdown
             html.Div(titolo_warning, style={'width': '100%'}),  # Fixed width format
             html.Div([
                 html.Div(dcc.Graph(figure=country_fig), style={'width': '50%', 'display': 'inline-block'}),  # Country Allocation
                 html.Div(dcc.Graph(figure=sector_fig), style={'width': '50%', 'display': 'inline-block'})  # Sector Allocation
             ], style={'width': '100%'}),
-            html.Div(dcc.Graph(figure=factor_exposure_fig), style={'width': '100%'})  # Factor Exposure
+            html.Div(dcc.Graph(figure=factor_exposure_fig), style={'width': '100%'}),  # Factor Exposure
+            *[html.Div(dcc.Graph(figure=fig), style={'width': '50%', 'display': 'inline-block'}) for fig in rolling_factor_figs]  # Esposizioni rolling
         ])
 
         if len(pesi_correnti["weights"]) > 1:  # Return all the plots if there is more than one ETF
@@ -660,8 +823,14 @@ def register_callbacks(app):
 
 
 def main():
-    # Carica la lista degli asset
-    asset_list = load_asset_list(INDEX_LIST_FILE_PATH)
+    # Crea (o aggiorna) lo store mensile dei prezzi condiviso da tutti i worker
+    ensure_price_store()
+
+    # Costruisce una sola volta la mappa Fund/ISIN/Ticker -> Indice
+    get_asset_lookup()
+
+    # Indice di ricerca per i dropdown degli ETF
+    get_asset_search()
 
     # Inizializza l'app Dash con il tema Bootstrap e stili personalizzati
     app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -671,7 +840,7 @@ def main():
     initial_table_data = pd.DataFrame(columns=['ETF', 'Percentuale'])
 
     # Imposta il layout dell'app
-    app.layout = LayoutManager.create_layout(asset_list, initial_table_data,app)
+    app.layout = LayoutManager.create_layout(initial_table_data,app)
 
     # Registra i callback
     register_callbacks(app)
@@ -0,0 +1,265 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from config import PRICE_STORE_PATH
+from time_axis import parse_months
+
+PRICES_FILE = "prices.npy"
+MONTHS_FILE = "months.npy"
+RETURNS_FILE = "returns.npy"
+LOG_RETURNS_FILE = "log_returns.npy"
+COLUMNS_FILE = "columns.json"
+MANIFEST_FILE = "manifest.json"
+FACTOR_DESIGN_FILE = "factor_design.{model}.npy"  # Una terna di file per modello a fattori (vedi factor_models)
+FACTOR_CROSS_FILE = "factor_cross.{model}.npy"
+FACTOR_SCALE_FILE = "factor_scale.{model}.npy"
+CURRENT_LINK = "current"  # Link simbolico alla versione in uso dello store
+STORE_VERSION = 5  # Da incrementare a ogni modifica del formato dei file
+
+
+def read_series(path):
+    """Legge un CSV di data/ETFs e restituisce (mesi come indici int32, valori)."""
+    df = pd.read_csv(path, dtype={'Date': str})
+    return parse_months(df['Date'].to_numpy()), df.iloc[:, 1].to_numpy(dtype=np.float64)
+
+
+def align_series(series):
+    """
+    Allinea k serie mensili (coppie mesi, valori) sul loro calendario comune in un solo passaggio.
+
+    Restituisce (calendario, matrice, prime righe): la matrice (len(calendario) x k) è float64 per colonne, con NaN
+    dove una serie non ha dati; le prime righe sono la prima riga valida di ogni serie.
+    """
+    calendar = np.unique(np.concatenate([months for months, _ in series]))
+    matrix = np.full((len(calendar), len(series)), np.nan, order='F')
+    first_rows = np.empty(len(series), dtype=np.int64)
+    for j, (months, values) in enumerate(series):
+        rows = np.searchsorted(calendar, months)
+        matrix[rows, j] = values
+        first_rows[j] = rows.min()
+    return calendar, matrix, first_rows
+
+
+def write_store(names, months, prices, manifest, store_dir=PRICE_STORE_PATH, keep_versions=2, arrays=None):
+    """
+    Scrive una nuova versione dello store e la rende corrente con un solo scambio atomico.
+
+    Ogni build ha la sua directory, poi il link `current` viene sostituito con os.replace: chi legge vede il vecchio
+    o il nuovo store, mai un misto. I processi che mappano ancora una vecchia versione continuano a funzionare
+    perché i file vengono solo rimossi dalla directory, non troncati. prices deve contenere serie già validate e
+    senza buchi, una colonna per nome; arrays sono altri file {nome: array} da scrivere prima dello scambio.
+
+    Contenuto di una versione:
+        prices.npy      - matrice float64 (mesi x indici) per colonne, NaN fuori da ogni serie
+        returns.npy     - rendimenti mensili semplici, stessa forma (variazione rispetto alla riga precedente)
+        log_returns.npy - rendimenti logaritmici, stessa forma
+        months.npy      - calendario mensile comune, int32 (mesi dal 1900, vedi time_axis)
+        columns.json    - directory delle colonne: nome dell'indice, prima e ultima riga valida
+        manifest.json   - report della build scritto da build_data.py
+        factor_*.<model>.npy - somme delle regressioni su ogni modello a fattori, facoltative
+                          (vedi factor_regression.normal_equation_sums)
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    # Nome univoco anche per due build nello stesso secondo; leggibile da tutti come la directory di prima
+    version_dir = Path(tempfile.mkdtemp(prefix=f"v{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-", dir=store_dir))
+    version_dir.chmod(0o755)
+
+    valid = ~np.isnan(prices)
+    first_rows = np.argmax(valid, axis=0)
+    last_rows = len(months) - 1 - np.argmax(valid[::-1], axis=0)
+    columns = [
+        {"name": name, "first": int(first), "last": int(last)}
+        for name, first, last in zip(names, first_rows, last_rows)
+    ]
+
+    # Rendimenti calcolati una volta sola in fase di build, mai per richiesta
+    returns = np.full_like(prices, np.nan, order='F')
+    returns[1:] = prices[1:] / prices[:-1] - 1
+    log_returns = np.full_like(prices, np.nan, order='F')
+    log_returns[1:] = np.log(prices[1:] / prices[:-1])
+
+    np.save(version_dir / PRICES_FILE, np.asfortranarray(prices))
+    np.save(version_dir / RETURNS_FILE, returns)
+    np.save(version_dir / LOG_RETURNS_FILE, log_returns)
+    np.save(version_dir / MONTHS_FILE, months)
+    for file_name, array in (arrays or {}).items():
+        np.save(version_dir / file_name, array)
+    with open(version_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    with open(version_dir / COLUMNS_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"version": STORE_VERSION, "columns": columns}, f)
+
+    tmp_link = store_dir / f".{CURRENT_LINK}.{os.getpid()}.tmp"
+    os.symlink(version_dir.name, tmp_link)
+    os.replace(tmp_link, store_dir / CURRENT_LINK)
+
+    # Tiene solo le ultime versioni, nell'ordine in cui sono state completate, e mai quella in uso
+    current = current_store_dir(store_dir)
+    for old in _completed_versions(store_dir)[:-keep_versions]:
+        if old.resolve() != current:
+            shutil.rmtree(old, ignore_errors=True)
+    return version_dir
+
+
+def _completed_versions(store_dir):
+    """Versioni complete dello store dalla più vecchia: columns.json è l'ultimo file scritto prima dello scambio."""
+    versions = []
+    for path in store_dir.iterdir():
+        if path.is_dir() and path.name.startswith('v'):
+            try:
+                versions.append(((path / COLUMNS_FILE).stat().st_mtime_ns, path.name, path))
+            except FileNotFoundError:
+                continue  # Build ancora in corso in un altro processo, o versione appena rimossa
+    return [path for _, _, path in sorted(versions)]
+
+
+def current_store_dir(store_dir=PRICE_STORE_PATH):
+    """Directory della versione in uso dello store, o None se lo store non è stato creato."""
+    current = Path(store_dir) / CURRENT_LINK
+    return current.resolve() if current.exists() else None
+
+
+def store_version(store_dir=PRICE_STORE_PATH):
+    """Versione del formato dello store in uso (None se manca)."""
+    version_dir = current_store_dir(store_dir)
+    if version_dir is None:
+        return None
+    with open(version_dir / COLUMNS_FILE, encoding='utf-8') as f:
+        return json.load(f).get("version")
+
+
+def read_manifest(store_dir=PRICE_STORE_PATH):
+    """Manifest della versione in uso dello store (None se manca)."""
+    version_dir = current_store_dir(store_dir)
+    if version_dir is None:
+        return None
+    with open(version_dir / MANIFEST_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class PriceStore:
+    """Read-only view over the packed price matrix, memory-mapped so every process shares the page cache."""
+
+    def __init__(self, version_dir):
+        version_dir = Path(version_dir)
+        self.version_dir = version_dir
+        self.built_at = (version_dir / COLUMNS_FILE).stat().st_mtime_ns
+        self.prices = np.load(version_dir / PRICES_FILE, mmap_mode='r')
+        self.simple_returns = np.load(version_dir / RETURNS_FILE, mmap_mode='r')
+        self.log_returns = np.load(version_dir / LOG_RETURNS_FILE, mmap_mode='r')
+        self.months = np.load(version_dir / MONTHS_FILE)
+        with open(version_dir / COLUMNS_FILE, encoding='utf-8') as f:
+            directory = json.load(f)["columns"]
+        self.columns = {entry["name"]: j for j, entry in enumerate(directory)}
+        self.first_row = np.array([entry["first"] for entry in directory])
+        self.last_row = np.array([entry["last"] for entry in directory])
+        self._factor_sums = {}
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def factor_sums(self, model):
+        """
+        Running sums of the normal equations of a factor model, loaded on first use.
+
+        Returns:
+            dict: 'design', 'cross' (memory-mapped) and 'scale' as written by build_data.py, plus 'files', the
+            SHA-256 of the factor files they were computed from; None when the store was built without that model.
+        """
+        if model not in self._factor_sums:
+            files = [self.version_dir / name.format(model=model)
+                     for name in (FACTOR_DESIGN_FILE, FACTOR_CROSS_FILE, FACTOR_SCALE_FILE)]
+            sums = None
+            if all(path.exists() for path in files):
+                with open(self.version_dir / MANIFEST_FILE, encoding='utf-8') as f:
+                    origine = json.load(f).get("factors", {}).get(model, {})
+                sums = {
+                    "design": np.load(files[0]),
+                    "cross": np.load(files[1], mmap_mode='r'),
+                    "scale": np.load(files[2]),
+                    "files": origine.get("files"),
+                }
+            self._factor_sums[model] = sums
+        return self._factor_sums[model]
+
+    def series(self, name):
+        """Zero-copy view on the full column of an index (contiguous thanks to the column-major layout)."""
+        return self.prices[:, self.columns[name]]
+
+    def _window(self, cols, first, start=None, end=None):
+        last = int(self.last_row[cols].min())
+        if start is not None:
+            first = max(first, int(np.searchsorted(self.months, start)))
+        if end is not None:
+            last = min(last, int(np.searchsorted(self.months, end, side='right')) - 1)
+        return first, last
+
+    def frame(self, names):
+        """
+        Align the requested indexes on their common months.
+
+        Series are validated and gap-free at build time, so the common months are simply the rows between
+        the latest first row and the earliest last row: no NaN scan is needed.
+
+        Returns:
+            tuple: (DataFrame indexed by 'Month' with one column per name, first available month of each name).
+        """
+        cols = [self.columns[name] for name in names]
+        first, last = self._window(cols, int(self.first_row[cols].max()))
+        dati = pd.DataFrame(
+            np.column_stack([self.prices[first:last + 1, j] for j in cols]),
+            index=pd.Index(self.months[first:last + 1], name='Month'),
+            columns=list(names),
+        )
+        return dati, self.months[self.first_row[cols]]
+
+    def returns(self, names, start=None, end=None, kind='simple'):
+        """
+        Precomputed monthly returns of the requested indexes over a window of months.
+
+        Args:
+            names: index names.
+            start, end: first and last month index of the window (inclusive); None means the whole common history.
+            kind: 'simple' or 'log'.
+
+        Returns:
+            pd.DataFrame: returns indexed by 'Month'.
+        """
+        matrix = self.log_returns if kind == 'log' else self.simple_returns
+        cols = [self.columns[name] for name in names]
+        # Il primo mese di una serie non ha rendimento
+        first, last = self._window(cols, int(self.first_row[cols].max()) + 1, start, end)
+        return pd.DataFrame(
+            np.column_stack([matrix[first:last + 1, j] for j in cols]),
+            index=pd.Index(self.months[first:last + 1], name='Month'),
+            columns=list(names),
+        )
+
+
+_store = None
+_store_dir = None
+
+
+def get_price_store(store_dir=PRICE_STORE_PATH):
+    """
+    Return the process-wide PriceStore, reopening it when a new version has been swapped in.
+    Returns None if the store has not been built yet or was built in an older format.
+    """
+    global _store, _store_dir
+    version_dir = current_store_dir(store_dir)
+    if version_dir is None:
+        return None
+    if _store is None or version_dir != _store_dir:
+        if store_version(store_dir) != STORE_VERSION:
+            return None
+        _store = PriceStore(version_dir)
+        _store_dir = version_dir
+    return _store
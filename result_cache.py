@@ -0,0 +1,111 @@
+"""
+Cache lato server dei risultati dei portafogli.
+
+Il browser riceve solo la chiave (un hash del contenuto della richiesta) e i callback recuperano
+i DataFrame da qui: in memoria con un LRU per processo e, se configurata, su disco in una cartella
+condivisa tra i worker.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+import store_codec
+from cache import LRUCache
+from config import RESULT_CACHE_SIZE, RESULT_CACHE_PATH
+
+_FRAME = "__frame__"
+
+
+def content_hash(*parts):
+    """SHA-256 della rappresentazione JSON canonica di `parts` (chiavi ordinate, nessuno spazio)."""
+    testo = json.dumps(parts, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(testo.encode('utf-8')).hexdigest()
+
+
+def _to_json(value):
+    if isinstance(value, pd.DataFrame):
+        return {_FRAME: store_codec.encode_frame(value)}
+    if isinstance(value, dict):
+        return {k: _to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_json(v) for v in value]
+    return value
+
+
+def _from_json(value):
+    if isinstance(value, dict):
+        if _FRAME in value:
+            return store_codec.decode_frame(value[_FRAME])
+        return {k: _from_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    return value
+
+
+class DiskBackend:
+    """
+    One JSON file per key in a directory shared by every worker.
+
+    Files are written to a temporary name and renamed, so a reader never sees a partial result; DataFrames are
+    stored with store_codec, so nothing is unpickled from the shared directory. Beyond `maxsize` files the
+    oldest ones are removed.
+    """
+
+    def __init__(self, path, maxsize=1000):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.maxsize = maxsize
+
+    def _file(self, key):
+        return self.path / f"{key}.json"
+
+    def get(self, key):
+        try:
+            with open(self._file(key), encoding='utf-8') as f:
+                return _from_json(json.load(f))
+        except (FileNotFoundError, ValueError):
+            return None  # Mai scritto, rimosso o illeggibile: si ricalcola
+
+    def put(self, key, value):
+        tmp = self.path / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(_to_json(value), f)
+        os.replace(tmp, self._file(key))
+        self._prune()
+
+    def _prune(self):
+        files = list(self.path.glob("*.json"))
+        if len(files) <= self.maxsize:
+            return
+        files.sort(key=lambda p: p.stat().st_mtime)
+        for old in files[:len(files) - self.maxsize]:
+            old.unlink(missing_ok=True)
+
+
+class ResultCache:
+    """In-process LRU in front of an optional DiskBackend; disk hits are promoted to memory."""
+
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, path=RESULT_CACHE_PATH):
+        self.memory = LRUCache(maxsize)
+        self.disk = DiskBackend(path) if path else None
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if self.disk is not None:
+            self.disk.put(key, value)
+
+    def stats(self):
+        """Contatori della cache in memoria."""
+        return self.memory.stats()
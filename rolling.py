@@ -0,0 +1,159 @@
+"""
+Rendimenti rolling composti su più finestre.
+
+Il log-rendimento cumulato viene calcolato una volta; il rendimento di ogni finestra di w mesi è la
+differenza di due suoi valori, quindi ogni finestra in più costa una sottrazione vettoriale su T mesi.
+"""
+import numpy as np
+import pandas as pd
+
+
+def log_growth(rendimenti):
+    """Log-rendimento cumulato (T+1 x K) di una matrice di rendimenti semplici, con una riga iniziale di zeri."""
+    rendimenti = np.asarray(rendimenti, dtype=np.float64)
+    if rendimenti.ndim == 1:
+        rendimenti = rendimenti[:, None]
+    crescita = np.zeros((len(rendimenti) + 1, rendimenti.shape[1]))
+    np.cumsum(np.log1p(rendimenti), axis=0, out=crescita[1:])
+    return crescita
+
+
+def window_returns(crescita, finestra, annualized=False, periodi_anno=12):
+    """
+    Rendimenti composti di ogni finestra di `finestra` periodi, dal log-rendimento cumulato di log_growth.
+
+    Una riga per finestra, ordinate per ultimo periodo (nessuna se la serie è più corta della finestra); con
+    annualized il tasso annuo invece del rendimento totale della finestra.
+    """
+    if finestra < 1:
+        raise ValueError(f"Finestra di {finestra} periodi: deve essere almeno 1")
+    log_finestra = crescita[finestra:] - crescita[:-finestra]
+    if annualized:
+        log_finestra = log_finestra * (periodi_anno / finestra)
+    return np.expm1(log_finestra)
+
+
+def rolling_returns(rendimenti, finestre, annualized=False):
+    """
+    Rendimenti rolling composti di ogni colonna di rendimenti mensili, per più finestre in mesi.
+
+    Restituisce finestra -> DataFrame indicizzato per l'ultimo mese di ogni finestra, con le colonne di rendimenti.
+    """
+    crescita = log_growth(rendimenti.to_numpy())
+    return {
+        finestra: pd.DataFrame(window_returns(crescita, finestra, annualized), columns=rendimenti.columns,
+                               index=rendimenti.index[finestra - 1:])
+        for finestra in finestre
+    }
+
+
+def rolling_statistics(rolling):
+    """
+    Distribuzione dei rendimenti rolling totali (non annualizzati) di rolling_returns.
+
+    Una riga per finestra e serie con numero di finestre, minimo, mediana e massimo, mediana annualizzata e quota di
+    finestre positive, in frazioni; le finestre più lunghe della storia vengono tralasciate.
+    """
+    righe = []
+    for finestra, valori in rolling.items():
+        if valori.empty:
+            continue
+        matrice = valori.to_numpy()
+        minimi, mediane, massimi = np.quantile(matrice, [0, 0.5, 1], axis=0)
+        positivi = (matrice > 0).mean(axis=0)
+        for j, serie in enumerate(valori.columns):
+            righe.append({"window": finestra, "series": serie, "count": len(matrice), "min": minimi[j],
+                          "median": mediane[j], "max": massimi[j],
+                          "median_annualized": (1 + mediane[j]) ** (12 / finestra) - 1, "positive": positivi[j]})
+    return pd.DataFrame(righe, columns=["window", "series", "count", "min", "median", "max", "median_annualized",
+                                        "positive"])
+
+
+def window_sums(valori, finestra):
+    """Somme di ogni finestra di `finestra` righe (anche di array a più dimensioni), come differenza di due somme cumulate."""
+    somme = np.zeros((len(valori) + 1,) + valori.shape[1:])
+    np.cumsum(valori, axis=0, out=somme[1:])
+    return somme[finestra:] - somme[:-finestra]
+
+
+def rolling_covariance(x, y, finestra):
+    """
+    Covarianza campionaria (ddof=1) tra le colonne corrispondenti di x e y su ogni finestra di almeno 2 periodi,
+    da somme mobili; una riga per finestra, ordinate per ultimo periodo.
+    """
+    # Centrare sulla media dell'intero campione non cambia la covarianza e tiene piccole le somme dei prodotti
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+    somma_x = window_sums(x, finestra)
+    somma_y = window_sums(y, finestra)
+    return (window_sums(x * y, finestra) - somma_x * somma_y / finestra) / (finestra - 1)
+
+
+def rolling_risk(rendimenti, finestra, benchmark=None, periodi_anno=12):
+    """
+    Statistiche di rischio rolling di ogni colonna, ognuna in O(T) qualunque sia la finestra in mesi.
+
+    Restituisce statistica -> DataFrame indicizzato per l'ultimo mese di ogni finestra (vuoto se la storia è più
+    corta della finestra). Volatilità annua e Sharpe (rendimento composto annuo sulla volatilità, come nelle metriche
+    della dashboard) per ogni colonna; con la colonna di benchmark anche beta, tracking error annuo e information
+    ratio (rendimento attivo medio annuo sul tracking error) delle altre colonne.
+    """
+    valori = rendimenti.to_numpy(dtype=np.float64)
+    colonne = list(rendimenti.columns)
+    finestre = max(len(valori) - finestra + 1, 0)
+    index = rendimenti.index[finestra - 1:] if finestre else rendimenti.index[:0]
+
+    def frame(matrice, nomi):
+        return pd.DataFrame(matrice, index=index, columns=nomi)
+
+    if not finestre or finestra < 2:
+        vuoto = np.empty((0, len(colonne)))
+        relative = [c for c in colonne if c != benchmark]
+        risultato = {"volatility": frame(vuoto, colonne), "sharpe": frame(vuoto, colonne)}
+        if benchmark is not None:
+            risultato.update({nome: frame(vuoto[:, :len(relative)], relative)
+                              for nome in ("beta", "tracking_error", "information_ratio")})
+        return risultato
+
+    annuo = np.sqrt(periodi_anno)
+    volatility = np.sqrt(np.maximum(rolling_covariance(valori, valori, finestra), 0)) * annuo
+    ritorno = window_returns(log_growth(valori), finestra, annualized=True, periodi_anno=periodi_anno)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe = np.where(volatility > 0, ritorno / volatility, 0.0)
+    risultato = {"volatility": frame(volatility, colonne), "sharpe": frame(sharpe, colonne)}
+
+    if benchmark is not None:
+        relative = [c for c in colonne if c != benchmark]
+        x = rendimenti[relative].to_numpy(dtype=np.float64)
+        b = np.broadcast_to(rendimenti[[benchmark]].to_numpy(dtype=np.float64), x.shape)
+        attivo = x - b
+        tracking_error = np.sqrt(np.maximum(rolling_covariance(attivo, attivo, finestra), 0)) * annuo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            beta = rolling_covariance(x, b, finestra) / rolling_covariance(b, b, finestra)
+            information_ratio = window_sums(attivo, finestra) / finestra * periodi_anno / tracking_error
+        risultato.update({
+            "beta": frame(beta, relative),
+            "tracking_error": frame(tracking_error, relative),
+            "information_ratio": frame(information_ratio, relative),
+        })
+    return risultato
+
+
+def rolling_correlation(rendimenti, finestra):
+    """
+    Correlazione rolling di ogni coppia di colonne, una colonna "A / B" per coppia indicizzata per l'ultimo mese di
+    ogni finestra; vuota se la storia è più corta della finestra o c'è una sola colonna.
+    """
+    colonne = list(rendimenti.columns)
+    coppie = [(i, j) for i in range(len(colonne)) for j in range(i + 1, len(colonne))]
+    nomi = [f"{colonne[i]} / {colonne[j]}" for i, j in coppie]
+    if len(rendimenti) < finestra or not coppie:
+        return pd.DataFrame(columns=nomi, index=rendimenti.index[:0], dtype=np.float64)
+
+    valori = rendimenti.to_numpy(dtype=np.float64)
+    prima, seconda = (np.array(lato) for lato in zip(*coppie))
+    varianze = rolling_covariance(valori, valori, finestra)
+    covarianze = rolling_covariance(valori[:, prima], valori[:, seconda], finestra)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlazioni = covarianze / np.sqrt(varianze[:, prima] * varianze[:, seconda])
+    return pd.DataFrame(np.clip(correlazioni, -1, 1), index=rendimenti.index[finestra - 1:], columns=nomi)
@@ -0,0 +1,51 @@
+"""
+Codifica colonnare dei DataFrame mensili passati al browser tramite dcc.Store.
+
+Invece di una lista di record, che ripete il nome di ogni colonna per ogni mese, il payload contiene
+un solo vettore dei mesi e un array binario per colonna, codificati in base64.
+"""
+import base64
+
+import numpy as np
+import pandas as pd
+
+from time_axis import MONTH_DTYPE
+
+CODEC = "columnar-b64"
+CODEC_VERSION = 1
+
+
+def _encode_array(values, dtype):
+    # Little endian esplicito: il payload non dipende dalla macchina che lo ha prodotto
+    return base64.b64encode(np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<')).tobytes()).decode('ascii')
+
+
+def _decode_array(data, dtype):
+    return np.frombuffer(base64.b64decode(data), dtype=np.dtype(dtype).newbyteorder('<'))
+
+
+def encode_frame(frame, dtype=np.float64):
+    """Payload JSON di un DataFrame indicizzato per mese; float32 dimezza il payload a ~7 cifre significative."""
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+    dtype = np.dtype(dtype)
+    return {
+        "codec": CODEC,
+        "version": CODEC_VERSION,
+        "index": frame.index.name,
+        "months": _encode_array(frame.index.to_numpy(), MONTH_DTYPE),
+        "dtype": dtype.name,
+        "columns": [str(column) for column in frame.columns],
+        "data": [_encode_array(frame[column].to_numpy(), dtype) for column in frame.columns],
+    }
+
+
+def decode_frame(payload):
+    """Ricostruisce il DataFrame di encode_frame (colonne float64); ValueError se il payload non è di questo codec."""
+    if not isinstance(payload, dict) or payload.get("codec") != CODEC or payload.get("version") != CODEC_VERSION:
+        raise ValueError("Payload non riconosciuto: atteso un DataFrame codificato con encode_frame")
+    months = _decode_array(payload["months"], MONTH_DTYPE)
+    columns = {
+        column: _decode_array(data, payload["dtype"]).astype(np.float64)
+        for column, data in zip(payload["columns"], payload["data"])
+    }
+    return pd.DataFrame(columns, index=pd.Index(months, name=payload["index"]), columns=payload["columns"])
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from backtest_engine import simulate
+from time_axis import month_index
+
+# Due asset 50/50: A guadagna il 10% ogni mese, B resta fermo. Da novembre 2019 a febbraio 2020
+RENDIMENTI = np.array([[0.10, 0.0]] * 4)
+PESI = [0.5, 0.5]
+MESI = np.arange(month_index(2019, 11), month_index(2020, 2) + 1)
+ANNI = 4 / 12
+
+# Senza ribilanciamento A vale 0.5 * 1.1^t e B 0.5
+VALORI_BUY_AND_HOLD = np.array([1.05, 1.105, 1.1655, 1.23205])
+
+
+def _rendimenti(valori):
+    return valori / np.r_[1.0, valori[:-1]] - 1
+
+
+def test_none_never_trades():
+    ritorni, turnover = simulate(RENDIMENTI, PESI, 'none', MESI)
+    np.testing.assert_allclose(ritorni[:, 0], _rendimenti(VALORI_BUY_AND_HOLD), rtol=1e-12)
+    assert turnover[0] == 0
+
+
+def test_annual_rebalances_only_in_january():
+    ritorni, turnover = simulate(RENDIMENTI, PESI, 'annual', MESI)
+    # All'inizio di gennaio il portafoglio vale 1.105, con A a 0.605: torna a 0.5525 per asset
+    valori = np.array([1.05, 1.105, 0.5525 * 1.1 + 0.5525, 0.5525 * 1.21 + 0.5525])
+    np.testing.assert_allclose(ritorni[:, 0], _rendimenti(valori), rtol=1e-12)
+    assert turnover[0] == pytest.approx((0.605 / 1.105 - 0.5) / ANNI, rel=1e-12)
+
+    # Una finestra senza gennaio è un buy and hold
+    ritorni, turnover = simulate(RENDIMENTI, PESI, 'annual', MESI + 3)
+    np.testing.assert_allclose(ritorni[:, 0], _rendimenti(VALORI_BUY_AND_HOLD), rtol=1e-12)
+    assert turnover[0] == 0
+
+
+def test_threshold_rebalances_only_past_the_band():
+    # Il peso di A passa da 0.5238 a 0.5475 e poi a 0.5710: solo il terzo mese supera la banda del 5%
+    ritorni, turnover = simulate(RENDIMENTI, PESI, 'threshold', MESI, band=0.05)
+    valori = np.r_[VALORI_BUY_AND_HOLD[:3], 1.1655 * 1.05]
+    np.testing.assert_allclose(ritorni[:, 0], _rendimenti(valori), rtol=1e-12)
+    assert turnover[0] == pytest.approx((0.6655 / 1.1655 - 0.5) / ANNI, rel=1e-12)
+
+    # Con una banda più larga non si scambia mai
+    ritorni, turnover = simulate(RENDIMENTI, PESI, 'threshold', MESI, band=0.10)
+    np.testing.assert_allclose(ritorni[:, 0], _rendimenti(VALORI_BUY_AND_HOLD), rtol=1e-12)
+    assert turnover[0] == 0
@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from build_data import build
+from price_store import PriceStore, current_store_dir
+
+
+@pytest.fixture
+def cartelle(tmp_path):
+    etf_dir = tmp_path / "ETFs"
+    etf_dir.mkdir()
+    lista = tmp_path / "index_list.csv"
+    pd.DataFrame({"Fund": ["Fondo A", "Fondo B"], "Index": ["A", "B"]}).to_csv(lista, index=False)
+    return etf_dir, tmp_path / "store", lista
+
+
+def _serie_rotte(etf_dir):
+    (etf_dir / "Latin1.csv").write_bytes("Date,Latin1\n01/2020,100\n02/2020,1é1\n".encode("latin-1"))
+    (etf_dir / "Giorni.csv").write_text("Date,Giorni\n2020-01-15,100\n2020-02-15,101\n")
+    (etf_dir / "Vuoto.csv").write_text("")
+
+
+def test_a_broken_file_is_excluded_without_stopping_the_build(cartelle):
+    etf_dir, store_dir, lista = cartelle
+    _serie_rotte(etf_dir)
+    (etf_dir / "A.csv").write_text("Date,A\n01/2020,100\n02/2020,101\n03/2020,103\n")
+    manifest = build(etf_dir, store_dir, lista)
+    assert manifest["version_dir"] is not None
+    assert set(manifest["errors"]) == {"Latin1.csv", "Giorni.csv", "Vuoto.csv"}
+    assert "UnicodeDecodeError" in manifest["errors"]["Latin1.csv"]
+    assert PriceStore(current_store_dir(store_dir)).columns == {"A": 0}
+
+
+def test_no_valid_series_returns_the_manifest_without_a_store(cartelle):
+    etf_dir, store_dir, lista = cartelle
+    _serie_rotte(etf_dir)
+    manifest = build(etf_dir, store_dir, lista)
+    assert manifest["version_dir"] is None
+    assert manifest["aborted"] == "nessuna serie valida"
+    assert len(manifest["errors"]) == 3
+    assert current_store_dir(store_dir) is None
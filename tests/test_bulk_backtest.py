@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import bulk_backtest
+import factor_regression
+import imports_handler
+from cache import LRUCache
+from factor_models import FactorModel
+from imports_handler import AssetLookup
+from time_axis import format_month, month_index
+
+PRIMO_MESE = month_index(2005, 1)
+MESI = np.arange(PRIMO_MESE, month_index(2015, 12) + 1, dtype=np.int32)
+
+
+@pytest.fixture
+def modello():
+    rng = np.random.default_rng(0)
+    return FactorModel("sintetico", "Sintetico", ["Mkt-RF"], MESI, rng.normal(0.005, 0.04, (len(MESI), 1)),
+                       np.full(len(MESI), 0.001))
+
+
+@pytest.fixture
+def indici(tmp_path, monkeypatch):
+    """Lista degli indici con tre fondi, di cui uno ("Fondo VIX") senza file di dati."""
+    cartella = tmp_path / "ETFs"
+    cartella.mkdir()
+    rng = np.random.default_rng(1)
+    for indice in ("A", "B"):
+        valori = 100 * np.cumprod(1 + rng.normal(0.005, 0.04, len(MESI)))
+        pd.DataFrame({"Date": [format_month(m) for m in MESI], indice: valori}).to_csv(cartella / f"{indice}.csv",
+                                                                                       index=False)
+    lista = tmp_path / "index_list.csv"
+    pd.DataFrame({"Fund": ["Fondo A", "Fondo B", "Fondo VIX"], "ISIN": ["IE0000000001", "IE0000000002", None],
+                  "Tickers": ["FA", "FB", "VIX"], "Index": ["A", "B", "VIX"]}).to_csv(lista, index=False)
+
+    # Niente store: i dati vengono dai CSV della cartella temporanea
+    monkeypatch.setattr(imports_handler, "ETF_BASE_PATH", str(cartella))
+    monkeypatch.setattr(imports_handler, "get_price_store", lambda: None)
+    monkeypatch.setattr(imports_handler, "_cache_dati", LRUCache(maxsize=8))
+    monkeypatch.setattr(factor_regression, "get_price_store", lambda: None)
+    monkeypatch.setattr(bulk_backtest, "get_price_store", lambda: None)
+    lookup = AssetLookup(lista)
+    monkeypatch.setattr(bulk_backtest, "get_asset_lookup", lambda: lookup)
+
+
+PORTAFOGLI = [
+    ("bilanciato", ["Fondo A", "Fondo B"], [60.0, 40.0]),
+    ("con VIX", ["Fondo A", "Fondo VIX"], [90.0, 10.0]),
+    ("solo VIX", ["VIX"], [100.0]),
+    ("solo A", ["FA"], [100.0]),
+]
+
+
+def test_index_without_data_only_fails_its_portfolios(indici, modello):
+    righe = {riga["portfolio"]: riga for riga in bulk_backtest.run_chunk(PORTAFOGLI, factor_model=modello)}
+    assert list(righe) == [nome for nome, _, _ in PORTAFOGLI]
+    for nome in ("con VIX", "solo VIX"):
+        assert "VIX" in righe[nome]["error"]
+    for nome in ("bilanciato", "solo A"):
+        assert "error" not in righe[nome]
+        assert righe[nome]["months"] == len(MESI) - 1
+
+
+def test_bulk_run_completes_with_an_index_without_data(indici, modello):
+    risultati = bulk_backtest.run_bulk(PORTAFOGLI, workers=1, chunk_size=2, factor_model=modello)
+    assert risultati["portfolio"].tolist() == [nome for nome, _, _ in PORTAFOGLI]
+    assert risultati["error"].notna().tolist() == [False, True, True, False]
+    assert risultati.loc[~risultati["error"].notna(), "beta_Mkt-RF"].notna().all()
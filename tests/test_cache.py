@@ -0,0 +1,79 @@
+import threading
+import time
+
+from cache import SingleFlight
+
+CHIAMANTI = 8
+
+
+def _in_parallelo(flight, chiave, func):
+    """Lancia CHIAMANTI thread sulla stessa chiave e restituisce risultati (o eccezioni) e thread."""
+    esiti = [None] * CHIAMANTI
+
+    def chiama(i):
+        try:
+            esiti[i] = flight.do(chiave, func)
+        except Exception as errore:
+            esiti[i] = errore
+
+    threads = [threading.Thread(target=chiama, args=(i,)) for i in range(CHIAMANTI)]
+    for thread in threads:
+        thread.start()
+    return esiti, threads
+
+
+def _attendi_coalescenza(flight, attesi):
+    """Aspetta che tutti i chiamanti tranne il primo siano in attesa del calcolo in corso."""
+    scadenza = time.monotonic() + 5
+    while flight.stats()["coalesced"] < attesi:
+        assert time.monotonic() < scadenza, "i chiamanti non si sono accodati al calcolo in corso"
+        time.sleep(0.001)
+
+
+def _calcolo(rilascia, esecuzioni, esito):
+    def func():
+        esecuzioni.append(threading.get_ident())
+        assert rilascia.wait(5)
+        if isinstance(esito, Exception):
+            raise esito
+        return esito
+    return func
+
+
+def test_concurrent_callers_share_one_result():
+    flight, rilascia, esecuzioni = SingleFlight(), threading.Event(), []
+    risultato = object()
+    esiti, threads = _in_parallelo(flight, "chiave", _calcolo(rilascia, esecuzioni, risultato))
+    _attendi_coalescenza(flight, CHIAMANTI - 1)
+    rilascia.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(esecuzioni) == 1
+    assert all(esito is risultato for esito in esiti)
+    assert flight.stats() == {"calls": CHIAMANTI, "coalesced": CHIAMANTI - 1, "in_flight": 0}
+
+
+def test_concurrent_callers_share_one_exception():
+    flight, rilascia, esecuzioni = SingleFlight(), threading.Event(), []
+    errore = ValueError("calcolo fallito")
+    esiti, threads = _in_parallelo(flight, "chiave", _calcolo(rilascia, esecuzioni, errore))
+    _attendi_coalescenza(flight, CHIAMANTI - 1)
+    rilascia.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(esecuzioni) == 1
+    assert all(esito is errore for esito in esiti)
+    # Finito il calcolo la chiave non resta bloccata: la chiamata successiva ricalcola
+    assert flight.do("chiave", lambda: 42) == 42
+
+
+def test_different_keys_do_not_wait_for_each_other():
+    flight, rilascia = SingleFlight(), threading.Event()
+    esiti, threads = _in_parallelo(flight, "lenta", _calcolo(rilascia, [], "lenta"))
+    assert flight.do("veloce", lambda: "veloce") == "veloce"
+    rilascia.set()
+    for thread in threads:
+        thread.join(5)
+    assert esiti == ["lenta"] * CHIAMANTI
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from critical_line import critical_line, frontier_points, max_sharpe
+
+MU = np.array([0.10, 0.07, 0.05, 0.12])
+VOLATILITA = np.array([0.20, 0.12, 0.05, 0.30])
+CORRELAZIONE = np.array([[1.0, 0.5, 0.1, 0.6],
+                         [0.5, 1.0, 0.2, 0.3],
+                         [0.1, 0.2, 1.0, 0.0],
+                         [0.6, 0.3, 0.0, 1.0]])
+COV = CORRELAZIONE * np.outer(VOLATILITA, VOLATILITA)
+
+
+def _minima_varianza(rendimento):
+    """Varianza minima long-only con il rendimento dato, da un QP generico."""
+    optimize = pytest.importorskip("scipy.optimize")
+    vincoli = [{"type": "eq", "fun": lambda w: w.sum() - 1}, {"type": "eq", "fun": lambda w: w @ MU - rendimento}]
+    esito = optimize.minimize(lambda w: w @ COV @ w, np.full(len(MU), 1 / len(MU)), jac=lambda w: 2 * COV @ w,
+                              bounds=[(0, 1)] * len(MU), constraints=vincoli, method="SLSQP",
+                              options={"ftol": 1e-14, "maxiter": 500})
+    assert esito.success
+    return esito.fun
+
+
+@pytest.fixture
+def angoli():
+    return critical_line(MU, COV)
+
+
+def test_corners_are_long_only_and_fully_invested(angoli):
+    pesi = angoli["weights"]
+    assert len(pesi) >= 2
+    np.testing.assert_allclose(pesi.sum(axis=1), 1.0, atol=1e-12)
+    assert (pesi >= 0).all()
+    # Dal massimo rendimento alla minima varianza
+    assert np.argmax(pesi[0]) == np.argmax(MU)
+    assert (np.diff(angoli["returns"]) <= 1e-12).all()
+
+
+def test_corners_match_a_brute_force_qp(angoli):
+    for rendimento, volatilita in zip(angoli["returns"], angoli["volatility"]):
+        assert volatilita ** 2 == pytest.approx(_minima_varianza(rendimento), rel=1e-6, abs=1e-10)
+
+
+def test_segments_between_corners_stay_on_the_frontier(angoli):
+    punti = frontier_points(angoli, MU, COV, per_segmento=5)
+    for rendimento, volatilita in zip(punti["returns"], punti["volatility"]):
+        assert volatilita ** 2 == pytest.approx(_minima_varianza(rendimento), rel=1e-6, abs=1e-10)
+
+
+def test_max_sharpe_beats_a_general_optimizer(angoli):
+    optimize = pytest.importorskip("scipy.optimize")
+    tangente = max_sharpe(angoli, MU, COV, risk_free=0.02)
+    sharpe = lambda w: (w @ MU - 0.02) / np.sqrt(w @ COV @ w)  # noqa: E731
+    esito = optimize.minimize(lambda w: -sharpe(w), np.full(len(MU), 1 / len(MU)), bounds=[(0, 1)] * len(MU),
+                              constraints=[{"type": "eq", "fun": lambda w: w.sum() - 1}], method="SLSQP",
+                              options={"ftol": 1e-14, "maxiter": 500})
+    assert tangente.sum() == pytest.approx(1.0) and (tangente >= 0).all()
+    assert sharpe(tangente) >= -esito.fun - 1e-9
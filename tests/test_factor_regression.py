@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from factor_models import FactorModel
+from factor_regression import (factor_betas, factor_regression, linear_factor_betas, normal_equation_sums,
+                               verify_with_statsmodels)
+from time_axis import month_index
+
+FATTORI = ["Mkt-RF", "SMB", "HML"]
+BETA = np.array([[1.0, 0.2, -0.1],
+                 [0.6, -0.3, 0.4]])
+
+
+@pytest.fixture
+def modello():
+    rng = np.random.default_rng(0)
+    mesi = np.arange(month_index(2000, 1), month_index(2019, 12) + 1, dtype=np.int32)
+    return FactorModel("sintetico", "Sintetico", FATTORI, mesi, rng.normal(0.005, 0.04, (len(mesi), len(FATTORI))),
+                       np.full(len(mesi), 0.001))
+
+
+@pytest.fixture
+def rendimenti(modello):
+    # Le serie coprono solo una parte dei mesi del modello
+    righe = slice(24, 204)
+    rumore = np.random.default_rng(1).normal(0, 0.01, (righe.stop - righe.start, len(BETA)))
+    valori = 0.002 + modello.rf[righe, None] + modello.values[righe] @ BETA.T + rumore
+    return pd.DataFrame(valori, index=pd.Index(modello.months[righe], name='Month'), columns=["A", "B"])
+
+
+class _Store:
+    """Store minimo con le somme delle equazioni normali di un solo modello, costruite dai rendimenti dati."""
+
+    def __init__(self, rendimenti, modello, files):
+        self.months = modello.months
+        self.columns = {nome: j for j, nome in enumerate(rendimenti.columns)}
+        righe = np.searchsorted(self.months, rendimenti.index.to_numpy())
+        matrice = np.full((len(self.months), rendimenti.shape[1]), np.nan)
+        matrice[righe] = rendimenti.to_numpy()
+        # Come nello store, il primo rendimento è nella riga dopo il primo prezzo
+        self.first_row = np.full(rendimenti.shape[1], righe[0] - 1)
+        self.last_row = np.full(rendimenti.shape[1], righe[-1])
+        self._modello = modello.name
+        self._somme = {**normal_equation_sums(matrice, self.months, modello), "files": files}
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def factor_sums(self, model):
+        return self._somme if model == self._modello else None
+
+
+def test_agrees_with_statsmodels(rendimenti, modello):
+    pytest.importorskip("statsmodels")
+    assert verify_with_statsmodels(rendimenti, modello) < 1e-8
+
+
+def test_missing_months_are_dropped_before_comparing(rendimenti, modello):
+    pytest.importorskip("statsmodels")
+    rendimenti.iloc[[3, 50], 1] = np.nan
+    verify_with_statsmodels(rendimenti, modello)
+
+
+def test_recovers_the_betas(rendimenti, modello):
+    stima = factor_regression(rendimenti, modello)
+    assert stima["nobs"] == len(rendimenti)
+    np.testing.assert_allclose(stima["coef"][FATTORI].to_numpy(), BETA, atol=0.05)
+    np.testing.assert_allclose(stima["coef"]["const"].to_numpy(), 0.002, atol=0.002)
+
+
+def test_store_sums_from_other_factor_files_are_not_used(rendimenti, modello):
+    modello.files = {"fattori.csv": "sha-della-build"}
+    mesi = rendimenti.index.to_numpy()
+    store = _Store(rendimenti, modello, {"fattori.csv": "sha-della-build"})
+    assert linear_factor_betas(["A", "B"], [0.5, 0.5], mesi, modello, store) is not None
+    # File dei fattori aggiornati dopo la build: le somme dello store non valgono più
+    modello.files = {"fattori.csv": "sha-aggiornato"}
+    assert linear_factor_betas(["A", "B"], [0.5, 0.5], mesi, modello, store) is None
+
+
+def test_linear_betas_match_the_regression_of_a_monthly_portfolio(rendimenti, modello):
+    store = _Store(rendimenti, modello, modello.files)
+    pesi = np.array([[0.6, 0.4], [0.2, 0.8], [1.0, 0.0]])
+    for finestra in (slice(None), slice(30, 150)):
+        mesi = rendimenti.index.to_numpy()[finestra]
+        lineari = linear_factor_betas(["A", "B"], pesi, mesi, modello, store)
+        # Con ribilanciamento mensile il rendimento del portafoglio è la media pesata di quelli degli indici
+        portafogli = pd.DataFrame(rendimenti.to_numpy()[finestra] @ pesi.T, index=pd.Index(mesi, name='Month'))
+        np.testing.assert_allclose(lineari, factor_betas(portafogli, modello).to_numpy(), rtol=0, atol=1e-10)
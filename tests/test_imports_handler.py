@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+from imports_handler import AssetLookup
+
+
+@pytest.fixture
+def lookup(tmp_path):
+    lista = tmp_path / "index_list.csv"
+    pd.DataFrame({
+        "Fund": ["Amundi S&P 500 VIX Futures Enhanced Roll", "iShares Core MSCI World", "Xtrackers MSCI World"],
+        "ISIN": ["LU0832435464", "IE00B4L5Y983", "IE00BJ0KDQ92"],
+        "Tickers": ["LVO\nVOOL", "SWDA\nEUNL  IWDA", "XDWD"],
+        "Index": ["S&P 500 VIX Futures Enhanced Roll", "MSCI World", "MSCI World"],
+    }).to_csv(lista, index=False)
+    return AssetLookup(lista)
+
+
+@pytest.mark.parametrize("ticker", ["LVO", "VOOL"])
+def test_resolves_each_ticker_of_a_multi_ticker_cell(lookup, ticker):
+    assert lookup.resolve(ticker) == "S&P 500 VIX Futures Enhanced Roll"
+
+
+def test_resolves_by_isin_fund_and_ticker(lookup):
+    assert lookup.resolve("IE00B4L5Y983") == "MSCI World"
+    assert lookup.resolve("Xtrackers MSCI World") == "MSCI World"
+    assert lookup.resolve_many(["EUNL", "IWDA", "XDWD", "???"]) == (["MSCI World"] * 3, ["???"])
@@ -0,0 +1,78 @@
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("dash")
+# Il login non serve qui: firebase_auth all'import legge le credenziali di key.json
+if "firebase_auth" not in sys.modules:
+    firebase_auth = types.ModuleType("firebase_auth")
+    firebase_auth.FirebaseAuth = object
+    sys.modules["firebase_auth"] = firebase_auth
+
+import backtest_engine  # noqa: E402
+import portfolio_pilot  # noqa: E402
+from cache import LRUCache  # noqa: E402
+from time_axis import month_index, year_of  # noqa: E402
+
+PRIMO_MESE_ASSET = month_index(2005, 3)
+PRIMO_MESE_BENCHMARK = month_index(2003, 1)  # Il benchmark ha una storia più lunga degli asset
+ULTIMO_MESE = month_index(2015, 12)
+
+
+def _prezzi(nomi, primo_mese, seed):
+    mesi = np.arange(primo_mese, ULTIMO_MESE + 1)
+    rendimenti = np.random.default_rng(seed).normal(0.005, 0.04, (len(mesi) - 1, len(nomi)))
+    valori = 100 * np.vstack([np.ones(len(nomi)), np.cumprod(1 + rendimenti, axis=0)])
+    return pd.DataFrame(valori, index=pd.Index(mesi, name='Month'), columns=nomi)
+
+
+@pytest.fixture
+def dati_sintetici(monkeypatch):
+    prezzi = pd.concat([_prezzi(["A", "B"], PRIMO_MESE_ASSET, 0), _prezzi(["BM"], PRIMO_MESE_BENCHMARK, 1)], axis=1)
+
+    def importa_dati(indici):
+        dati = prezzi[list(indici)].dropna()
+        return dati, [str(dati.index[0]), indici[0]]
+
+    def importa_rendimenti(indici, start=None, end=None):
+        dati, _ = importa_dati(indici)
+        return dati.pct_change().iloc[1:].loc[start:end]
+
+    monkeypatch.setattr(portfolio_pilot, "match_asset_name", list)
+    monkeypatch.setattr(portfolio_pilot, "importa_dati", importa_dati)
+    monkeypatch.setattr(portfolio_pilot, "importa_rendimenti", importa_rendimenti)
+    monkeypatch.setattr(portfolio_pilot, "versione_dati", lambda nomi: "sintetici")
+    monkeypatch.setattr(portfolio_pilot, "_cache_backtest", LRUCache(maxsize=8))
+
+
+def _richiesta(benchmark, anni, rebalancing):
+    return {'etf': ["A", "B"], 'percentuali': [60, 40], 'benchmark': benchmark, 'anni': anni,
+            'rebalancing': rebalancing}
+
+
+@pytest.mark.parametrize("rebalancing", backtest_engine.REBALANCING)
+@pytest.mark.parametrize("anni", [[2000, 2020], [int(year_of(PRIMO_MESE_ASSET)), 2020], [2008, 2012]])
+def test_portfolio_and_benchmark_start_at_100(dati_sintetici, rebalancing, anni):
+    portfolio = portfolio_pilot._calcola_portafoglio(_richiesta("BM", anni, rebalancing))['portfolio']
+    assert list(portfolio.columns) == ['Portfolio', 'Benchmark']
+    np.testing.assert_allclose(portfolio.iloc[0].to_numpy(), [100.0, 100.0], rtol=1e-12)
+
+
+def test_without_benchmark_first_month_keeps_its_return(dati_sintetici):
+    portfolio = portfolio_pilot._calcola_portafoglio(_richiesta(None, [2000, 2020], 'monthly'))['portfolio']
+    prezzi, _ = portfolio_pilot.importa_dati(["A", "B"])
+    primo_rendimento = prezzi.iloc[1] / prezzi.iloc[0] - 1
+    assert portfolio.index[0] == PRIMO_MESE_ASSET + 1
+    assert portfolio['Portfolio'].iloc[0] == pytest.approx(100 * (1 + primo_rendimento @ [0.6, 0.4]))
+
+
+@pytest.mark.parametrize("rebalancing", backtest_engine.REBALANCING)
+def test_window_is_bought_on_its_first_month_with_a_benchmark(dati_sintetici, rebalancing):
+    stato = portfolio_pilot._stato_backtest(["A", "B"], np.array([0.6, 0.4]), "BM")
+    primo_mese, ultimo_mese = stato['mesi'][0], stato['mesi'][-1]
+    curva, _ = portfolio_pilot._finestra_portafoglio(stato, np.array([0.6, 0.4]), primo_mese, ultimo_mese, rebalancing)
+    assert curva.index[0] == primo_mese
+    assert curva['Portfolio'].iloc[0] == pytest.approx(100.0, rel=1e-12)
@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+
+from price_store import COLUMNS_FILE, PriceStore, current_store_dir, write_store
+from time_axis import month_index
+
+MESI = np.arange(month_index(2010, 1), month_index(2010, 12) + 1, dtype=np.int32)
+
+
+def _scrivi(store_dir, keep_versions=2):
+    prezzi = np.asfortranarray(100 * np.cumprod(np.full((len(MESI), 2), 1.01), axis=0))
+    return write_store(["A", "B"], MESI, prezzi, {"version": 0}, store_dir, keep_versions)
+
+
+def _versione(store_dir, nome, mtime_ns):
+    """Versione già completa con columns.json scritto al tempo dato."""
+    path = store_dir / nome
+    path.mkdir(parents=True)
+    (path / COLUMNS_FILE).write_text('{"version": 0, "columns": []}')
+    os.utime(path / COLUMNS_FILE, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+def test_prunes_the_oldest_completed_versions_whatever_their_name(tmp_path):
+    # Il nome sorge dopo quello delle nuove versioni, ma è la più vecchia
+    vecchia = _versione(tmp_path, "v99990101000000-1", 1_000_000_000)
+    in_corso = tmp_path / "v00000101000000-2"  # Build di un altro processo non ancora completa
+    in_corso.mkdir()
+    prima = _scrivi(tmp_path)
+    seconda = _scrivi(tmp_path)
+    assert not vecchia.exists()
+    assert prima.exists() and seconda.exists() and in_corso.exists()
+    assert current_store_dir(tmp_path) == seconda.resolve()
+    assert PriceStore(current_store_dir(tmp_path)).columns == {"A": 0, "B": 1}
+
+
+def test_never_removes_the_current_version(tmp_path):
+    # Orologio spostato: una versione precedente risulta completata dopo quella nuova
+    futura = _versione(tmp_path, "v20990101000000-1", 4_000_000_000 * 10 ** 9)
+    nuova = _scrivi(tmp_path, keep_versions=1)
+    assert nuova.exists() and futura.exists()
+    assert current_store_dir(tmp_path) == nuova.resolve()
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from build_data import SeriesError, validate_series
+from time_axis import month_index, parse_months
+
+
+def test_parses_both_formats_mixed():
+    mesi = parse_months(np.array(["01/2020", "2020-02", "12/1999"], dtype=object))
+    np.testing.assert_array_equal(mesi, [month_index(2020, 1), month_index(2020, 2), month_index(1999, 12)])
+    assert mesi.dtype == np.int32
+
+
+@pytest.mark.parametrize("data", ["2020-01-15", "01/20201", "1/2020", "01/202é", "０1/2020", ""])
+def test_rejects_dates_of_the_wrong_length_or_not_ascii(data):
+    with pytest.raises(ValueError, match="Formato data non riconosciuto"):
+        parse_months(["01/2020", data])
+
+
+def test_bad_dates_exclude_the_series(tmp_path):
+    path = tmp_path / "Indice.csv"
+    path.write_text("Date,Indice\n2020-01-15,100\n2020-02-15,101\n", encoding="utf-8")
+    with pytest.raises(SeriesError, match="2020-01-15"):
+        validate_series(path)
@@ -0,0 +1,70 @@
+"""
+Asse temporale comune: ogni mese è un int32 che conta i mesi trascorsi da gennaio 1900.
+
+Allineamenti, finestre per anno e join con i fattori diventano operazioni su interi;
+la conversione in Timestamp avviene solo quando serve disegnare i grafici.
+"""
+import numpy as np
+import pandas as pd
+
+BASE_YEAR = 1900
+MONTH_DTYPE = np.int32
+
+# datetime64[M] conta i mesi da gennaio 1970
+_EPOCH_OFFSET = (1970 - BASE_YEAR) * 12
+_ZERO = ord('0')
+
+
+def month_index(year, month=1):
+    """Indice del mese (year, month) sull'asse comune."""
+    return (year - BASE_YEAR) * 12 + month - 1
+
+
+def year_of(months):
+    """Anno di uno o più indici di mese."""
+    return np.asarray(months) // 12 + BASE_YEAR
+
+
+def _digits(chars, start, stop):
+    value = np.zeros(len(chars), dtype=MONTH_DTYPE)
+    for position in range(start, stop):
+        value = value * 10 + (chars[:, position].astype(MONTH_DTYPE) - _ZERO)
+    return value
+
+
+def parse_months(values):
+    """
+    Parser vettoriale di date 'MM/YYYY' (file degli ETF) e 'YYYY-MM' (file dei fattori), anche mescolate.
+
+    Restituisce gli indici di mese int32; ValueError se una data non è in nessuno dei due formati.
+    """
+    # Un carattere in più del necessario rivela le stringhe troppo lunghe, che 'S7' troncherebbe in silenzio
+    codes = np.asarray(values, dtype='U8').view(np.uint32).reshape(-1, 8)
+    lunghezza_ascii = (codes[:, 6] != 0) & (codes[:, 7] == 0) & (codes < 128).all(axis=1)
+    chars = codes[:, :7].astype(np.uint8)
+
+    slash = chars[:, 2] == ord('/')
+    dash = chars[:, 4] == ord('-')
+    digit_positions = np.where(slash[:, None], [0, 1, 3, 4, 5, 6], [0, 1, 2, 3, 5, 6])
+    digits = np.take_along_axis(chars, digit_positions, axis=1)
+    valid = lunghezza_ascii & (slash | dash) & ((digits >= _ZERO) & (digits <= ord('9'))).all(axis=1)
+    if not valid.all():
+        raise ValueError(f"Formato data non riconosciuto (atteso MM/YYYY o YYYY-MM): {np.asarray(values)[~valid][0]!r}")
+
+    month = np.where(slash, _digits(chars, 0, 2), _digits(chars, 5, 7))
+    year = np.where(slash, _digits(chars, 3, 7), _digits(chars, 0, 4))
+    if ((month < 1) | (month > 12)).any():
+        raise ValueError("Mese fuori intervallo (1-12)")
+    return ((year - BASE_YEAR) * 12 + month - 1).astype(MONTH_DTYPE)
+
+
+def to_timestamps(months):
+    """Converte indici di mese in un DatetimeIndex (primo giorno del mese), da usare solo per i grafici."""
+    months = np.asarray(months, dtype=np.int64)
+    return pd.DatetimeIndex((months - _EPOCH_OFFSET).astype('datetime64[M]').astype('datetime64[ns]'), name='Date')
+
+
+def format_month(month):
+    """Indice di mese -> 'YYYY-MM'."""
+    month = int(month)
+    return f"{month // 12 + BASE_YEAR:04d}-{month % 12 + 1:02d}"